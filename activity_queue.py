@@ -0,0 +1,626 @@
+"""
+Durable write-behind queue for CRM activity posts.
+
+Tool calls record each activity in a local SQLite file under an idempotency
+key (call_sid + tool call id) before anything goes over the network, so a
+slow or failing backend neither stalls the conversation nor loses the
+activity:
+
+- submit() stores the activity and tries to deliver it for up to
+  ACTIVITY_INLINE_WAIT seconds. If the backend hasn't answered by then the
+  tool call returns "queued" and delivery carries on in the background.
+  This inline attempt runs on the live lane; retries use the webhooks lane.
+- run() (started by the app lifespan) retries pending activities with
+  exponential backoff, ACTIVITY_MAX_CONCURRENCY posts at a time, until
+  delivered or ACTIVITY_MAX_ATTEMPTS is reached.
+- 4xx answers other than 401/403/408/429 are rejections: they are not
+  retried and are reported back to the model.
+- With ACTIVITY_COALESCE, a summary and disposition for the same lead that
+  have not been sent yet are merged into the disposition (the summary is
+  prepended to its notes); the summary row is then final as "coalesced".
+- Rows in a final state are deleted after ACTIVITY_RETENTION_SECONDS.
+
+Every post carries the activity's own key as an Idempotency-Key header, so
+redelivery after a crash or timeout can be deduplicated by the backend; a
+merged disposition keeps its key and is retried with the merged payload.
+Posts go through the worker's backend circuit breaker (circuit_breaker.py):
+its adaptive timeout bounds each request, and while it is open activities
+are deferred without using up their attempts.
+
+The backend Authorization header is never written to the file: it is kept
+in memory until the activity reaches a final state and added back when the
+activity is posted. The file is shared by the gunicorn workers on a host,
+so each row records the pid of its worker and only that worker retries it.
+Activities left over from a process that has exited are taken over by the
+next worker to poll and posted without the header; a 401/403 answer is
+retried like a 5xx until ACTIVITY_MAX_ATTEMPTS, then marked failed.
+"""
+
+import asyncio
+from dataclasses import dataclass
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+import uuid
+
+import requests
+
+from circuit_breaker import backend_breaker, CircuitBreaker
+import lanes
+from utils.logging import logger
+
+ACTIVITY_QUEUE_PATH = os.getenv(
+    "ACTIVITY_QUEUE_PATH",
+    os.path.join(tempfile.gettempdir(), "agent_activity_queue.sqlite3"),
+)
+ACTIVITY_MAX_CONCURRENCY = int(os.getenv("ACTIVITY_MAX_CONCURRENCY", "4"))
+ACTIVITY_MAX_ATTEMPTS = int(os.getenv("ACTIVITY_MAX_ATTEMPTS", "8"))
+ACTIVITY_INLINE_WAIT = float(os.getenv("ACTIVITY_INLINE_WAIT", "2.0"))
+ACTIVITY_COALESCE = os.getenv("ACTIVITY_COALESCE", "false").lower() == "true"
+ACTIVITY_RETENTION_SECONDS = float(
+    os.getenv("ACTIVITY_RETENTION_SECONDS", "86400")
+)
+# An in-flight claim older than this is assumed lost (worker died).
+ACTIVITY_LEASE_SECONDS = 60
+ACTIVITY_POLL_SECONDS = 1.0
+ACTIVITY_PRUNE_SECONDS = 300
+# Kept in memory only (see the module docstring).
+_SECRET_HEADERS = ("Authorization",)
+
+PENDING = "pending"
+INFLIGHT = "inflight"
+DELIVERED = "delivered"
+QUEUED = "queued"
+REJECTED = "rejected"
+FAILED = "failed"
+COALESCED = "coalesced"
+_FINAL = (DELIVERED, REJECTED, FAILED, COALESCED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    lead_key TEXT NOT NULL,
+    url TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS activities_due ON activities (status, next_attempt_at);
+"""
+
+
+def activity_key(call_sid: Optional[str], tool_call_id: Optional[str]) -> str:
+    """Idempotency key for the activity written by one tool call."""
+    if call_sid and tool_call_id:
+        return f"{call_sid}:{tool_call_id}"
+    return uuid.uuid4().hex
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@dataclass
+class Activity:
+    key: str
+    kind: str
+    lead_key: str
+    url: str
+    headers: Dict
+    payload: Dict
+    attempts: int
+
+
+@dataclass
+class Delivery:
+    """Outcome of submit(): delivered, queued or rejected."""
+
+    status: str
+    error: Optional[str] = None
+    # Not attempted because the backend circuit is open.
+    deferred: bool = False
+
+
+class ActivityQueue:
+    def __init__(
+        self,
+        path: str = ACTIVITY_QUEUE_PATH,
+        max_concurrency: int = ACTIVITY_MAX_CONCURRENCY,
+        max_attempts: int = ACTIVITY_MAX_ATTEMPTS,
+        coalesce: bool = ACTIVITY_COALESCE,
+        breaker: CircuitBreaker = backend_breaker,
+    ) -> None:
+        self.path = path
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+        self.coalesce = coalesce
+        self._max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._background: set = set()
+        self._secrets: Dict[str, Dict] = {}
+
+    # -- storage (blocking; called on a lane) -------------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                self.path,
+                timeout=5,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {
+                r[1]
+                for r in self._conn.execute("PRAGMA table_info(activities)")
+            }
+            if "owner" not in columns:
+                self._conn.execute(
+                    "ALTER TABLE activities ADD COLUMN owner INTEGER NOT NULL DEFAULT 0"
+                )
+            # Files written before credentials were kept out of them.
+            for name in _SECRET_HEADERS:
+                self._conn.execute(
+                    "UPDATE activities SET headers = json_remove(headers, ?)"
+                    " WHERE json_extract(headers, ?) IS NOT NULL",
+                    (f"$.{name}", f"$.{name}"),
+                )
+        return self._conn
+
+    def enqueue(
+        self,
+        key: str,
+        kind: str,
+        lead_key: str,
+        url: str,
+        headers: Dict,
+        payload: Dict,
+    ) -> bool:
+        """Store an activity; False if the key was already recorded."""
+        now = time.time()
+        stored = {k: v for k, v in headers.items() if k not in _SECRET_HEADERS}
+        secrets = {k: v for k, v in headers.items() if k in _SECRET_HEADERS}
+        with self._lock:
+            cursor = self._db().execute(
+                "INSERT OR IGNORE INTO activities (key, kind, lead_key, url, headers,"
+                " payload, status, next_attempt_at, created_at, updated_at, owner)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    kind,
+                    lead_key,
+                    url,
+                    json.dumps(stored),
+                    json.dumps(payload),
+                    PENDING,
+                    now,
+                    now,
+                    now,
+                    os.getpid(),
+                ),
+            )
+            created = cursor.rowcount == 1
+            if created and secrets:
+                self._secrets[key] = secrets
+            return created
+
+    def claim(
+        self, key: Optional[str] = None, limit: int = 50
+    ) -> List[Activity]:
+        """
+        Lease due activities (or one by key) to this worker. Only this
+        process holds their Authorization header, so a worker claims the
+        activities it enqueued, plus those of a process that has exited.
+        """
+        now = time.time()
+        owner = os.getpid()
+        where = "(status = ? OR (status = ? AND lease_until < ?))"
+        params: list = [PENDING, INFLIGHT, now]
+        if key is None:
+            where += " AND next_attempt_at <= ?"
+            params.append(now)
+        else:
+            where += " AND key = ?"
+            params.append(key)
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if key is None:
+                    others = db.execute(
+                        f"SELECT DISTINCT owner FROM activities WHERE {where}"
+                        " AND owner != ?",
+                        (*params, owner),
+                    ).fetchall()
+                    owners = [owner] + [
+                        r[0] for r in others if not _alive(r[0])
+                    ]
+                    where += f" AND owner IN ({', '.join('?' * len(owners))})"
+                    params.extend(owners)
+                rows = db.execute(
+                    "SELECT key, kind, lead_key, url, headers, payload, attempts"
+                    f" FROM activities WHERE {where}"
+                    " ORDER BY created_at LIMIT ?",
+                    (*params, limit),
+                ).fetchall()
+                db.executemany(
+                    "UPDATE activities SET status = ?, lease_until = ?, updated_at = ?,"
+                    " owner = ? WHERE key = ?",
+                    [
+                        (
+                            INFLIGHT,
+                            now + ACTIVITY_LEASE_SECONDS,
+                            now,
+                            owner,
+                            r[0],
+                        )
+                        for r in rows
+                    ],
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return [
+            Activity(
+                r[0],
+                r[1],
+                r[2],
+                r[3],
+                json.loads(r[4]),
+                json.loads(r[5]),
+                r[6],
+            )
+            for r in rows
+        ]
+
+    def _finish(
+        self,
+        keys: List[str],
+        status: str,
+        error: Optional[str],
+        attempts: int,
+        retry_after: float = 0.0,
+    ) -> None:
+        now = time.time()
+        backoff = max(min(2**attempts, 300), retry_after)
+        with self._lock:
+            self._db().executemany(
+                "UPDATE activities SET status = ?, attempts = ?, last_error = ?,"
+                " next_attempt_at = ?, lease_until = 0, updated_at = ? WHERE key = ?",
+                [
+                    (status, attempts, error, now + backoff, now, key)
+                    for key in keys
+                ],
+            )
+            if status in _FINAL:
+                for key in keys:
+                    self._secrets.pop(key, None)
+
+    def _merge(self, into: Activity, merged: Activity, payload: Dict) -> None:
+        """Fold `merged` into `into` for good: one activity, one key."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute(
+                    "UPDATE activities SET payload = ?, updated_at = ? WHERE key = ?",
+                    (json.dumps(payload), now, into.key),
+                )
+                db.execute(
+                    "UPDATE activities SET status = ?, last_error = ?, lease_until = 0,"
+                    " updated_at = ? WHERE key = ?",
+                    (COALESCED, f"coalesced into {into.key}", now, merged.key),
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            self._secrets.pop(merged.key, None)
+
+    def prune(self, max_age: float = ACTIVITY_RETENTION_SECONDS) -> int:
+        """Delete rows that reached a final state more than max_age ago."""
+        with self._lock:
+            cursor = self._db().execute(
+                "DELETE FROM activities"
+                f" WHERE status IN ({', '.join('?' * len(_FINAL))})"
+                " AND updated_at < ?",
+                (*_FINAL, time.time() - max_age),
+            )
+            return cursor.rowcount
+
+    def status(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = (
+                self._db()
+                .execute(
+                    "SELECT status, attempts, last_error FROM activities WHERE key = ?",
+                    (key,),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+        return {
+            "key": key,
+            "status": row[0],
+            "attempts": row[1],
+            "last_error": row[2],
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rows = (
+                self._db()
+                .execute(
+                    "SELECT status, COUNT(*) FROM activities GROUP BY status"
+                )
+                .fetchall()
+            )
+        counts = {status: 0 for status in (PENDING, INFLIGHT, *_FINAL)}
+        counts.update(dict(rows))
+        return counts
+
+    # -- delivery ---------------------------------------------------------
+
+    def _post(self, activity: Activity) -> Delivery:
+        """POST one activity; blocking."""
+        headers = dict(activity.headers)
+        headers.update(self._secrets.get(activity.key, {}))
+        headers["Idempotency-Key"] = activity.key
+        if not self.breaker.allow():
+            return Delivery(
+                QUEUED, "CRM backend unavailable (circuit open)", deferred=True
+            )
+        started = time.monotonic()
+        try:
+            resp = requests.post(
+                activity.url,
+                headers=headers,
+                json=activity.payload,
+                timeout=self.breaker.timeout(),
+            )
+        except requests.Timeout as e:
+            self.breaker.record_failure(time.monotonic() - started)
+            return Delivery(QUEUED, str(e))
+        except Exception as e:
+            self.breaker.record_failure()
+            return Delivery(QUEUED, str(e))
+        status_code = getattr(resp, "status_code", 500)
+        if status_code in (401, 403):
+            # Credentials (missing after a restart, or expired), not the
+            # payload: retried until max_attempts rather than dropped.
+            self.breaker.record_success(time.monotonic() - started)
+            return Delivery(QUEUED, resp.text[:200])
+        if resp.ok or (
+            400 <= status_code < 500 and status_code not in (408, 429)
+        ):
+            # The backend answered; a rejection is not a sign it is unhealthy.
+            self.breaker.record_success(time.monotonic() - started)
+            if resp.ok:
+                return Delivery(DELIVERED)
+            return Delivery(REJECTED, resp.text[:200])
+        self.breaker.record_failure()
+        return Delivery(QUEUED, resp.text[:200])
+
+    async def _deliver(
+        self, activities: List[Activity], inline: bool = False
+    ) -> Delivery:
+        """
+        Post one activity (or a coalesced group) and store the outcome.
+        Inline deliveries belong to a live call: they run on the live lane and
+        do not wait behind the retry backlog on the webhooks lane.
+        """
+        store = lanes.live if inline else lanes.background
+        activity = activities[0]
+        if len(activities) > 1:
+            activity = _coalesced(activities)
+            await store.run(
+                self._merge, activity, activities[1], activity.payload
+            )
+        if inline:
+            outcome = await lanes.live.run(self._post, activity)
+        else:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            async with self._semaphore:
+                outcome = await lanes.webhooks.run(self._post, activity)
+        keys = [activity.key]
+        attempts = activity.attempts + (0 if outcome.deferred else 1)
+        if outcome.status == QUEUED and attempts >= self.max_attempts:
+            outcome = Delivery(FAILED, outcome.error)
+        stored = PENDING if outcome.status == QUEUED else outcome.status
+        await store.run(
+            self._finish,
+            keys,
+            stored,
+            outcome.error,
+            attempts,
+            self.breaker.retry_after(),
+        )
+        if outcome.status != DELIVERED and not outcome.deferred:
+            logger.warning(
+                "CRM activity not delivered",
+                keys=keys,
+                delivery=outcome.status,
+                attempts=attempts,
+                error=outcome.error,
+            )
+        return outcome
+
+    async def submit(
+        self,
+        key: str,
+        kind: str,
+        lead_key: str,
+        url: str,
+        headers: Dict,
+        payload: Dict,
+        wait: float = ACTIVITY_INLINE_WAIT,
+    ) -> Delivery:
+        """
+        Record an activity and try to deliver it within `wait` seconds.
+        A repeated key reports the stored status instead of posting again.
+        """
+        created = await lanes.live.run(
+            self.enqueue, key, kind, lead_key, url, headers, payload
+        )
+        if not created:
+            existing = await lanes.live.run(self.status, key)
+            if existing and existing["status"] in (
+                DELIVERED,
+                REJECTED,
+                COALESCED,
+            ):
+                return Delivery(existing["status"], existing["last_error"])
+            return Delivery(QUEUED)
+
+        claimed = await lanes.live.run(self.claim, key)
+        if not claimed:
+            return Delivery(QUEUED)
+        delivery = asyncio.create_task(self._deliver(claimed, inline=True))
+        self._background.add(delivery)
+        delivery.add_done_callback(self._background.discard)
+        try:
+            outcome = await asyncio.wait_for(asyncio.shield(delivery), wait)
+        except asyncio.TimeoutError:
+            self._wake()
+            return Delivery(QUEUED)
+        if outcome.status == FAILED:
+            return Delivery(QUEUED, outcome.error)
+        return outcome
+
+    def _make_due(self) -> None:
+        with self._lock:
+            self._db().execute(
+                "UPDATE activities SET next_attempt_at = 0 WHERE status = ?",
+                (PENDING,),
+            )
+
+    async def flush(self, timeout: float = 5.0) -> int:
+        """
+        On shutdown: finish inline deliveries and make one more attempt at
+        every pending activity, ignoring backoff. Returns how many are left.
+        """
+
+        async def attempt() -> None:
+            if self._background:
+                await asyncio.gather(*self._background, return_exceptions=True)
+            await lanes.background.run(self._make_due)
+            if self.breaker.retry_after() == 0.0:
+                due = await lanes.background.run(self.claim, None, 500)
+                await asyncio.gather(
+                    *(self._deliver(batch) for batch in self._batches(due))
+                )
+
+        try:
+            await asyncio.wait_for(attempt(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except Exception as e:
+            logger.error("Activity queue flush failed", error=str(e))
+        counts = await lanes.background.run(self.stats)
+        return counts[PENDING] + counts[INFLIGHT]
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _batches(self, activities: List[Activity]) -> List[List[Activity]]:
+        if not self.coalesce:
+            return [[a] for a in activities]
+        by_lead: Dict[str, List[Activity]] = {}
+        batches = []
+        for activity in activities:
+            if activity.kind in ("summary", "disposition"):
+                by_lead.setdefault(activity.lead_key, []).append(activity)
+            else:
+                batches.append([activity])
+        for group in by_lead.values():
+            summaries = [a for a in group if a.kind == "summary"]
+            dispositions = [a for a in group if a.kind == "disposition"]
+            # Only activities never sent: one the backend may already have
+            # must keep going out alone under its own key.
+            unsent = all(a.attempts == 0 for a in group)
+            if len(summaries) == 1 and len(dispositions) == 1 and unsent:
+                batches.append([dispositions[0], summaries[0]])
+            else:
+                batches.extend([a] for a in group)
+        return batches
+
+    async def run(self, interval: float = ACTIVITY_POLL_SECONDS) -> None:
+        """Deliver due activities until cancelled."""
+        self._wakeup = asyncio.Event()
+        pruned_at = 0.0
+        while True:
+            try:
+                if time.monotonic() - pruned_at > ACTIVITY_PRUNE_SECONDS:
+                    pruned_at = time.monotonic()
+                    pruned = await lanes.background.run(self.prune)
+                    if pruned:
+                        logger.info(
+                            "Pruned finished CRM activities", rows=pruned
+                        )
+                # Nothing can be delivered until the breaker lets a probe through.
+                due = []
+                if self.breaker.retry_after() == 0.0:
+                    due = await lanes.background.run(self.claim)
+                if due:
+                    await asyncio.gather(
+                        *(self._deliver(batch) for batch in self._batches(due))
+                    )
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(
+                    "Activity queue delivery loop failed", error=str(e)
+                )
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+def _coalesced(activities: List[Activity]) -> Activity:
+    """The disposition with the summary folded into its notes."""
+    disposition, summary = activities
+    payload = dict(disposition.payload)
+    notes = [summary.payload.get("notes"), disposition.payload.get("notes")]
+    payload["notes"] = "\n\n".join(n for n in notes if n)
+    return Activity(
+        disposition.key,
+        disposition.kind,
+        disposition.lead_key,
+        disposition.url,
+        disposition.headers,
+        payload,
+        disposition.attempts,
+    )
+
+
+activity_queue = ActivityQueue()
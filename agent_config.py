@@ -0,0 +1,291 @@
+"""
+Per-agent configuration compiled once and cached by (agent_id, version).
+
+Everything about a call that depends only on the agent -- the static
+message prefix (tool instructions + agent prompt), tool schemas, its
+fingerprint, the LLM and TTS settings -- is built into an immutable
+AgentConfig the first time a worker sees that agent version. Call setup
+then only adds the per-lead variables, in a message after the static
+prefix so the prefix stays cacheable (see prompt_cache.py).
+
+Call data in Redis may carry either:
+
+- agent_version (+ variables, and prompt_template/voice_id or a stored
+  agent_config:<agent_id>:<version> entry): the prompt template is cached
+  per version and lead variables are merged per call; or
+- a fully rendered prompt (legacy): it already holds the lead's details, so
+  the config is compiled for that call and not cached.
+
+The backend publishes agent updates on AGENT_CONFIG_CHANNEL; every worker
+listening drops the cached versions of that agent.
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from prompt_cache import build_llm_messages, prefix_fingerprint
+from tools import CRM_TOOLS
+from utils.logging import logger
+from utils.redis_client import AGENT_CONFIG_CHANNEL, RedisClient
+
+AGENT_CONFIG_CACHE_SIZE = int(os.getenv("AGENT_CONFIG_CACHE_SIZE", "256"))
+DEFAULT_VOICE_ID = "9BWtsMINqrJLrRacOk9x"
+DEFAULT_LLM_MODEL = "gpt-4o-mini"
+
+_PLACEHOLDER = re.compile(r"\{\{\s*([\w.-]+)\s*\}\}")
+
+
+@dataclass(frozen=True)
+class AgentConfig:
+    agent_id: str
+    version: str
+    messages: Tuple[dict, ...]
+    placeholders: Tuple[str, ...]
+    tools: list
+    tool_names: Tuple[str, ...]
+    fingerprint: str
+    llm_settings: dict
+    tts_settings: dict
+
+    def call_messages(self, variables: Optional[dict] = None) -> list:
+        """Fresh message list for one call: the static prefix plus lead variables."""
+        messages = [dict(m) for m in self.messages]
+        merged = lead_variables_message(variables, self.placeholders)
+        if merged:
+            messages.append(merged)
+        return messages
+
+
+def lead_variables_message(
+    variables: Optional[dict], placeholders: Tuple[str, ...] = ()
+) -> Optional[dict]:
+    """System message carrying the per-lead values for the prompt's placeholders."""
+    if not variables:
+        return None
+    names = placeholders or tuple(variables)
+    lines = [
+        f"{name}: {variables[name]}" for name in names if name in variables
+    ]
+    if not lines:
+        return None
+    return {
+        "role": "system",
+        "content": "Details for this call"
+        " (fill any {{placeholder}} above with these):\n" + "\n".join(lines),
+    }
+
+
+def compile_agent_config(
+    agent_id: str,
+    version: str,
+    prompt: str,
+    voice_id: Optional[str] = None,
+    model: Optional[str] = None,
+) -> AgentConfig:
+    messages = build_llm_messages(prompt)
+    return AgentConfig(
+        agent_id=agent_id,
+        version=version,
+        messages=tuple(messages),
+        placeholders=tuple(dict.fromkeys(_PLACEHOLDER.findall(prompt))),
+        tools=CRM_TOOLS,
+        tool_names=tuple(t["function"]["name"] for t in CRM_TOOLS),
+        fingerprint=prefix_fingerprint(messages),
+        llm_settings={
+            "model": model or DEFAULT_LLM_MODEL,
+            "cache_key": f"agent:{agent_id}",
+        },
+        tts_settings={"voice_id": voice_id or DEFAULT_VOICE_ID},
+    )
+
+
+class AgentConfigCache:
+    """LRU of compiled AgentConfigs keyed by (agent_id, version)."""
+
+    def __init__(self, max_size: int = AGENT_CONFIG_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self._configs: "OrderedDict[Tuple[str, str], AgentConfig]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, agent_id: str, version: str) -> Optional[AgentConfig]:
+        with self._lock:
+            config = self._configs.get((agent_id, version))
+            if config is None:
+                self.misses += 1
+                return None
+            self._configs.move_to_end((agent_id, version))
+            self.hits += 1
+            return config
+
+    def put(self, config: AgentConfig) -> None:
+        with self._lock:
+            self._configs[(config.agent_id, config.version)] = config
+            self._configs.move_to_end((config.agent_id, config.version))
+            while len(self._configs) > self.max_size:
+                self._configs.popitem(last=False)
+
+    def invalidate(self, agent_id: Optional[str] = None) -> int:
+        """Drop every cached version of an agent (or everything)."""
+        with self._lock:
+            keys = [
+                k
+                for k in self._configs
+                if agent_id is None or k[0] == agent_id
+            ]
+            for key in keys:
+                del self._configs[key]
+            return len(keys)
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._configs),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+agent_configs = AgentConfigCache()
+
+
+def _prompt_version(prompt: str) -> str:
+    return "sha:" + hashlib.sha256(prompt.encode()).hexdigest()[:16]
+
+
+def resolve_agent_config(call_data: dict) -> Optional[AgentConfig]:
+    """
+    The compiled config for a call's agent, from the cache when possible.
+    Blocking on a miss that needs Redis; run it on lanes.live.
+    """
+    agent_id = call_data.get("agent_id")
+    if not agent_id:
+        return None
+
+    version = call_data.get("agent_version")
+    if version is not None:
+        version = str(version)
+        config = agent_configs.get(agent_id, version)
+        if config is not None:
+            return config
+        # Only a template may be cached per version; a rendered prompt
+        # belongs to one lead.
+        source = call_data
+        if not call_data.get("prompt_template"):
+            source = RedisClient.get_agent_config(agent_id, version) or {}
+        if source.get("prompt_template"):
+            return _compile_and_cache(
+                agent_id, version, source["prompt_template"], source
+            )
+
+    prompt = call_data.get("prompt")
+    if not prompt:
+        return None
+    # A rendered prompt is per lead, so it would never be hit again: compile
+    # it for this call only, keeping it (and the lead's details) out of the LRU.
+    return compile_agent_config(
+        agent_id,
+        _prompt_version(prompt),
+        prompt,
+        voice_id=call_data.get("voice_id"),
+        model=call_data.get("llm_model"),
+    )
+
+
+def _compile_and_cache(
+    agent_id: str, version: str, prompt: str, source: dict
+) -> AgentConfig:
+    config = compile_agent_config(
+        agent_id,
+        version,
+        prompt,
+        voice_id=source.get("voice_id"),
+        model=source.get("llm_model"),
+    )
+    agent_configs.put(config)
+    logger.info(
+        "Compiled agent config",
+        agent_id=agent_id,
+        version=version,
+        fingerprint=config.fingerprint,
+    )
+    return config
+
+
+async def listen_for_invalidations(retry_seconds: float = 5.0) -> None:
+    """
+    Drop cached configs when the backend publishes an agent update.
+
+    The subscription blocks for as long as the worker runs, so it polls on
+    its own daemon thread rather than holding a lane worker; messages are
+    handled back on the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+    threading.Thread(
+        target=_listen,
+        args=(loop, stop, retry_seconds),
+        name="agent-config-invalidations",
+        daemon=True,
+    ).start()
+    try:
+        await loop.create_future()
+    finally:
+        stop.set()
+
+
+def _listen(
+    loop: asyncio.AbstractEventLoop,
+    stop: threading.Event,
+    retry_seconds: float,
+) -> None:
+    while not stop.is_set():
+        pubsub = None
+        try:
+            pubsub = RedisClient.subscribe(AGENT_CONFIG_CHANNEL)
+            if pubsub is None:
+                stop.wait(retry_seconds)
+                continue
+            while not stop.is_set():
+                message = pubsub.get_message(True, 1.0)
+                if message and message.get("type") == "message":
+                    loop.call_soon_threadsafe(
+                        _handle_invalidation, message.get("data")
+                    )
+        except Exception as e:
+            if loop.is_closed():
+                return
+            logger.warning(
+                "Agent config invalidation listener failed", error=str(e)
+            )
+            stop.wait(retry_seconds)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+def _handle_invalidation(data: object) -> None:
+    # Payload: an agent_id, {"agent_id": ...}, or "*" for everything.
+    agent_id = data
+    try:
+        parsed = json.loads(data)
+        if isinstance(parsed, dict):
+            agent_id = parsed.get("agent_id")
+    except (TypeError, ValueError):
+        pass
+    dropped = agent_configs.invalidate(
+        None if agent_id in ("*", None) else str(agent_id)
+    )
+    logger.info("Agent config invalidated", agent_id=agent_id, dropped=dropped)
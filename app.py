@@ -10,12 +10,30 @@ from fastapi import (
     WebSocket,
     Request,
     Response,
-    BackgroundTasks,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import HTMLResponse
+import twiml
 from utils.logging import logger
+from utils.call_context import CallContext, use_call_context
 from utils.redis_client import RedisClient
+from utils.tracing import span, start_trace
+from activity_queue import activity_queue
+from agent_config import listen_for_invalidations, resolve_agent_config
+from call_session import CallSession, session_counts
+import lanes
+import memory_accounting
+import rate_limits
+from call_recording import CALL_RECORDING, start_recorder, wait_for_uploads
+from transcript_log import start_transcript_log
+from circuit_breaker import backend_breaker
+from drain import drainer
+from tools import registry as tool_registry
+from capacity import (
+    SHED_REDIRECT_ATTEMPTS,
+    capacity,
+    fleet_has_capacity,
+    publish_load_forever,
+)
 from twilio.rest import Client
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
@@ -25,7 +43,22 @@ load_dotenv(override=True)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Blocking calls on the call path get the live lane's threads.
+    lanes.install()
+    background = [
+        asyncio.create_task(publish_load_forever()),
+        asyncio.create_task(activity_queue.run()),
+        asyncio.create_task(listen_for_invalidations()),
+        asyncio.create_task(rate_limits.refresh_fleet_share_forever()),
+    ]
+    # SIGTERM drains live calls before the server is told to stop.
+    drainer.install()
+    memory_accounting.enable()
     yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await wait_for_uploads()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -52,7 +85,7 @@ def _forward_call_status_webhook(
             timeout=10,
         )
     except Exception as e:
-        print(f"Failed to proxy Twilio webhook to backend: {e}")
+        logger.error("Failed to proxy Twilio webhook to backend", error=str(e))
 
 
 @app.get("/")
@@ -60,39 +93,104 @@ async def hello() -> dict:
     try:
         return {"message": "Successfully running Cat."}
     except Exception as e:
-        print("Failed to get / route.............")
+        logger.error("Failed to get / route", error=str(e))
+
+
+@app.get("/ready")
+async def ready() -> Response:
+    """Readiness: 503 once the worker is draining on shutdown."""
+    if capacity.draining:
+        return Response(status_code=503, content="draining")
+    return Response(content="ready")
+
+
+@app.get("/capacity")
+async def get_capacity() -> dict:
+    return capacity.snapshot()
+
+
+@app.get("/call-sessions")
+async def get_call_sessions() -> dict:
+    """Open call sessions and the per-call objects still alive."""
+    return session_counts()
+
+
+@app.get("/memory")
+async def get_memory(collect: bool = False) -> dict:
+    """Per-call memory accounting totals (MEMORY_ACCOUNTING=true)."""
+    return await memory_accounting.summary(collect)
+
+
+@app.get("/lanes")
+async def get_lanes() -> dict:
+    """Per-lane utilization, running and queued work, and queue waits."""
+    return lanes.snapshot()
+
+
+@app.get("/rate-limits")
+async def get_rate_limits() -> dict:
+    """Remaining provider quota on this worker, and waits by priority."""
+    return rate_limits.snapshot()
+
+
+@app.get("/tool-metrics")
+async def get_tool_metrics() -> dict:
+    """Per-tool call, validation-failure and latency counters."""
+    return tool_registry.metrics()
+
+
+@app.get("/circuit-breaker")
+async def get_circuit_breaker() -> dict:
+    """State, adaptive timeout and transition counts of the backend breaker."""
+    return backend_breaker.snapshot()
+
+
+@app.get("/activity-queue")
+async def get_activity_queue(key: str = "") -> dict:
+    """Delivery status of CRM activities: counts, or one activity by key."""
+    if key:
+        return await lanes.background.run(activity_queue.status, key) or {}
+    return await lanes.background.run(activity_queue.stats)
+
+
+async def _shed_call_twiml(request: Request) -> bytes:
+    """
+    TwiML for a call that landed on a full worker: send it back through the
+    load balancer while other workers have room, otherwise end the call.
+    """
+    attempt = int(request.query_params.get("attempt", "0") or 0)
+    if (
+        attempt < SHED_REDIRECT_ATTEMPTS
+        and await lanes.live.run(fleet_has_capacity) is not False
+    ):
+        params = dict(request.query_params)
+        params["attempt"] = str(attempt + 1)
+        return twiml.redirect_twiml(request.headers.get("host", ""), tuple(params.items()))
+    return twiml.BUSY
 
 
 @app.post("/agent")
 async def agent(request: Request):
     try:
-        print("hititng twiml...........................")
-        call_id = request.query_params.get("call_id", "").strip()
-        stream_param_block = ""
-        if call_id:
-            stream_param_block = (
-                f'<Parameter name="call_id" value="{call_id}" />'
+        if not capacity.has_capacity():
+            logger.warning("Worker at capacity, shedding call", **capacity.snapshot())
+            return Response(
+                content=await _shed_call_twiml(request),
+                media_type="application/xml",
             )
-
-        twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
-            <Response>
-                <Connect>
-                    <Stream url="wss://{request.headers.get("host")}/ws">
-                        {stream_param_block}
-                    </Stream>
-                </Connect>
-                <Say>The bot connection has been terminated.</Say>
-            </Response>"""
-        return HTMLResponse(content=twiml, media_type="application/xml")
+        return Response(
+            content=twiml.stream_twiml(
+                request.headers.get("host", ""),
+                request.query_params.get("call_id", "").strip(),
+            ),
+            media_type="application/xml",
+        )
     except Exception as e:
-        print(f"failed to make call using agent {e}")
+        logger.error("Failed to make call using agent", error=str(e))
 
 
 @app.post("/api/v1/call/webhook")
-async def proxy_call_status_webhook(
-    request: Request,
-    background_tasks: BackgroundTasks,
-):
+async def proxy_call_status_webhook(request: Request):
     """
     Relay Twilio status callbacks to voice-crm backend.
     This allows using a single public ngrok URL (agent) while backend runs locally.
@@ -106,7 +204,8 @@ async def proxy_call_status_webhook(
     content_type = request.headers.get(
         "content-type", "application/x-www-form-urlencoded"
     )
-    background_tasks.add_task(
+    # Its own bounded lane, not the server's shared threadpool.
+    lanes.webhooks.submit(
         _forward_call_status_webhook,
         target_url,
         raw_body,
@@ -115,113 +214,146 @@ async def proxy_call_status_webhook(
     return Response(status_code=204)
 
 
+def _start_twilio_recording(account_sid: str, call_sid: str) -> None:
+    twilio = Client(account_sid, os.getenv("TWILIO_AUTH_TOKEN"))
+    twilio.calls(call_sid).recordings.create()
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    if not capacity.try_acquire():
+        logger.warning("Worker at capacity, rejecting stream", **capacity.snapshot())
+        await websocket.close(code=1013, reason="Worker at capacity")
+        return
+    session = CallSession(websocket)
     try:
-        print(
-            "websocket connection initiated...................................."
-        )
+        logger.debug("Websocket connection initiated")
         await websocket.accept()
         start_data = websocket.iter_text()
         await start_data.__anext__()
         call_data = json.loads(await start_data.__anext__())
-        logger.info(call_data=call_data)
+        logger.info("Twilio media stream started", call_data=call_data)
         call_data_start = call_data["start"]
-        print("websocket_connection accepted------------------------------")
-        twilio = Client(
-            call_data_start["accountSid"],
-            os.getenv("TWILIO_AUTH_TOKEN"),
-        )
+        logger.debug("Websocket connection accepted")
         call_sid = call_data_start["callSid"]
-        twilio.calls(call_sid).recordings.create()
-        print("started recording calls...........................")
-
         custom_params = call_data_start.get("customParameters") or {}
         call_id = str(custom_params.get("call_id") or "").strip()
         redis_lookup_key = call_id or call_sid
-
-        # Fetch prompt and metadata from Redis.
-        # Twilio media stream can arrive slightly before backend persistence completes.
-        redis_data = RedisClient.get_call_prompt(redis_lookup_key)
-
-        print("got some redis data-----------------", redis_data)
-
-        if not redis_data:
-            print(
-                f"No prompt data found in Redis for call "
-                f"call_id={call_id or 'n/a'}, call_sid={call_sid}"
+        session.claim(call_sid, redis_lookup_key)
+
+        with start_trace(
+            "call",
+            trace_header=websocket.headers.get("x-cloud-trace-context"),
+            call_sid=call_sid,
+            call_id=call_id or None,
+        ):
+            # Pipeline recording taps the call's audio in process; otherwise
+            # ask Twilio to record, off the event loop.
+            session.recorder = start_recorder(call_sid)
+            if session.recorder is None and CALL_RECORDING != "off":
+                with span("twilio.start_recording"):
+                    await lanes.live.run(
+                        _start_twilio_recording, call_data_start["accountSid"], call_sid
+                    )
+                logger.info("Started call recording", call_sid=call_sid)
+
+            # Fetch prompt and metadata from Redis.
+            # Twilio media stream can arrive slightly before backend persistence completes.
+            with span("redis.get_call_prompt"):
+                redis_data = await lanes.live.run(
+                    RedisClient.get_call_prompt, redis_lookup_key
+                )
+
+            logger.debug(
+                "Fetched call data from Redis",
+                call_sid=call_sid,
+                fields=sorted(redis_data) if redis_data else None,
             )
-            await websocket.close(
-                code=1011, reason="Call prompt not found in cache"
+
+            if not redis_data:
+                logger.warning(
+                    "No prompt data found in Redis for call",
+                    call_id=call_id or None,
+                    call_sid=call_sid,
+                )
+                await websocket.close(
+                    code=1011, reason="Call prompt not found in cache"
+                )
+                return
+
+            # Extract data from Redis
+            agent_id = redis_data.get("agent_id")
+            workspace_id = redis_data.get("workspace_id")
+            agent_name = redis_data.get("agent_name")
+            lead_id = redis_data.get("lead_id")
+            auth_header = redis_data.get("auth_header")
+
+            # Compiled once per agent version; only lead variables vary per call.
+            with span("agent_config.resolve"):
+                agent_config = await lanes.live.run(resolve_agent_config, redis_data)
+
+            if not agent_id or agent_config is None:
+                logger.warning("Incomplete data in Redis for call", call_sid=call_sid)
+                await websocket.close(code=1011, reason="Invalid call metadata")
+                return
+
+            logger.info(
+                "Agent validated",
+                agent_name=agent_name,
+                agent_id=agent_id,
+                agent_version=agent_config.version,
+                call_sid=call_sid,
             )
-            return
-
-        # Extract data from Redis
-        agent_id = redis_data.get("agent_id")
-        workspace_id = redis_data.get("workspace_id")
-        prompt = redis_data.get("prompt")
-        agent_name = redis_data.get("agent_name")
-        lead_id = redis_data.get("lead_id")
-        auth_header = redis_data.get("auth_header")
-
-        if not agent_id or not prompt:
-            print(f"Incomplete data in Redis for call {call_sid}")
-            await websocket.close(code=1011, reason="Invalid call metadata")
-            return
-
-        print(f"Agent validated: {agent_name} (ID: {agent_id})")
-        print(f"Using processed prompt: {prompt[:100]}...")
-
-        call_metadata = {
-            "agent_id": agent_id,
-            "workspace_id": workspace_id,
-            "lead_id": lead_id,
-            "call_sid": call_sid,
-            "call_id": call_id or None,
-            "auth_header": auth_header,
-        }
-
-        from bot import run_bot
-
-        await run_bot(
-            websocket,
-            call_data_start["streamSid"],
-            call_sid,
-            call_data_start["accountSid"],
-            prompt=prompt,
-            agent_name=agent_name,
-            call_metadata=call_metadata,
-        )
 
-        # Cleanup Redis data
-        RedisClient.delete_call_prompt(redis_lookup_key)
-        print(f"Deleted Redis data for key {redis_lookup_key}")
+            call = CallContext(
+                agent_id=agent_id,
+                workspace_id=workspace_id,
+                lead_id=lead_id,
+                call_sid=call_sid,
+                call_id=call_id or None,
+                auth_header=auth_header,
+            )
 
-        # Keep the connection open until websocket is closed by client
-        try:
-            while True:
-                data = await websocket.receive_text()
-                if not data:
-                    break
-        except Exception:
-            # Client disconnected or connection error
-            pass
+            session.transcript_log = start_transcript_log(
+                call_sid, questions=redis_data.get("analysis_questions")
+            )
 
-        print("bot run successful.....................................")
+            from bot import run_bot
+
+            session.memory = await memory_accounting.start_probe(call_sid)
+            with use_call_context(call), span("bot.run"):
+                await run_bot(
+                    websocket,
+                    call_data_start["streamSid"],
+                    call_sid,
+                    call_data_start["accountSid"],
+                    agent_config=agent_config,
+                    agent_name=agent_name,
+                    call=call,
+                    lead_variables=redis_data.get("variables"),
+                    recorder=session.recorder,
+                    transcript_log=session.transcript_log,
+                    session=session,
+                )
+
+            logger.info("Bot run finished", call_sid=call_sid)
     except Exception as e:
-        print(
-            f"Failed to make call to AI chatbot.................................... {e}"
-        )
+        logger.error("Failed to make call to AI chatbot", error=str(e))
         try:
             await websocket.close(code=1011, reason="Agent websocket failure")
         except Exception:
             pass
+    finally:
+        # Pipeline, websocket, call slot, Redis claim and transcript, once.
+        await session.close()
 
 
 def shutdown_handler(signal_int: int, frame: FrameType) -> None:
     logger.info(f"Caught Signal {signal.strsignal(signal_int)}")
+    from utils import tracing
     from utils.logging import flush
 
+    tracing.flush()
     flush()
     # Safely exit program
     sys.exit(0)
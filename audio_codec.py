@@ -0,0 +1,291 @@
+"""
+Vectorized μ-law/PCM codec path for Twilio media streams.
+
+The stock TwilioFrameSerializer decodes every 20 ms media message through
+several intermediate bytes objects (base64 -> μ-law -> PCM -> resampled PCM).
+This module does the same work with lookup tables over NumPy views:
+
+- μ-law <-> 16-bit PCM through precomputed 256- and 65536-entry tables
+- integer-ratio resampling (8 kHz <-> 16/24/48 kHz) with streaming state
+- per-serializer scratch buffers that are grown once and then reused
+
+FastTwilioFrameSerializer uses it for media frames and defers everything
+else (DTMF, hang-up, interruptions) to TwilioFrameSerializer. Non-integer
+rate ratios fall back to the stock resampler.
+"""
+
+import binascii
+import json
+from typing import Optional, Union
+
+import numpy as np
+from pipecat.frames.frames import AudioRawFrame, Frame, InputAudioRawFrame
+from pipecat.serializers.twilio import TwilioFrameSerializer
+
+
+def _build_ulaw_decode_table() -> np.ndarray:
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    t = (((u & 0x0F) << 3) + 0x84) << ((u & 0x70) >> 4)
+    return np.where(u & 0x80, 0x84 - t, t - 0x84).astype(np.int16)
+
+
+def _build_ulaw_encode_table() -> np.ndarray:
+    # G.711 encoder over every 16-bit sample, indexed by the sample's
+    # unsigned 16-bit bit pattern.
+    pcm = np.arange(65536, dtype=np.int32).astype(np.uint16).view(np.int16)
+    val = pcm.astype(np.int32) >> 2
+    mask = np.where(val < 0, 0x7F, 0xFF)
+    val = np.minimum(np.abs(val), 8159) + 0x21
+    seg_ends = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+    seg = np.searchsorted(seg_ends, val)
+    uval = np.where(
+        seg >= 8,
+        0x7F,
+        (seg << 4) | ((val >> (np.minimum(seg, 7) + 1)) & 0x0F),
+    )
+    return (uval ^ mask).astype(np.uint8)
+
+
+ULAW_TO_PCM = _build_ulaw_decode_table()
+ULAW_TO_PCM32 = ULAW_TO_PCM.astype(np.int32)
+PCM_TO_ULAW = _build_ulaw_encode_table()
+
+
+class _ScratchBuffer:
+    """Grow-only scratch array; returns views sized to each frame."""
+
+    __slots__ = ("_buf",)
+
+    def __init__(self, dtype: type, size: int = 0) -> None:
+        self._buf = np.empty(size, dtype=dtype)
+
+    def take(self, n: int) -> np.ndarray:
+        if self._buf.size < n:
+            self._buf = np.empty(
+                max(n, self._buf.size * 2), dtype=self._buf.dtype
+            )
+        return self._buf[:n]
+
+
+def ulaw_decode(ulaw: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """μ-law bytes (or any buffer) to int16 samples."""
+    codes = np.frombuffer(ulaw, dtype=np.uint8)
+    return ULAW_TO_PCM.take(codes, out=out)
+
+
+def ulaw_encode(
+    pcm: np.ndarray, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """int16 samples to μ-law codes."""
+    return PCM_TO_ULAW.take(pcm.view(np.uint16), out=out)
+
+
+def _lowpass_taps(factor: int, taps_per_phase: int = 8) -> np.ndarray:
+    n = factor * taps_per_phase + 1
+    t = np.arange(n) - (n - 1) / 2
+    taps = np.sinc(t / factor) * np.hamming(n)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+class StreamUpsampler:
+    """
+    Integer-factor upsampler (linear interpolation) with carried state.
+    The returned array is a scratch view, valid until the next call.
+    """
+
+    def __init__(self, factor: int) -> None:
+        self.factor = factor
+        self._frac = (np.arange(1, factor + 1, dtype=np.float32) / factor)[
+            np.newaxis, :
+        ]
+        self._prev = np.float32(0.0)
+        self._ext = _ScratchBuffer(np.float32)
+        self._diff = _ScratchBuffer(np.float32)
+        self._out = _ScratchBuffer(np.float32)
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        n = pcm.size
+        if n == 0:
+            return pcm
+        ext = self._ext.take(n + 1)
+        ext[0] = self._prev
+        ext[1:] = pcm
+        self._prev = ext[-1]
+        diff = np.subtract(ext[1:], ext[:-1], out=self._diff.take(n))
+        out = self._out.take(n * self.factor).reshape(n, self.factor)
+        np.multiply(diff[:, np.newaxis], self._frac, out=out)
+        out += ext[:-1, np.newaxis]
+        return out.reshape(-1)
+
+
+def _build_ulaw_pair_table() -> np.ndarray:
+    # Indexed by (previous code << 8 | code); each int32 entry holds the
+    # two 16 kHz output samples for one 8 kHz input sample, little-endian:
+    # the midpoint with the previous sample, then the sample itself.
+    prev = ULAW_TO_PCM32[np.arange(65536) >> 8]
+    cur = ULAW_TO_PCM32[np.arange(65536) & 0xFF]
+    mid = (prev + cur) >> 1
+    pairs = np.empty((65536, 2), dtype=np.int16)
+    pairs[:, 0] = mid
+    pairs[:, 1] = cur
+    return pairs.view("<i4").reshape(65536)
+
+
+ULAW_PAIR_TO_PCM16K = _build_ulaw_pair_table()
+
+
+class Ulaw8kTo16kUpsampler:
+    """
+    Fused μ-law decode and 2x upsampling for the inbound Twilio path: one
+    table lookup per input sample yields both output samples (the midpoint
+    with the previous sample, then the decoded sample).
+    """
+
+    def __init__(self) -> None:
+        self._prev = 0xFF  # μ-law silence
+        self._pairs = _ScratchBuffer(np.uint8)
+
+    def process(self, ulaw: bytes) -> np.ndarray:
+        codes = np.frombuffer(ulaw, dtype=np.uint8)
+        n = codes.size
+        pairs = self._pairs.take(2 * n)
+        pairs[0::2] = codes
+        pairs[1] = self._prev
+        pairs[3::2] = codes[:-1]
+        self._prev = codes[-1]
+        # Little-endian uint16 view: high byte previous code, low byte code.
+        index = pairs.view(np.uint16)
+        return ULAW_PAIR_TO_PCM16K.take(index).view(np.int16)
+
+
+class StreamDecimator:
+    """Integer-factor decimator (windowed-sinc FIR) with carried state."""
+
+    def __init__(self, factor: int) -> None:
+        self.factor = factor
+        self._taps = _lowpass_taps(factor)
+        self._history = np.zeros(self._taps.size - 1, dtype=np.float32)
+        self._phase = 0
+        self._work = _ScratchBuffer(np.float32)
+        self._out = _ScratchBuffer(np.float32)
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        """Filter and decimate; only the kept output samples are computed."""
+        n = pcm.size
+        h = self._history.size
+        count = len(range(self._phase, n, self.factor))
+        work = self._work.take(h + n)
+        work[:h] = self._history
+        work[h:] = pcm
+        # One row per output sample: the FIR window ending at that sample.
+        itemsize = work.itemsize
+        windows = np.ndarray(
+            (count, self._taps.size),
+            dtype=work.dtype,
+            buffer=work,
+            offset=self._phase * itemsize,
+            strides=(itemsize * self.factor, itemsize),
+        )
+        out = np.dot(windows, self._taps, out=self._out.take(count))
+        self._phase = (self._phase - n) % self.factor
+        self._history[:] = work[-h:]
+        return out
+
+
+def make_resampler(
+    in_rate: int, out_rate: int
+) -> Optional[Union["StreamUpsampler", "StreamDecimator"]]:
+    """Streaming resampler for an integer rate ratio, or None."""
+    if in_rate == out_rate:
+        return None
+    if out_rate > in_rate and out_rate % in_rate == 0:
+        return StreamUpsampler(out_rate // in_rate)
+    if in_rate > out_rate and in_rate % out_rate == 0:
+        return StreamDecimator(in_rate // out_rate)
+    return None
+
+
+def _to_int16(samples: np.ndarray, out: np.ndarray) -> np.ndarray:
+    np.minimum(samples, 32767, out=samples)
+    np.maximum(samples, -32768, out=samples)
+    out[:] = samples
+    return out
+
+
+class FastTwilioFrameSerializer(TwilioFrameSerializer):
+    """TwilioFrameSerializer with the vectorized codec path for media."""
+
+    def __init__(self, stream_sid: str, **kwargs: object) -> None:
+        super().__init__(stream_sid, **kwargs)
+        self._media_prefix = (
+            '{"event":"media","streamSid":'
+            + json.dumps(stream_sid)
+            + ',"media":{"payload":"'
+        )
+        self._in_pcm = _ScratchBuffer(np.int16)
+        self._in_float = _ScratchBuffer(np.float32)
+        self._in_out = _ScratchBuffer(np.int16)
+        self._out_float = _ScratchBuffer(np.float32)
+        self._out_pcm = _ScratchBuffer(np.int16)
+        self._out_ulaw = _ScratchBuffer(np.uint8)
+        self._fast_in = None
+        self._fast_out = {}
+
+    async def setup(self, frame: Frame) -> None:
+        await super().setup(frame)
+        if self._twilio_sample_rate == 8000 and self._sample_rate == 16000:
+            self._fast_in = Ulaw8kTo16kUpsampler()
+        else:
+            self._fast_in = make_resampler(
+                self._twilio_sample_rate, self._sample_rate
+            )
+
+    async def serialize(self, frame: Frame) -> str | bytes | None:
+        if not isinstance(frame, AudioRawFrame):
+            return await super().serialize(frame)
+
+        if frame.sample_rate not in self._fast_out:
+            self._fast_out[frame.sample_rate] = make_resampler(
+                frame.sample_rate, self._twilio_sample_rate
+            )
+        resampler = self._fast_out[frame.sample_rate]
+        if resampler is None and frame.sample_rate != self._twilio_sample_rate:
+            return await super().serialize(frame)
+
+        pcm = np.frombuffer(frame.audio, dtype=np.int16)
+        if resampler is not None:
+            samples = self._out_float.take(pcm.size)
+            samples[:] = pcm
+            resampled = resampler.process(samples)
+            pcm = _to_int16(resampled, self._out_pcm.take(resampled.size))
+        if pcm.size == 0:
+            return None
+
+        ulaw = ulaw_encode(pcm, out=self._out_ulaw.take(pcm.size))
+        payload = binascii.b2a_base64(memoryview(ulaw), newline=False)
+        return self._media_prefix + payload.decode("ascii") + '"}}'
+
+    async def deserialize(self, data: str | bytes) -> Frame | None:
+        message = json.loads(data)
+        if message.get("event") != "media" or (
+            self._fast_in is None
+            and self._sample_rate != self._twilio_sample_rate
+        ):
+            return await super().deserialize(data)
+
+        ulaw = binascii.a2b_base64(message["media"]["payload"])
+        if not ulaw:
+            return None
+        if isinstance(self._fast_in, Ulaw8kTo16kUpsampler):
+            pcm = self._fast_in.process(ulaw)
+        else:
+            pcm = ulaw_decode(ulaw, out=self._in_pcm.take(len(ulaw)))
+            if self._fast_in is not None:
+                samples = self._in_float.take(pcm.size)
+                samples[:] = pcm
+                resampled = self._fast_in.process(samples)
+                pcm = _to_int16(resampled, self._in_out.take(resampled.size))
+
+        return InputAudioRawFrame(
+            audio=pcm.tobytes(), num_channels=1, sample_rate=self._sample_rate
+        )
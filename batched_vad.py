@@ -0,0 +1,230 @@
+"""
+Silero VAD inference batched across concurrent calls.
+
+Every call's transport owns a VAD analyzer and, with the stock
+SileroVADAnalyzer, runs one ONNX inference per 32 ms chunk per call. Here all
+analyzers in a worker submit their chunks to a shared VADBatcher instead. Its
+inference threads drain the queue, stack whatever chunks arrived within a
+short window (one row per call, each with its own recurrent state) and run a
+single batched ONNX call, then resolve each caller's future.
+
+The event loop never runs inference: pipecat calls `analyze_audio` from the
+transport's executor thread, which only blocks on its own future.
+"""
+
+from concurrent.futures import Future
+from importlib import resources
+import os
+import queue
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+import onnxruntime
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+
+from utils.logging import logger
+
+VAD_BATCH_MAX = int(os.getenv("VAD_BATCH_MAX", "64"))
+VAD_BATCH_WAIT_MS = float(os.getenv("VAD_BATCH_WAIT_MS", "2"))
+VAD_BATCH_THREADS = int(os.getenv("VAD_BATCH_THREADS", "1"))
+VAD_RESULT_TIMEOUT = 1.0
+
+# Same cadence as pipecat's SileroVADAnalyzer.
+_MODEL_RESET_STATES_TIME = 5.0
+
+
+def _model_path() -> str:
+    return str(
+        resources.files("pipecat.audio.vad.data").joinpath("silero_vad.onnx")
+    )
+
+
+class VADStream:
+    """Recurrent state of one call's VAD, owned by the batcher threads."""
+
+    __slots__ = ("sample_rate", "state", "context")
+
+    def __init__(self, sample_rate: int) -> None:
+        self.sample_rate = sample_rate
+        self.reset()
+
+    @property
+    def context_size(self) -> int:
+        return 64 if self.sample_rate == 16000 else 32
+
+    def reset(self) -> None:
+        self.state = np.zeros((2, 1, 128), dtype=np.float32)
+        self.context = np.zeros((1, self.context_size), dtype=np.float32)
+
+
+class _Request:
+    __slots__ = ("stream", "audio", "future")
+
+    def __init__(self, stream: VADStream, audio: np.ndarray) -> None:
+        self.stream = stream
+        self.audio = audio
+        self.future: Future = Future()
+
+
+class VADBatcher:
+    """Shared inference threads that batch VAD chunks from many calls."""
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        max_batch: int = VAD_BATCH_MAX,
+        max_wait_ms: float = VAD_BATCH_WAIT_MS,
+        threads: int = VAD_BATCH_THREADS,
+    ) -> None:
+        opts = onnxruntime.SessionOptions()
+        opts.inter_op_num_threads = 1
+        opts.intra_op_num_threads = 1
+        self._session = onnxruntime.InferenceSession(
+            model_path or _model_path(),
+            providers=["CPUExecutionProvider"],
+            sess_options=opts,
+        )
+        self._max_batch = max_batch
+        self._max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self.batches = 0
+        self.chunks = 0
+        self._threads = [
+            threading.Thread(
+                target=self._run, name=f"vad-batcher-{i}", daemon=True
+            )
+            for i in range(threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, stream: VADStream, audio: np.ndarray) -> Future:
+        """Queue one chunk (float32, 512 @ 16 kHz or 256 @ 8 kHz)."""
+        request = _Request(stream, audio)
+        self._queue.put(request)
+        return request.future
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.chunks / self.batches if self.batches else 0.0
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._max_wait
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            by_rate = {}
+            for request in batch:
+                by_rate.setdefault(request.stream.sample_rate, []).append(
+                    request
+                )
+            for sample_rate, requests in by_rate.items():
+                try:
+                    self._infer(sample_rate, requests)
+                except Exception as e:
+                    logger.error(f"Batched VAD inference failed: {e}")
+                    for request in requests:
+                        if not request.future.done():
+                            request.future.set_result(0.0)
+
+    def _infer(self, sample_rate: int, requests: List[_Request]) -> None:
+        x = np.concatenate(
+            [
+                np.concatenate(
+                    (r.stream.context, r.audio[np.newaxis, :]), axis=1
+                )
+                for r in requests
+            ]
+        )
+        state = np.concatenate([r.stream.state for r in requests], axis=1)
+        out, new_state = self._session.run(
+            None,
+            {
+                "input": x,
+                "state": state,
+                "sr": np.array(sample_rate, dtype=np.int64),
+            },
+        )
+        self.batches += 1
+        self.chunks += len(requests)
+        context_size = requests[0].stream.context_size
+        for i, request in enumerate(requests):
+            request.stream.state = new_state[:, i : i + 1, :]
+            request.stream.context = x[i : i + 1, -context_size:]
+            request.future.set_result(float(out[i][0]))
+
+
+_batcher: Optional[VADBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_vad_batcher() -> VADBatcher:
+    """The worker-wide batcher, created on first use."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = VADBatcher()
+        return _batcher
+
+
+class BatchedSileroVADAnalyzer(VADAnalyzer):
+    """Drop-in SileroVADAnalyzer that runs inference on the shared batcher."""
+
+    def __init__(
+        self,
+        *,
+        sample_rate: Optional[int] = None,
+        params: Optional[VADParams] = None,
+        batcher: Optional[VADBatcher] = None,
+    ) -> None:
+        super().__init__(sample_rate=sample_rate, params=params)
+        self._batcher = batcher or get_vad_batcher()
+        self._stream: Optional[VADStream] = None
+        self._last_reset_time = 0.0
+
+    def set_sample_rate(self, sample_rate: int) -> None:
+        if sample_rate not in (8000, 16000):
+            raise ValueError(
+                "Silero VAD sample rate needs to be 16000 or 8000"
+                f" (sample rate: {sample_rate})"
+            )
+        super().set_sample_rate(sample_rate)
+        self._stream = VADStream(self.sample_rate)
+
+    def num_frames_required(self) -> int:
+        return 512 if self.sample_rate == 16000 else 256
+
+    def voice_confidence(self, buffer: bytes) -> float:
+        try:
+            audio = (
+                np.frombuffer(buffer, np.int16).astype(np.float32) / 32768.0
+            )
+            confidence = self._batcher.submit(self._stream, audio).result(
+                timeout=VAD_RESULT_TIMEOUT
+            )
+
+            # Reset periodically, as the stock analyzer does, so the
+            # recurrent state doesn't drift over long calls.
+            now = time.time()
+            if now - self._last_reset_time >= _MODEL_RESET_STATES_TIME:
+                self._stream.reset()
+                self._last_reset_time = now
+
+            return confidence
+        except Exception as e:
+            logger.error(f"Error analyzing audio with batched Silero VAD: {e}")
+            return 0
@@ -0,0 +1,159 @@
+"""
+Streaming answering-machine beep detection with a Goertzel filter bank.
+
+A voicemail beep is a single tone, usually somewhere between 400 and 2100 Hz,
+lasting a few hundred milliseconds. Every 20 ms block of inbound audio is
+measured against a bank of tone filters 25 Hz apart. A block is tonal when
+one filter holds most of the block's energy. A beep is a run of tonal blocks
+at the same pitch lasting at least BEEP_MIN_SECONDS. It is reported when the
+tone stops, which is the moment to start speaking a voicemail message.
+
+Each filter's output equals one Goertzel recurrence over the block. Written
+as a (2F x N) cosine/sine basis, the whole bank runs as a single
+matrix-vector product, not a per-sample Python loop. The block, basis and
+outputs are allocated once per stream, and frames of any size are copied into
+the block as they arrive.
+
+BeepDetectorProcessor wraps it for the pipeline, next to transport.input().
+"""
+
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+from pipecat.frames.frames import Frame, InputAudioRawFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+BEEP_MIN_SECONDS = float(os.getenv("BEEP_MIN_SECONDS", "0.12"))
+BEEP_TONE_RATIO = 0.6
+BEEP_MIN_POWER = 1e4  # mean square of int16 samples, about -50 dBFS
+BEEP_FREQUENCIES = np.arange(400.0, 2101.0, 25.0)
+BLOCK_MS = 20
+
+
+class GoertzelBank:
+    """Power at a fixed set of frequencies over blocks of block_size samples."""
+
+    __slots__ = ("size", "_basis", "_out", "_power")
+
+    def __init__(
+        self, frequencies: np.ndarray, sample_rate: int, block_size: int
+    ) -> None:
+        phase = np.outer(
+            2 * np.pi * np.asarray(frequencies) / sample_rate,
+            np.arange(block_size),
+        )
+        self.size = len(frequencies)
+        self._basis = np.concatenate([np.cos(phase), np.sin(phase)]).astype(
+            np.float32
+        )
+        self._out = np.empty(2 * self.size, dtype=np.float32)
+        self._power = np.empty(self.size, dtype=np.float32)
+
+    def power(self, block: np.ndarray) -> np.ndarray:
+        """|X(f)|^2 per frequency; the returned array is reused."""
+        np.dot(self._basis, block, out=self._out)
+        np.square(self._out, out=self._out)
+        np.add(self._out[: self.size], self._out[self.size :], out=self._power)
+        return self._power
+
+
+class BeepDetector:
+    """Per-call streaming state: feed int16 frames, get (hz, seconds) per beep."""
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frequencies: np.ndarray = BEEP_FREQUENCIES,
+        min_seconds: float = BEEP_MIN_SECONDS,
+        tone_ratio: float = BEEP_TONE_RATIO,
+        min_power: float = BEEP_MIN_POWER,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.block_size = sample_rate * BLOCK_MS // 1000
+        self.block_seconds = self.block_size / sample_rate
+        self.frequencies = np.asarray(frequencies, dtype=np.float64)
+        self.min_seconds = min_seconds
+        # For a pure tone at a filter frequency, 2|X|^2 == N * sum(x^2).
+        self._tone_threshold = tone_ratio * self.block_size / 2
+        self._min_energy = min_power * self.block_size
+        self._bank = GoertzelBank(
+            self.frequencies, sample_rate, self.block_size
+        )
+        self._block = np.zeros(self.block_size, dtype=np.float32)
+        self._fill = 0
+        self._tone_index = -1
+        self._tone_blocks = 0
+
+    def feed(self, samples: np.ndarray) -> Optional[Tuple[float, float]]:
+        """Add int16 samples; (frequency, seconds) if a beep ended in them."""
+        beep = None
+        pos, size = 0, samples.size
+        while pos < size:
+            take = min(self.block_size - self._fill, size - pos)
+            self._block[self._fill : self._fill + take] = samples[
+                pos : pos + take
+            ]
+            self._fill += take
+            pos += take
+            if self._fill == self.block_size:
+                self._fill = 0
+                beep = self._analyze() or beep
+        return beep
+
+    def _analyze(self) -> Optional[Tuple[float, float]]:
+        block = self._block
+        energy = float(np.dot(block, block))
+        index = -1
+        if energy >= self._min_energy:
+            power = self._bank.power(block)
+            peak = int(power.argmax())
+            if power[peak] >= self._tone_threshold * energy:
+                index = peak
+
+        # The filters overlap, so a steady tone may wander by a filter or two.
+        if index >= 0 and (
+            self._tone_blocks == 0 or abs(index - self._tone_index) <= 2
+        ):
+            if self._tone_blocks == 0:
+                self._tone_index = index
+            self._tone_blocks += 1
+            return None
+
+        beep = self._end_tone()
+        if index >= 0:
+            self._tone_index, self._tone_blocks = index, 1
+        return beep
+
+    def _end_tone(self) -> Optional[Tuple[float, float]]:
+        seconds = self._tone_blocks * self.block_seconds
+        frequency = float(self.frequencies[self._tone_index])
+        self._tone_blocks = 0
+        if seconds + 1e-9 < self.min_seconds:
+            return None
+        return frequency, round(seconds, 3)
+
+
+class BeepDetectorProcessor(FrameProcessor):
+    """Passes audio through and fires on_beep(frequency, seconds) as a beep ends."""
+
+    def __init__(self, **kwargs: object) -> None:
+        super().__init__(**kwargs)
+        self.enabled = True
+        self._detector: Optional[BeepDetector] = None
+        self._register_event_handler("on_beep")
+
+    async def process_frame(
+        self, frame: Frame, direction: FrameDirection
+    ) -> None:
+        await super().process_frame(frame, direction)
+
+        if self.enabled and isinstance(frame, InputAudioRawFrame):
+            detector = self._detector
+            if detector is None or detector.sample_rate != frame.sample_rate:
+                detector = self._detector = BeepDetector(frame.sample_rate)
+            beep = detector.feed(np.frombuffer(frame.audio, dtype=np.int16))
+            if beep is not None:
+                await self._call_event_handler("on_beep", *beep)
+
+        await self.push_frame(frame, direction)
@@ -0,0 +1,64 @@
+"""
+Microbenchmark: /agent TwiML requests per second on one core.
+
+Drives the FastAPI app directly over ASGI (no sockets), so the number is the
+handler, routing and response cost a worker pays per dial. "repeat" sends one
+call_id over and over (Twilio retries, cache hits); "unique" sends a new
+call_id per request, as a campaign start does.
+
+    python -m benchmarks.bench_agent --requests 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+from app import app
+import twiml
+
+
+async def _post(path: str, query: str) -> None:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "https",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": [(b"host", b"voice.example.test")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("voice.example.test", 443),
+    }
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+
+    await app(scope, receive, send)
+
+
+async def _bench(requests: int, unique: bool) -> float:
+    start = time.perf_counter()
+    for n in range(requests):
+        await _post("/agent", f"call_id=call-{n if unique else 0}")
+    return requests / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    for label, unique in (("repeat", False), ("unique", True)):
+        rps = asyncio.run(_bench(args.requests, unique))
+        print(f"/agent {label} call_id: {rps:,.0f} req/s")
+    print(f"cache: {twiml.cache_info()['stream']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Microbenchmark: Twilio media frames/sec per core, stock vs fast serializer.
+
+inbound:  20 ms μ-law media JSON @ 8 kHz -> InputAudioRawFrame @ 16 kHz
+outbound: 40 ms PCM OutputAudioRawFrame @ 24 kHz -> μ-law media JSON
+
+    python -m benchmarks.bench_audio_codec --frames 20000
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import time
+
+import numpy as np
+from pipecat.frames.frames import OutputAudioRawFrame, StartFrame
+from pipecat.serializers.twilio import TwilioFrameSerializer
+
+from audio_codec import FastTwilioFrameSerializer
+
+IN_RATE = 16000
+OUT_RATE = 24000
+
+
+def _serializer(cls: type) -> TwilioFrameSerializer:
+    params = TwilioFrameSerializer.InputParams(auto_hang_up=False)
+    return cls("MZ00000000000000000000000000000000", params=params)
+
+
+async def _bench(cls: type, frames: int) -> dict:
+    serializer = _serializer(cls)
+    await serializer.setup(
+        StartFrame(
+            audio_in_sample_rate=IN_RATE, audio_out_sample_rate=OUT_RATE
+        )
+    )
+    rng = np.random.default_rng(0)
+    ulaw = rng.integers(0, 256, 160, dtype=np.uint8).tobytes()
+    media = json.dumps(
+        {
+            "event": "media",
+            "streamSid": "MZ00000000000000000000000000000000",
+            "media": {"payload": base64.b64encode(ulaw).decode()},
+        }
+    )
+    # The output transport writes 40 ms chunks (audio_out_10ms_chunks=4).
+    pcm = rng.integers(-8000, 8000, OUT_RATE // 25, dtype=np.int16).tobytes()
+    out_frame = OutputAudioRawFrame(
+        audio=pcm, sample_rate=OUT_RATE, num_channels=1
+    )
+
+    start = time.process_time()
+    for _ in range(frames):
+        await serializer.deserialize(media)
+    inbound = frames / (time.process_time() - start)
+
+    start = time.process_time()
+    for _ in range(frames):
+        await serializer.serialize(out_frame)
+    outbound = frames / (time.process_time() - start)
+    return {"inbound": inbound, "outbound": outbound}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=20000)
+    args = parser.parse_args()
+
+    for name, cls in (
+        ("stock", TwilioFrameSerializer),
+        ("fast", FastTwilioFrameSerializer),
+    ):
+        result = await _bench(cls, args.frames)
+        print(
+            f"{name}: inbound {result['inbound']:.0f} frames/s/core, "
+            f"outbound {result['outbound']:.0f} frames/s/core"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+"""
+Microbenchmark: beep detection cost per call.
+
+Feeds 20 ms frames of speech-level noise (the common case: every frame is
+analyzed, none is a tone) through one BeepDetector and reports the time per
+frame and the share of one core a call spends on it.
+
+    python -m benchmarks.bench_beep --frames 50000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from beep_detection import BeepDetector, BLOCK_MS
+
+
+def _bench(rate: int, frames: int) -> float:
+    detector = BeepDetector(rate)
+    frame = rate * BLOCK_MS // 1000
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(frame * 500) * 3000).astype(np.int16)
+    chunks = [audio[i : i + frame] for i in range(0, audio.size, frame)]
+
+    start = time.perf_counter()
+    for n in range(frames):
+        detector.feed(chunks[n % len(chunks)])
+    return (time.perf_counter() - start) / frames * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=50000)
+    args = parser.parse_args()
+
+    for rate in (8000, 16000):
+        us = _bench(rate, args.frames)
+        core = us / (BLOCK_MS * 1000) * 100
+        print(f"{rate} Hz: {us:.1f} us/frame, {core:.3f}% of a core per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Microbenchmark: CRM tool argument validation and dispatch overhead.
+
+Times the compiled validators from tool_registry against representative
+valid and invalid arguments, and a full dispatch to a no-op handler.
+
+    python -m benchmarks.bench_tool_validation --iterations 100000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Callable
+
+from tool_registry import ToolRegistry
+from tools import CRM_TOOLS, registry
+
+CASES = {
+    "set_call_disposition": {
+        "disposition": "connected_qualified",
+        "notes": "Qualified during AI call.",
+        "has_budget": True,
+        "has_authority": True,
+        "has_need": True,
+        "has_timing": True,
+        "estimated_value": 25000,
+    },
+    "schedule_callback": {
+        "callback_date": "2026-07-02",
+        "callback_time": "14:30",
+        "notes": "Lead asked for tomorrow afternoon.",
+    },
+    "log_conversation_summary": {
+        "summary": "Lead asked for pricing and timeline.",
+        "lead_interested": True,
+    },
+}
+INVALID = {"disposition": "maybe", "has_budget": "yes"}
+
+
+def _per_call_us(fn: Callable[[], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def _noop(args: dict) -> str:
+    return json.dumps({"status": "success"})
+
+
+async def _bench_dispatch(iterations: int) -> float:
+    noop_registry = ToolRegistry()
+    noop_registry.register(CRM_TOOLS[0], _noop)
+    args = CASES["set_call_disposition"]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await noop_registry.dispatch("set_call_disposition", args)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    for name, case in CASES.items():
+        us = _per_call_us(
+            lambda: registry.validate(name, case), args.iterations
+        )
+        print(f"validate {name}: {us:.2f} us/call")
+    us = _per_call_us(
+        lambda: registry.validate("set_call_disposition", INVALID),
+        args.iterations,
+    )
+    print(f"validate invalid set_call_disposition: {us:.2f} us/call")
+    us = asyncio.run(_bench_dispatch(args.iterations))
+    print(f"dispatch to no-op handler: {us:.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
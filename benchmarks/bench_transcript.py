@@ -0,0 +1,109 @@
+"""
+Microbenchmark: transcript text preparation for post-call analysis.
+
+Builds synthetic transcripts of --turns turns and times the work
+analyze_transcription does before its LLM request, the old way (the
+transcript serialized for the prompt, then again for each boolean
+question's keyword search, and a regex compiled per strip_html_tags call)
+against transcript_text (one pass, cached patterns).
+
+    python -m benchmarks.bench_transcript --turns 2000 --questions 10
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Callable
+
+from transcript_text import normalize_transcript, strip_html_tags
+
+WORDS = (
+    "budget pricing timeline decision team contract renewal demo follow "
+    "interested callback schedule next week manager approval quote discount "
+    "integration support onboarding the a we you it is for and to of"
+).split()
+
+
+def _transcript(turns: int) -> dict:
+    rng = random.Random(0)
+    messages = []
+    for seq in range(turns):
+        words = rng.choices(WORDS, k=rng.randint(8, 40))
+        if seq % 25 == 0:
+            words.insert(3, "<break time='1s'/>")
+        messages.append(
+            {
+                "seq": seq,
+                "role": "assistant" if seq % 2 else "user",
+                "content": " ".join(words),
+                "timestamp": "2026-10-19T10:00:00+00:00",
+            }
+        )
+    return {
+        "call_sid": "CA" + "0" * 32,
+        "complete": True,
+        "messages": messages,
+    }
+
+
+def _old_strip(text: str) -> str:
+    clean = re.compile("<.*?>")
+    return re.sub(clean, "", text)
+
+
+def _old(transcript: dict, keywords: list) -> int:
+    prompt = json.dumps(transcript, indent=2)
+    hits = 0
+    for keyword in keywords:
+        transcript_text = json.dumps(transcript).lower()
+        hits += keyword in transcript_text
+    return len(prompt) + hits
+
+
+def _new(transcript: dict, keywords: list) -> int:
+    text = normalize_transcript(transcript)
+    return len(text.prompt_text) + sum(text.mentions(k) for k in keywords)
+
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    transcript = _transcript(args.turns)
+    keywords = WORDS[: args.questions]
+    size_mb = len(json.dumps(transcript)) / 2**20
+    print(f"transcript: {args.turns} turns, {size_mb:.2f} MB as JSON")
+    for name, fn in (
+        ("json.dumps per question", _old),
+        ("normalize_transcript", _new),
+    ):
+        seconds = _time(lambda: fn(transcript, keywords), args.repeat)
+        print(f"{name}: {seconds * 1000:.2f} ms, {size_mb / seconds:.1f} MB/s")
+
+    contents = [m["content"] for m in transcript["messages"]]
+    for name, fn in (
+        ("strip_html_tags, compiled per call", _old_strip),
+        ("strip_html_tags", strip_html_tags),
+    ):
+        seconds = _time(lambda: [fn(c) for c in contents], args.repeat)
+        print(f"{name}: {seconds / len(contents) * 1e6:.2f} us/turn")
+
+    text = normalize_transcript(transcript)
+    prompt_old = len(json.dumps(transcript, indent=2))
+    print(f"prompt size: {prompt_old} -> {len(text.prompt_text)} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: concurrent calls per core for Silero VAD, inline vs batched.
+
+Each simulated call produces one 512-sample (32 ms @ 16 kHz) chunk per step.
+"inline" runs one ONNX inference per call per chunk, as the stock
+SileroVADAnalyzer does; "batched" submits every call's chunk to the shared
+VADBatcher from per-call threads, as the transports do.
+
+Calls per core = audio seconds analyzed per CPU second.
+
+    python -m benchmarks.bench_vad --calls 50 --seconds 5
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+from pipecat.audio.vad.silero import SileroOnnxModel
+
+from batched_vad import _model_path, VADBatcher, VADStream
+
+SAMPLE_RATE = 16000
+CHUNK = 512
+CHUNK_SECONDS = CHUNK / SAMPLE_RATE
+
+
+def _chunks(calls: int, steps: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.uniform(-0.3, 0.3, (steps, calls, CHUNK)).astype(np.float32)
+
+
+def bench_inline(calls: int, steps: int) -> float:
+    models = [SileroOnnxModel(_model_path()) for _ in range(calls)]
+    audio = _chunks(calls, steps)
+    start = time.process_time()
+    for step in range(steps):
+        for i, model in enumerate(models):
+            model(audio[step, i], SAMPLE_RATE)
+    return time.process_time() - start
+
+
+def bench_batched(calls: int, steps: int) -> float:
+    batcher = VADBatcher(max_batch=calls)
+    streams = [VADStream(SAMPLE_RATE) for _ in range(calls)]
+    audio = _chunks(calls, steps)
+    barrier = threading.Barrier(calls)
+
+    def call(i: int) -> None:
+        for step in range(steps):
+            barrier.wait()
+            batcher.submit(streams[i], audio[step, i]).result()
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(calls)]
+    start = time.process_time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.process_time() - start
+    print(f"  mean batch size: {batcher.mean_batch_size:.1f}")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    steps = int(args.seconds / CHUNK_SECONDS)
+    audio_seconds = args.calls * steps * CHUNK_SECONDS
+    for name, bench in (("inline", bench_inline), ("batched", bench_batched)):
+        print(f"{name}:")
+        cpu = bench(args.calls, steps)
+        print(f"  cpu seconds: {cpu:.2f}")
+        print(f"  max concurrent calls per core: {audio_seconds / cpu:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Local stand-ins for Redis, Twilio, STT, LLM and TTS used by the load test.
+
+Each fake keeps the interface the app and bot already use and adds a
+configurable latency, so a load test exercises the real websocket endpoint,
+serializer, VAD and pipeline without any network dependency.
+
+    install_fakes(FakeLatency(llm=0.4, tts=0.15))
+"""
+
+import asyncio
+from dataclasses import dataclass
+import os
+import time
+from typing import AsyncGenerator, List, Optional
+
+import numpy as np
+from openai.types.chat import ChatCompletionChunk
+from pipecat.frames.frames import (
+    Frame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.services.stt_service import STTService
+from pipecat.services.tts_service import TTSService
+from pipecat.utils.time import time_now_iso8601
+
+from prompt_cache import CachingOpenAILLMService
+
+FAKE_PROMPT = (
+    "You are Ava, a friendly assistant calling on behalf of Acme Solar. "
+    "Qualify the lead and book a callback if they are interested."
+)
+
+
+@dataclass
+class FakeLatency:
+    """Seconds each fake waits before answering."""
+
+    redis: float = 0.002
+    twilio: float = 0.15
+    stt: float = 0.2
+    llm: float = 0.4
+    tts: float = 0.15
+
+
+LATENCY = FakeLatency()
+
+
+class FakeRedisClient:
+    """Replaces RedisClient's classmethods with an in-memory prompt store."""
+
+    @classmethod
+    def get_call_prompt(cls, call_sid: str) -> dict:
+        time.sleep(LATENCY.redis)
+        return {
+            "agent_id": "agent-load",
+            "workspace_id": "workspace-load",
+            "lead_id": f"lead-{call_sid}",
+            "agent_name": "Ava",
+            "prompt": FAKE_PROMPT,
+        }
+
+    @classmethod
+    def delete_call_prompt(cls, call_sid: str) -> bool:
+        return True
+
+    @classmethod
+    def set_worker_load(cls, worker_id: str, load: dict, ttl: int) -> bool:
+        return True
+
+    @classmethod
+    def delete_worker_load(cls, worker_id: str) -> bool:
+        return True
+
+    @classmethod
+    def get_worker_loads(cls) -> list:
+        return []
+
+    @classmethod
+    def get_agent_config(cls, agent_id: str, version: str) -> None:
+        return None
+
+    @classmethod
+    def subscribe(cls, channel: str) -> None:
+        return None
+
+
+class FakeTwilioClient:
+    """twilio.rest.Client with a blocking recordings.create()."""
+
+    def __init__(self, *args: object, **kwargs: object) -> None:
+        pass
+
+    def calls(self, call_sid: str) -> "FakeTwilioClient":
+        return self
+
+    @property
+    def recordings(self) -> "FakeTwilioClient":
+        return self
+
+    def create(self, *args: object, **kwargs: object) -> None:
+        time.sleep(LATENCY.twilio)
+
+
+async def fake_hang_up_call(serializer: object) -> None:
+    await asyncio.sleep(LATENCY.twilio)
+
+
+class FakeSTTService(STTService):
+    """
+    Energy-based "transcriber": emits one TranscriptionFrame, after the STT
+    latency, for every voiced stretch of audio followed by 300 ms of quiet.
+    """
+
+    def __init__(self, **kwargs: object) -> None:
+        super().__init__()
+        self._voiced = 0.0
+        self._quiet = 0.0
+        self._turn = 0
+
+    def can_generate_metrics(self) -> bool:
+        return False
+
+    async def run_stt(self, audio: bytes) -> AsyncGenerator[Frame, None]:
+        samples = np.frombuffer(audio, dtype=np.int16)
+        seconds = samples.size / self.sample_rate
+        rms = float(np.sqrt(np.mean(samples.astype(np.float32) ** 2)))
+        if rms > 500:
+            self._voiced += seconds
+            self._quiet = 0.0
+        else:
+            self._quiet += seconds
+            if self._voiced >= 0.3 and self._quiet >= 0.3:
+                self._voiced = 0.0
+                self._turn += 1
+                self.create_task(self._transcribe(self._turn))
+        yield None
+
+    async def _transcribe(self, turn: int) -> None:
+        await asyncio.sleep(LATENCY.stt)
+        await self.push_frame(
+            TranscriptionFrame(
+                f"This is caller turn {turn}.", "", time_now_iso8601()
+            )
+        )
+
+
+def _chunk(
+    content: Optional[str] = None, usage: Optional[dict] = None
+) -> ChatCompletionChunk:
+    data = {
+        "id": "chatcmpl-load",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [],
+    }
+    if content is not None:
+        data["choices"] = [
+            {"index": 0, "delta": {"content": content}, "finish_reason": None}
+        ]
+    if usage is not None:
+        data["usage"] = usage
+    return ChatCompletionChunk.model_validate(data)
+
+
+class FakeLLMService(CachingOpenAILLMService):
+    """CachingOpenAILLMService whose completions come from a local stream."""
+
+    def __init__(self, **kwargs: object) -> None:
+        kwargs["api_key"] = "fake"
+        super().__init__(**kwargs)
+
+    async def _create_completions(
+        self, params_from_context: dict
+    ) -> AsyncGenerator[ChatCompletionChunk, None]:
+        await asyncio.sleep(LATENCY.llm)
+        return self._fake_stream(params_from_context.get("messages") or [])
+
+    async def _fake_stream(
+        self, messages: List[dict]
+    ) -> AsyncGenerator[ChatCompletionChunk, None]:
+        prompt_tokens = sum(
+            len(str(m.get("content", ""))) // 4 for m in messages
+        )
+        for word in "Thanks for that. Could you tell me a bit more?".split(
+            " "
+        ):
+            yield _chunk(content=word + " ")
+        yield _chunk(
+            usage={
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": 12,
+                "total_tokens": prompt_tokens + 12,
+                "prompt_tokens_details": {"cached_tokens": prompt_tokens // 2},
+            }
+        )
+
+
+class FakeTTSService(TTSService):
+    """Returns a tone proportional to the text length after the TTS latency."""
+
+    def __init__(self, **kwargs: object) -> None:
+        super().__init__(sample_rate=24000)
+        t = np.arange(int(24000 * 0.04)) / 24000
+        self._chunk = (
+            (np.sin(2 * np.pi * 440 * t) * 3000).astype(np.int16).tobytes()
+        )
+
+    def can_generate_metrics(self) -> bool:
+        return False
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        await asyncio.sleep(LATENCY.tts)
+        yield TTSStartedFrame()
+        seconds = min(0.06 * len(text), 3.0)
+        for _ in range(max(int(seconds / 0.04), 1)):
+            yield TTSAudioRawFrame(self._chunk, self.sample_rate, 1)
+        yield TTSStoppedFrame()
+
+
+def install_fakes(latency: FakeLatency) -> None:
+    """Patch the app and bot modules to use the fakes above."""
+    import agent_config
+    import app
+    import audio_codec
+    import bot
+    import call_session
+    import capacity
+
+    LATENCY.__dict__.update(latency.__dict__)
+    os.environ.setdefault("TWILIO_AUTH_TOKEN", "fake-token")
+
+    app.RedisClient = FakeRedisClient
+    app.Client = FakeTwilioClient
+    capacity.RedisClient = FakeRedisClient
+    call_session.RedisClient = FakeRedisClient
+    agent_config.RedisClient = FakeRedisClient
+    audio_codec.FastTwilioFrameSerializer._hang_up_call = fake_hang_up_call
+    bot.CachingOpenAILLMService = FakeLLMService
+    bot.CartesiaSTTService = FakeSTTService
+    bot.ElevenLabsTTSService = FakeTTSService
+    # The simulated caller waits for the bot to speak first, so answering
+    # machine detection would only add its decision timeout to call setup.
+    bot.VOICEMAIL_DETECTION = False
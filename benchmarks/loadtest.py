@@ -0,0 +1,370 @@
+"""
+Load test: N concurrent simulated Twilio media streams against /ws.
+
+Starts the app in a subprocess with Redis, Twilio, STT, LLM and TTS replaced
+by the local fakes in benchmarks/fakes.py, then opens N websockets that each
+play μ-law audio as Twilio connected/start/media/stop messages in real time.
+
+Reports call setup time (connect -> first bot audio), per-turn latency (end
+of caller utterance -> first bot audio), server event-loop lag and server
+CPU per call.
+
+    python -m benchmarks.loadtest --calls 20 --turns 3 --llm-latency 0.4
+    python -m benchmarks.loadtest --audio caller.ulaw   # 8 kHz raw μ-law
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+import urllib.request
+
+import numpy as np
+import websockets
+
+from audio_codec import ulaw_encode
+
+FRAME_SECONDS = 0.02
+FRAME_BYTES = 160  # 20 ms of 8 kHz μ-law
+ULAW_SILENCE = 0xFF
+
+
+def synthetic_caller_audio(turns: int, seed: int = 0) -> List[bytes]:
+    """One μ-law utterance per turn: 1.2 s of speech-level noise."""
+    rng = np.random.default_rng(seed)
+    utterances = []
+    for _ in range(turns):
+        samples = int(1.2 * 8000)
+        envelope = np.abs(np.sin(np.linspace(0, 6 * np.pi, samples))) + 0.2
+        pcm = rng.normal(0, 4000, samples) * envelope
+        pcm = np.clip(pcm, -32768, 32767).astype(np.int16)
+        utterances.append(ulaw_encode(pcm).tobytes())
+    return utterances
+
+
+def recorded_caller_audio(path: str, turns: int) -> List[bytes]:
+    with open(path, "rb") as f:
+        data = f.read()
+    return [data] * turns
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class CallResult:
+    def __init__(self) -> None:
+        self.setup: Optional[float] = None
+        self.turns: List[float] = []
+        self.error: Optional[str] = None
+
+
+def _media(stream_sid: str, chunk: bytes) -> str:
+    return json.dumps(
+        {
+            "event": "media",
+            "streamSid": stream_sid,
+            "media": {"payload": base64.b64encode(chunk).decode()},
+        }
+    )
+
+
+async def simulate_call(
+    url: str, index: int, utterances: List[bytes], gap: float
+) -> CallResult:
+    result = CallResult()
+    call_sid = f"CA{index:032d}"
+    stream_sid = f"MZ{index:032d}"
+    last_bot_audio = [0.0]
+    silence = bytes([ULAW_SILENCE]) * FRAME_BYTES
+
+    async def receive(ws: object) -> None:
+        async for raw in ws:
+            message = json.loads(raw)
+            if message.get("event") != "media":
+                continue
+            payload = base64.b64decode(message["media"]["payload"])
+            if payload.count(ULAW_SILENCE) == len(payload):
+                continue
+            last_bot_audio[0] = time.perf_counter()
+
+    async def wait_for_bot(
+        since: float, timeout: float = 15.0
+    ) -> Optional[float]:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if last_bot_audio[0] > since:
+                return last_bot_audio[0] - since
+            await asyncio.sleep(0.005)
+        return None
+
+    async def wait_for_quiet(ws: object, quiet: float = 0.5) -> None:
+        # Let the bot finish its reply so the next turn measures a new one.
+        while time.perf_counter() - last_bot_audio[0] < quiet:
+            await play(ws, silence)
+
+    async def play(ws: object, audio: bytes) -> None:
+        start = time.perf_counter()
+        for n, offset in enumerate(range(0, len(audio), FRAME_BYTES)):
+            await ws.send(
+                _media(stream_sid, audio[offset : offset + FRAME_BYTES])
+            )
+            # Pace against the wall clock so slow sends don't stretch audio.
+            delay = start + (n + 1) * FRAME_SECONDS - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    try:
+        connect_started = time.perf_counter()
+        async with websockets.connect(url, max_size=None) as ws:
+            await ws.send(
+                json.dumps({"event": "connected", "protocol": "Call"})
+            )
+            await ws.send(
+                json.dumps(
+                    {
+                        "event": "start",
+                        "start": {
+                            "accountSid": "AC" + "0" * 32,
+                            "callSid": call_sid,
+                            "streamSid": stream_sid,
+                            "customParameters": {"call_id": f"load-{index}"},
+                        },
+                    }
+                )
+            )
+            receiver = asyncio.create_task(receive(ws))
+            greeting = asyncio.create_task(wait_for_bot(connect_started))
+            # Keep the stream alive with silence while the bot greets.
+            while not greeting.done():
+                await play(ws, silence)
+            result.setup = greeting.result()
+
+            for utterance in utterances:
+                await wait_for_quiet(ws)
+                await play(ws, silence * int(gap / FRAME_SECONDS))
+                await play(ws, utterance)
+                spoke_at = time.perf_counter()
+                waiting = asyncio.create_task(wait_for_bot(spoke_at))
+                while not waiting.done():
+                    await play(ws, silence)
+                latency = waiting.result()
+                if latency is not None:
+                    result.turns.append(latency)
+
+            await ws.send(
+                json.dumps({"event": "stop", "streamSid": stream_sid})
+            )
+            receiver.cancel()
+    except Exception as e:
+        result.error = str(e)
+    return result
+
+
+async def run_load(
+    base_url: str, calls: int, utterances: List[bytes], gap: float, ramp: float
+) -> List[CallResult]:
+    async def delayed(index: int) -> CallResult:
+        await asyncio.sleep(ramp * index / max(calls, 1))
+        return await simulate_call(f"{base_url}/ws", index, utterances, gap)
+
+    return await asyncio.gather(*(delayed(i) for i in range(calls)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get_json(url: str) -> dict:
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def _wait_for_server(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _get_json(url)
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"Load test server did not start at {url}")
+
+
+def serve(args: argparse.Namespace) -> None:
+    """Run the app with fakes installed, plus a /loadtest/stats route."""
+    from benchmarks.fakes import FakeLatency, install_fakes
+
+    install_fakes(
+        FakeLatency(
+            twilio=args.twilio_latency,
+            stt=args.stt_latency,
+            llm=args.llm_latency,
+            tts=args.tts_latency,
+        )
+    )
+    import uvicorn
+
+    import app as app_module
+
+    lags: List[float] = []
+
+    async def monitor_lag(interval: float = 0.05) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - started - interval)
+
+    original_lifespan = app_module.app.router.lifespan_context
+
+    def lifespan(app: object) -> object:
+        class _Lifespan:
+            async def __aenter__(self) -> object:
+                self.monitor = asyncio.create_task(monitor_lag())
+                self.inner = original_lifespan(app)
+                return await self.inner.__aenter__()
+
+            async def __aexit__(self, *exc: object) -> object:
+                self.monitor.cancel()
+                return await self.inner.__aexit__(*exc)
+
+        return _Lifespan()
+
+    app_module.app.router.lifespan_context = lifespan
+
+    @app_module.app.get("/loadtest/stats")
+    async def stats() -> dict:
+        return {
+            "cpu_seconds": time.process_time(),
+            "lag_samples": len(lags),
+            "lag_p50": _percentile(lags, 50),
+            "lag_p99": _percentile(lags, 99),
+            "lag_max": max(lags) if lags else 0.0,
+        }
+
+    @app_module.app.post("/loadtest/reset")
+    async def reset() -> dict:
+        lags.clear()
+        return {"ok": True}
+
+    uvicorn.run(
+        app_module.app, host="127.0.0.1", port=args.port, log_level="warning"
+    )
+
+
+def _report(
+    results: List[CallResult], before: dict, after: dict, calls: int
+) -> None:
+    setups = [r.setup for r in results if r.setup is not None]
+    turns = [t for r in results for t in r.turns]
+    errors = [r.error for r in results if r.error]
+    cpu = after["cpu_seconds"] - before["cpu_seconds"]
+
+    print(f"calls: {calls} ({len(errors)} failed)")
+    if setups:
+        print(
+            f"call setup (s): p50 {statistics.median(setups):.3f} "
+            f"p95 {_percentile(setups, 95):.3f} max {max(setups):.3f}"
+        )
+    if turns:
+        print(
+            f"turn latency (s): p50 {statistics.median(turns):.3f} "
+            f"p95 {_percentile(turns, 95):.3f} max {max(turns):.3f} "
+            f"({len(turns)} turns)"
+        )
+    print(
+        f"event-loop lag (ms): p50 {after['lag_p50'] * 1000:.1f} "
+        f"p99 {after['lag_p99'] * 1000:.1f} max {after['lag_max'] * 1000:.1f}"
+    )
+    print(
+        f"server cpu: {cpu:.2f} s total, {cpu / max(calls, 1):.3f} s per call"
+    )
+    for error in sorted(set(errors))[:5]:
+        print(f"error: {error}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "mode", nargs="?", default="run", choices=("run", "serve")
+    )
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument(
+        "--gap", type=float, default=0.5, help="silence before each turn"
+    )
+    parser.add_argument(
+        "--ramp", type=float, default=2.0, help="seconds to start all calls"
+    )
+    parser.add_argument("--audio", help="raw 8 kHz μ-law caller utterance")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--twilio-latency", type=float, default=0.15)
+    parser.add_argument("--stt-latency", type=float, default=0.2)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--tts-latency", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        serve(args)
+        return
+
+    port = args.port or _free_port()
+    server_args = [a for a in sys.argv[1:] if a not in ("run",)]
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.loadtest",
+            "serve",
+            *server_args,
+            "--port",
+            str(port),
+        ],
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    )
+    try:
+        stats_url = f"http://127.0.0.1:{port}/loadtest/stats"
+        _wait_for_server(stats_url)
+        urllib.request.urlopen(
+            urllib.request.Request(
+                f"http://127.0.0.1:{port}/loadtest/reset", method="POST"
+            )
+        )
+        utterances = (
+            recorded_caller_audio(args.audio, args.turns)
+            if args.audio
+            else synthetic_caller_audio(args.turns)
+        )
+        before = _get_json(stats_url)
+        results = asyncio.run(
+            run_load(
+                f"ws://127.0.0.1:{port}",
+                args.calls,
+                utterances,
+                args.gap,
+                args.ramp,
+            )
+        )
+        time.sleep(0.5)
+        after = _get_json(stats_url)
+        _report(results, before, after, args.calls)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Soak test: hundreds of simulated calls against one worker, watching memory.
+
+Starts the load test server (benchmarks/loadtest.py, with local fakes) with
+MEMORY_ACCOUNTING=true and runs calls in waves of --concurrency. Once every
+call of a wave has closed, it reads /memory?collect=true and /call-sessions:
+RSS, traced memory by component, calls flagged by the per-call probe and
+per-call objects still alive. The first wave is the warm-up (models, caches,
+pools); growth is measured from there. RSS is shown but not judged, as it
+includes tracemalloc's own bookkeeping.
+
+Exits non-zero when a call was flagged, per-call objects outlived their
+calls, or traced memory grew more than --max-growth-mb per 100 calls.
+
+    python -m benchmarks.soak --calls 300 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.loadtest import (
+    _free_port,
+    _wait_for_server,
+    simulate_call,
+    synthetic_caller_audio,
+)
+
+
+def _get_json(url: str, timeout: float = 120.0) -> dict:
+    # Probes and the forced collection can keep the server busy for a while.
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+async def _wait_for_sessions(base: str, timeout: float = 120.0) -> dict:
+    """Until every call of the wave has closed (and its probe reported)."""
+    deadline = time.monotonic() + timeout
+    while True:
+        sessions = await asyncio.to_thread(_get_json, f"{base}/call-sessions")
+        if (
+            not sessions["open_sessions"]
+            and not sessions["live_objects"]["session"]
+        ):
+            return sessions
+        if time.monotonic() > deadline:
+            return sessions
+        await asyncio.sleep(0.5)
+
+
+async def _soak(base: str, args: argparse.Namespace) -> int:
+    utterances = synthetic_caller_audio(args.turns)
+    ws_url = base.replace("http://", "ws://") + "/ws"
+    samples = []
+    failed = 0
+    for start in range(0, args.calls, args.concurrency):
+        indexes = range(start, min(start + args.concurrency, args.calls))
+        results = await asyncio.gather(
+            *(simulate_call(ws_url, i, utterances, args.gap) for i in indexes)
+        )
+        failed += sum(1 for r in results if r.error)
+        await _wait_for_sessions(base)
+        memory = await asyncio.to_thread(
+            _get_json, f"{base}/memory?collect=true"
+        )
+        sessions = await asyncio.to_thread(_get_json, f"{base}/call-sessions")
+        samples.append((indexes[-1] + 1, memory, sessions))
+        print(
+            f"{indexes[-1] + 1:5d} calls  rss {memory['rss_mb']:7.1f} MB  "
+            f"traced {memory['traced_mb']:6.1f} MB  flagged {memory['flagged_calls']}  "
+            f"live {sessions['live_objects']}",
+            flush=True,
+        )
+
+    calls, memory, sessions = samples[-1]
+    warm_calls, warm_memory, _ = samples[0]
+    measured = max(calls - warm_calls, 1)
+    traced_growth = memory["traced_mb"] - warm_memory["traced_mb"]
+    rss_growth = memory["rss_mb"] - warm_memory["rss_mb"]
+    per_100 = traced_growth / measured * 100
+    by_component = {
+        name: round(
+            kb - warm_memory["traced_kb_by_component"].get(name, 0.0), 1
+        )
+        for name, kb in memory["traced_kb_by_component"].items()
+    }
+    leftover = {
+        kind: count
+        for kind, count in sessions["live_objects"].items()
+        if count
+    }
+
+    print(
+        f"calls: {calls} ({failed} failed), measured after a {warm_calls}-call warm-up"
+    )
+    print(
+        f"traced growth: {traced_growth:+.1f} MB, {per_100:+.2f} MB per 100 calls"
+    )
+    print(f"traced growth by component (KB): {by_component}")
+    print(
+        f"rss growth: {rss_growth:+.1f} MB (includes tracemalloc's own tables)"
+    )
+    print(f"flagged calls: {memory['flagged_calls']}")
+    for report in memory["recent_flagged"][:5]:
+        print(
+            f"  {report['call_sid']}: leaked {report['leaked_objects']}, "
+            f"{report['retained_kb']} KB, grown types {report['grown_types']}"
+        )
+    if leftover:
+        print(f"per-call objects still alive: {leftover}")
+
+    ok = (
+        not memory["flagged_calls"]
+        and not leftover
+        and per_100 <= args.max_growth_mb
+    )
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=1)
+    parser.add_argument("--gap", type=float, default=0.3)
+    parser.add_argument(
+        "--max-growth-mb",
+        type=float,
+        default=1.0,
+        help="traced memory per 100 calls",
+    )
+    parser.add_argument(
+        "--server-log", default=os.devnull, help="file for the server's logs"
+    )
+    args = parser.parse_args()
+
+    port = _free_port()
+    log = open(args.server_log, "w")
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.loadtest",
+            "serve",
+            "--port",
+            str(port),
+            "--twilio-latency",
+            "0.05",
+            "--stt-latency",
+            "0.05",
+            "--llm-latency",
+            "0.1",
+            "--tts-latency",
+            "0.05",
+        ],
+        env={
+            **os.environ,
+            "PYTHONUNBUFFERED": "1",
+            "MEMORY_ACCOUNTING": "true",
+        },
+        stdout=log,
+    )
+    status = 1
+    try:
+        base = f"http://127.0.0.1:{port}"
+        _wait_for_server(f"{base}/loadtest/stats")
+        started = time.monotonic()
+        status = asyncio.run(_soak(base, args))
+        print(f"wall time: {time.monotonic() - started:.0f} s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        log.close()
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
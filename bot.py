@@ -1,42 +1,77 @@
 import os
-import json
-from pipecat.frames.frames import EndFrame, LLMMessagesFrame
+from pipecat.frames.frames import EndFrame, LLMRunFrame
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
 from pipecat.pipeline.task import PipelineParams, PipelineTask
-from pipecat.services.openai.llm import OpenAILLMService
 from pipecat.transports.websocket.fastapi import (
     FastAPIWebsocketTransport,
     FastAPIWebsocketParams,
 )
 from pipecat.audio.vad.silero import SileroVADAnalyzer
-from pipecat.serializers.twilio import TwilioFrameSerializer
 from pipecat.services.elevenlabs.tts import ElevenLabsTTSService
 from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.processors.transcript_processor import TranscriptProcessor
 from pipecat.services.cartesia.stt import CartesiaSTTService
-from loguru import logger
+import loguru
 from dotenv import load_dotenv
 
-from tools import CRM_TOOLS, handle_tool_call
+from audio_codec import FastTwilioFrameSerializer
+from batched_vad import BatchedSileroVADAnalyzer
+from beep_detection import BeepDetectorProcessor
+from call_recording import CallRecorder
+from call_session import CallSession
+from agent_config import AgentConfig
+import rate_limits
+from prompt_cache import KICKOFF_MESSAGE, CachingOpenAILLMService, PromptCacheStats
+from tools import handle_tool_call
+from transcript_log import TranscriptLog
+from turn_tracing import TurnTracer
+from utils.call_context import CallContext
+from utils.logging import logger
+from voicemail_detection import VOICEMAIL_DETECTION, VoicemailDetector
+from voicemail_utilis import (
+    VOICEMAIL_ACTION,
+    switch_to_human_conversation,
+    switch_to_voicemail_response,
+    terminate_call,
+)
 
 load_dotenv(override=True)
 
-logger.remove(0)
+loguru.logger.remove(0)
+
+# "batched" shares Silero inference across all calls in the worker (see
+# batched_vad.py); "inline" keeps one model per call.
+VAD_BACKEND = os.getenv("VAD_BACKEND", "batched")
+
+
+def _create_vad_analyzer():
+    if VAD_BACKEND == "inline":
+        return SileroVADAnalyzer()
+    return BatchedSileroVADAnalyzer()
 
 async def run_bot(
     websocket_client,
     stream_sid,
     call_sid,
     account_sid,
-    prompt: str,
+    agent_config: AgentConfig,
     agent_name: str = "AI Assistant",
-    call_metadata: dict | None = None,
+    call: CallContext | None = None,
+    lead_variables: dict | None = None,
+    recorder: CallRecorder | None = None,
+    transcript_log: TranscriptLog | None = None,
+    session: CallSession | None = None,
 ):
     try:
-        print("run_bot method called.........................................................");
-        print(f"Using prompt for agent '{agent_name}': {prompt[:100]}...")
+        logger.info(
+            "run_bot called",
+            call_sid=call_sid,
+            agent_name=agent_name,
+            agent_version=agent_config.version,
+        )
 
-        metadata = call_metadata or {}
+        call = call or CallContext(call_sid=call_sid)
 
         transport = FastAPIWebsocketTransport(
             websocket=websocket_client,
@@ -44,9 +79,9 @@ async def run_bot(
                 audio_out_enabled=True,
                 add_wav_header=False,
                 vad_enabled=True,
-                vad_analyzer=SileroVADAnalyzer(),
+                vad_analyzer=_create_vad_analyzer(),
                 vad_audio_passthrough=True,
-                serializer=TwilioFrameSerializer(
+                serializer=FastTwilioFrameSerializer(
                     stream_sid,
                     call_sid=call_sid,
                     account_sid=account_sid,
@@ -55,21 +90,29 @@ async def run_bot(
             ),
         )
 
-        llm = OpenAILLMService(
+        cache_stats = PromptCacheStats(call_sid=call_sid)
+        llm = CachingOpenAILLMService(
             api_key=os.getenv("OPENAI_API_KEY"),
-            model="gpt-4o-mini",
+            stats=cache_stats,
+            **agent_config.llm_settings,
         )
 
         # Register CRM tool handlers. Tool schemas are provided on the context
         # for this Pipecat version.
 
         async def on_tool_call(function_name: str, tool_call_id: str, arguments: dict, llm, context, result_callback):
-            result = await handle_tool_call(function_name, arguments, metadata)
+            result = await handle_tool_call(
+                function_name, arguments, call, tool_call_id=tool_call_id
+            )
             await result_callback(result)
 
-        llm.register_function("set_call_disposition", on_tool_call)
-        llm.register_function("schedule_callback", on_tool_call)
-        llm.register_function("log_conversation_summary", on_tool_call)
+        for tool_name in agent_config.tool_names:
+            llm.register_function(tool_name, on_tool_call)
+
+        # Each call opens one STT and one TTS stream; count them against the
+        # providers' quotas (live: waits at most RATE_LIMIT_LIVE_MAX_WAIT).
+        await rate_limits.acquire("cartesia")
+        await rate_limits.acquire("elevenlabs")
 
         stt = CartesiaSTTService(
             api_key=os.getenv("CARTESIA_API_KEY"),
@@ -77,68 +120,121 @@ async def run_bot(
 
         tts = ElevenLabsTTSService(
             api_key=os.getenv("ELEVENLABS_API_KEY"),
-            voice_id="9BWtsMINqrJLrRacOk9x",
+            **agent_config.tts_settings,
         )
 
-        # Append tool-calling instructions to the system prompt
-        tool_instructions = (
-            "\n\nYou have access to CRM tools. At the end of the conversation, "
-            "you MUST call log_conversation_summary to record what was discussed, and you MUST set one call outcome. "
-            "Use exactly one disposition path: "
-            "1) If lead asks for callback, call schedule_callback(callback_date, callback_time, notes) and do not call set_call_disposition after that. "
-            "2) If lead is not interested, call set_call_disposition with disposition='connected_not_interested'. "
-            "3) If lead is interested and clearly satisfies BANT (budget, authority, need, timing), call set_call_disposition with disposition='connected_qualified' and include has_budget=true, has_authority=true, has_need=true, and has_timing=true. "
-            "4) If lead is interested but does not satisfy BANT, call set_call_disposition with disposition='connected_disqualified'. "
-            "If the lead asks not to be called or texted, use disposition='do_not_call'. If the number is wrong, use disposition='bad_number'. "
-            "If outcome is still unclear, ask follow-up questions before ending the call."
+        # Static prefix first (tool instructions, agent prompt) so every
+        # request for this agent shares a cacheable prefix with the tools;
+        # the lead's variables follow it.
+        messages = agent_config.call_messages(lead_variables)
+        logger.info(
+            "Prompt prefix fingerprint",
+            call_sid=call_sid,
+            fingerprint=agent_config.fingerprint,
         )
-        messages = [{"role": "system", "content": prompt + tool_instructions}]
 
-        context = OpenAILLMContext(messages=messages, tools=CRM_TOOLS, tool_choice="auto")
+        context = OpenAILLMContext(
+            messages=messages, tools=agent_config.tools, tool_choice="auto"
+        )
         context_aggregator = llm.create_context_aggregator(context)
 
         tma_in = context_aggregator.user()
         tma_out = context_aggregator.assistant()
 
+        voicemail = beep = None
+        if VOICEMAIL_DETECTION:
+            beep = BeepDetectorProcessor()
+            voicemail = VoicemailDetector(call_sid=call_sid, beep_detector=beep)
+
+        audiobuffer = recorder.processor() if recorder else None
+
+        transcript = TranscriptProcessor() if transcript_log else None
+        if transcript:
+            transcript.event_handler("on_transcript_update")(
+                transcript_log.on_transcript_update
+            )
+
         pipeline = Pipeline(
             [
                 transport.input(),  # Websocket input from client
+                *([beep] if beep else []),  # Answering-machine beep
                 stt,  # Speech-To-Text
+                *([transcript.user()] if transcript else []),  # Caller turns
+                *([voicemail] if voicemail else []),  # Answering-machine detection
+                TurnTracer(),  # One span per conversational turn
                 tma_in,  # User responses
                 llm,  # LLM
                 tts,  # Text-To-Speech
                 transport.output(),  # Websocket output to client
+                *([audiobuffer] if audiobuffer else []),  # Call recording
+                *([transcript.assistant()] if transcript else []),  # Bot turns
                 tma_out,  # LLM responses
             ]
         )
 
-        print("pipeline setup.....................")
+        logger.debug("Pipeline set up", call_sid=call_sid)
 
         task = PipelineTask(
-            pipeline, params=PipelineParams(allow_interruptions=True)
+            pipeline,
+            params=PipelineParams(
+                allow_interruptions=True,
+                enable_usage_metrics=True,
+            ),
         )
 
+        if session is not None:
+            session.attach(task=task, transport=transport, context=context)
+
+        if voicemail:
+            # The conversation starts once a person has answered.
+            @voicemail.event_handler("on_human_detected")
+            async def on_human_detected(processor, reason):
+                await switch_to_human_conversation(task, context)
+
+            @voicemail.event_handler("on_voicemail_detected")
+            async def on_voicemail_detected(processor, reason):
+                if VOICEMAIL_ACTION == "hangup":
+                    await terminate_call(task)
+                    disposition = "no_answer"
+                else:
+                    await switch_to_voicemail_response(task)
+                    disposition = "left_voicemail"
+                await handle_tool_call(
+                    "set_call_disposition",
+                    {"disposition": disposition, "notes": f"Answering machine ({reason})."},
+                    call,
+                    tool_call_id="voicemail",
+                )
+
         @transport.event_handler("on_client_connected")
         async def on_client_connected(transport, client):
+            if audiobuffer:
+                await audiobuffer.start_recording()
+            if voicemail:
+                return
             # Kick off the conversation.
-            print("Kick off the conversation........................", client)
+            logger.debug("Kick off the conversation", call_sid=call_sid)
             try:
-                messages.append({
-                    "role": "system",
-                    "content": "Please introduce yourself to the user.",
-                })
-                await task.queue_frames([LLMMessagesFrame(messages)])
+                # Run on the shared context: an LLMMessagesFrame would build
+                # a fresh context without the tool schemas and miss the cache.
+                context.add_message(dict(KICKOFF_MESSAGE))
+                await task.queue_frames([LLMRunFrame()])
             except Exception as e:
-                print("failed to start conversation.........................", e);
+                logger.error(
+                    "Failed to start conversation", call_sid=call_sid, error=str(e)
+                )
 
         @transport.event_handler("on_client_disconnected")
         async def on_client_disconnected(transport, client):
             try:
                 await task.queue_frames([EndFrame()])
             except Exception as e:
-                print("Error in client disconnect handler.........................", e)
+                logger.error(
+                    "Error in client disconnect handler", call_sid=call_sid, error=str(e)
+                )
 
         runner = PipelineRunner(handle_sigint=False)
         await runner.run(task)
+        logger.info("Prompt cache usage", **cache_stats.as_dict())
     except Exception as e:
-        print("failed to run bot................................", e)
+        logger.error("Failed to run bot", call_sid=call_sid, error=str(e))
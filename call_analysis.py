@@ -0,0 +1,343 @@
+"""
+Incremental call analysis that runs while the conversation happens.
+
+helper.analyze_transcription makes one large LLM pass over the whole
+transcript and every question after the call. IncrementalAnalyzer instead
+keeps per-question answers during the call. Each question's keywords (words
+of its name and options, cut to a short stem) go into a keyword -> questions
+index. Every new turn is tokenized against that index and marks only the
+questions it mentions (and, for a couple of turns, the questions just
+mentioned, since the answer often comes in the next turn).
+
+A background pass at most every ANALYSIS_INTERVAL_SECONDS sends the turns
+since the previous pass, the running summary and only the marked questions.
+At hangup finalize() runs one last delta pass over whatever is left, plus
+any question never asked about so far, over the whole call. The finished
+analysis is ready seconds after the call instead of tens of seconds.
+The result has the same shape as analyze_transcription's, plus "complete":
+false when the last pass failed, in which case the post-call analysis still
+runs.
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from openai import AsyncOpenAI
+
+import lanes
+import rate_limits
+from utils.logging import logger
+
+ANALYSIS_MODEL = os.getenv("ANALYSIS_OPENAI_MODEL") or "gpt-4o-mini"
+ANALYSIS_INTERVAL_SECONDS = float(os.getenv("ANALYSIS_INTERVAL_SECONDS", "10"))
+
+# Turns a mentioned question keeps watching, and turns of earlier context
+# sent along with the new ones.
+FOLLOW_TURNS = 2
+CONTEXT_TURNS = 2
+
+_STOPWORDS = {
+    "does",
+    "did",
+    "have",
+    "has",
+    "what",
+    "when",
+    "where",
+    "which",
+    "would",
+    "will",
+    "from",
+    "that",
+    "this",
+    "there",
+    "their",
+    "they",
+    "with",
+    "about",
+    "your",
+    "were",
+    "been",
+    "into",
+    "call",
+    "caller",
+    "lead",
+    "other",
+    "another",
+}
+_WORD = re.compile(r"[a-z0-9']+")
+_TYPES = {
+    "selector": "selector",
+    "text": "text",
+    "boolean": "boolean",
+    "number": "numerical",
+}
+
+SYSTEM_PROMPT = """You keep a running analysis of a live sales call up to date.
+You receive the analysis so far, the newest conversation turns (with a little
+earlier context) and the questions to re-evaluate. Base every answer strictly
+on what was said.
+
+Answer formats by type:
+- boolean: "yes", "no" or "unknown"; "no" only on explicit evidence
+- text: a short, informative answer from the conversation
+- numerical: a number only
+- selector: exactly one of the given options
+Use "unknown" whenever the conversation does not settle the question; keep a
+previous answer unless the new turns change it.
+
+Respond with JSON only:
+{
+    "summary": "<the whole call so far, briefly>",
+    "key_points": ["<main discussion points so far>"],
+    "sentiment": "<positive | neutral | negative>",
+    "action_items": ["<follow-up tasks so far>"],
+    "answers": {"<question name>": {"value": "<answer>", "type": "<type>"}}
+}
+Key answers by question name, and include only the questions listed."""
+
+
+def _stem(word: str) -> str:
+    return word[:5]
+
+
+def _tokens(text: str) -> Set[str]:
+    return {
+        _stem(w)
+        for w in _WORD.findall(text.lower())
+        if len(w) > 3 and w not in _STOPWORDS
+    }
+
+
+def _normalize(value: object, answer_type: str) -> str:
+    value = str(value).strip()
+    if not value:
+        return "unknown"
+    if answer_type == "boolean":
+        lowered = value.lower()
+        return {"true": "yes", "1": "yes", "false": "no", "0": "no"}.get(
+            lowered, lowered if lowered in ("yes", "no") else "unknown"
+        )
+    return value
+
+
+class QuestionState:
+    __slots__ = (
+        "name",
+        "type",
+        "options",
+        "value",
+        "dirty",
+        "since",
+        "last_hit",
+        "watch_until",
+        "evaluated",
+    )
+
+    def __init__(self, question: dict) -> None:
+        self.name = question["name"]
+        self.type = _TYPES.get(question.get("type", "text").lower(), "text")
+        self.options = question.get("options") or []
+        self.value = "unknown"
+        self.dirty = False
+        self.since = 0
+        self.last_hit = -1
+        self.watch_until = -1
+        # Set by the first successful pass that asked about it.
+        self.evaluated = False
+
+    def prompt_entry(self) -> dict:
+        entry = {"type": self.type, "current": self.value}
+        if self.type == "selector":
+            entry["options"] = self.options
+        return entry
+
+
+class IncrementalAnalyzer:
+    def __init__(
+        self,
+        questions: List[dict],
+        call_sid: Optional[str] = None,
+        complete: Optional[Callable[[str, str], Awaitable[str]]] = None,
+        interval: float = ANALYSIS_INTERVAL_SECONDS,
+    ) -> None:
+        self.call_sid = call_sid
+        self.questions: Dict[str, QuestionState] = {}
+        self.index: Dict[str, Set[str]] = {}
+        for question in questions:
+            state = QuestionState(question)
+            self.questions[state.name] = state
+            words = " ".join([state.name] + [str(o) for o in state.options])
+            for token in _tokens(words):
+                self.index.setdefault(token, set()).add(state.name)
+        self.turns: List[dict] = []
+        self.summary = {
+            "summary": "",
+            "key_points": [],
+            "sentiment": "unknown",
+            "action_items": [],
+        }
+        self.passes = 0
+        self._analyzed_through = 0
+        self._complete = complete or _openai_complete
+        self._interval = interval
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._wake = asyncio.Event()
+
+    def add_turn(self, message: dict) -> None:
+        seq = len(self.turns)
+        self.turns.append(
+            {"role": message["role"], "content": message["content"]}
+        )
+        mentioned = set()
+        for token in _tokens(message["content"]):
+            mentioned |= self.index.get(token, set())
+        for state in self.questions.values():
+            if state.name in mentioned:
+                state.watch_until = seq + FOLLOW_TURNS
+            elif seq > state.watch_until:
+                continue
+            state.last_hit = seq
+            if not state.dirty:
+                state.dirty, state.since = True, seq
+
+    def schedule(self) -> None:
+        """Start a background pass unless one is already pending."""
+        if not self._closing and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._closing and self._analyzed_through < len(self.turns):
+            await self.evaluate()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def evaluate(self) -> None:
+        """One delta pass: new turns, running summary, marked questions."""
+        async with self._lock:
+            end = len(self.turns)
+            dirty = [s for s in self.questions.values() if s.dirty]
+            if end == self._analyzed_through and not dirty:
+                return
+            since = min([s.since for s in dirty] + [self._analyzed_through])
+            start = max(0, since - CONTEXT_TURNS)
+            user_prompt = json.dumps(
+                {
+                    "analysis_so_far": self.summary,
+                    "earlier_context": self.turns[start:since],
+                    "new_turns": self.turns[since:end],
+                    "questions": {s.name: s.prompt_entry() for s in dirty},
+                },
+                indent=1,
+            )
+            try:
+                raw = await self._complete(SYSTEM_PROMPT, user_prompt)
+                result = json.loads(re.sub(r"```json|```", "", raw).strip())
+            except Exception as e:
+                logger.warning(
+                    "Incremental analysis pass failed",
+                    call_sid=self.call_sid,
+                    error=str(e),
+                )
+                return
+            for key in self.summary:
+                if key in result:
+                    self.summary[key] = result[key]
+            answers = result.get("answers") or {}
+            for state in dirty:
+                answer = answers.get(state.name)
+                if isinstance(answer, dict):
+                    state.value = _normalize(
+                        answer.get("value", ""), state.type
+                    )
+                state.evaluated = True
+                # Turns added during the request mark it again.
+                state.dirty = state.last_hit >= end
+                state.since = end
+            self._analyzed_through = end
+            self.passes += 1
+
+    @property
+    def complete(self) -> bool:
+        """
+        Whether a pass succeeded, covered every turn, and every question has
+        been asked about at least once.
+        """
+        return (
+            self.passes > 0
+            and self._analyzed_through == len(self.turns)
+            and all(
+                s.evaluated and not s.dirty for s in self.questions.values()
+            )
+        )
+
+    def analysis(self) -> dict:
+        return {
+            **self.summary,
+            "complete": self.complete,
+            "answers": {
+                s.name: {"value": s.value, "type": s.type}
+                for s in self.questions.values()
+            },
+        }
+
+    async def finalize(self) -> dict:
+        # Let a pass in flight finish rather than paying for it twice.
+        self._closing = True
+        self._wake.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+        started = time.monotonic()
+        # A question whose keywords never came up may still be answered
+        # ("What is the budget?" / "Around five thousand"): the last pass
+        # asks about it over the whole call.
+        if self.turns:
+            for state in self.questions.values():
+                if not state.evaluated and not state.dirty:
+                    state.dirty, state.since = True, 0
+        await self.evaluate()
+        logger.info(
+            "Call analysis finalized",
+            call_sid=self.call_sid,
+            passes=self.passes,
+            complete=self.complete,
+            questions=len(self.questions),
+            final_pass_ms=round((time.monotonic() - started) * 1000),
+        )
+        return self.analysis()
+
+
+_client: Optional[AsyncOpenAI] = None
+
+
+async def _openai_complete(system_prompt: str, user_prompt: str) -> str:
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(api_key=os.getenv("ANALYSIS_OPENAI_API_KEY"))
+    # Live turns share the OpenAI quota and go first; a pass that gets no
+    # quota fails and its questions stay marked for the next one.
+    await rate_limits.acquire(
+        "openai",
+        rate_limits.BATCH,
+        requests=1,
+        tokens=(len(system_prompt) + len(user_prompt)) // 4,
+    )
+    async with lanes.analysis.slot():
+        response = await _client.chat.completions.create(
+            model=ANALYSIS_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            response_format={"type": "json_object"},
+            temperature=0,
+        )
+    return response.choices[0].message.content
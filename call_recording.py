@@ -0,0 +1,154 @@
+"""
+In-process call recording from the pipeline's own audio frames.
+
+With CALL_RECORDING=pipeline, no Twilio API request is made at call setup.
+A pipecat AudioBufferProcessor taps the caller's and the bot's audio as they
+pass through the pipeline. Every RECORDING_FLUSH_SECONDS it hands over a
+stereo chunk (caller left, bot right), which CallRecorder appends to a WAV
+file on local disk. Memory stays bounded by one chunk. After hangup the
+file is uploaded to GCP_STORAGE_BUCKET_NAME under recordings/ in the
+background and then removed. Without a bucket it stays in RECORDING_DIR.
+
+CALL_RECORDING=twilio (the default) keeps asking Twilio to record the call,
+and pipeline mode falls back to it if the local file cannot be created.
+CALL_RECORDING=off records nothing.
+"""
+
+import asyncio
+import os
+import tempfile
+from typing import Optional, Set
+import wave
+
+from pipecat.processors.audio.audio_buffer_processor import (
+    AudioBufferProcessor,
+)
+
+import lanes
+from utils.logging import logger
+
+CALL_RECORDING = os.getenv("CALL_RECORDING", "twilio")
+RECORDING_DIR = os.getenv(
+    "RECORDING_DIR", os.path.join(tempfile.gettempdir(), "call_recordings")
+)
+RECORDING_SAMPLE_RATE = int(os.getenv("RECORDING_SAMPLE_RATE", "8000"))
+RECORDING_FLUSH_SECONDS = float(os.getenv("RECORDING_FLUSH_SECONDS", "5"))
+RECORDING_BUCKET = os.getenv("GCP_STORAGE_BUCKET_NAME")
+
+_uploads: Set[asyncio.Task] = set()
+_storage_client = None
+
+
+class CallRecorder:
+    """Appends a call's stereo audio to a local WAV file as it is recorded."""
+
+    def __init__(
+        self,
+        call_sid: str,
+        directory: str = RECORDING_DIR,
+        sample_rate: int = RECORDING_SAMPLE_RATE,
+        flush_seconds: float = RECORDING_FLUSH_SECONDS,
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.call_sid = call_sid
+        self.sample_rate = sample_rate
+        self.flush_seconds = flush_seconds
+        self.path = os.path.join(directory, f"{call_sid}.wav")
+        self.bytes_written = 0
+        self._wav: Optional[wave.Wave_write] = wave.open(self.path, "wb")
+        self._wav.setnchannels(2)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def processor(self) -> AudioBufferProcessor:
+        """The pipeline tap; place it after transport.output()."""
+        buffer = AudioBufferProcessor(
+            sample_rate=self.sample_rate,
+            num_channels=2,
+            buffer_size=int(self.sample_rate * 2 * self.flush_seconds),
+        )
+        buffer.add_event_handler("on_audio_data", self._on_audio_data)
+        return buffer
+
+    async def _on_audio_data(
+        self,
+        buffer: AudioBufferProcessor,
+        audio: bytes,
+        sample_rate: int,
+        num_channels: int,
+    ) -> None:
+        self.write(audio)
+
+    def write(self, audio: bytes) -> None:
+        if self._wav is None or not audio:
+            return
+        self._wav.writeframes(audio)
+        self.bytes_written += len(audio)
+
+    def close(self) -> None:
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+    def finish(self) -> Optional[asyncio.Task]:
+        """Close the file and upload it in the background."""
+        self.close()
+        if not self.bytes_written:
+            os.remove(self.path)
+            return None
+        logger.info(
+            "Call recording written",
+            call_sid=self.call_sid,
+            path=self.path,
+            seconds=round(self.bytes_written / (4 * self.sample_rate), 1),
+        )
+        if not RECORDING_BUCKET:
+            return None
+        task = asyncio.create_task(
+            _upload(self.path, f"recordings/{self.call_sid}.wav")
+        )
+        _uploads.add(task)
+        task.add_done_callback(_uploads.discard)
+        return task
+
+
+def _upload_blob(path: str, blob_name: str) -> None:
+    global _storage_client
+    from google.cloud import storage
+
+    if _storage_client is None:
+        _storage_client = storage.Client()
+    blob = _storage_client.bucket(RECORDING_BUCKET).blob(blob_name)
+    blob.upload_from_filename(path, content_type="audio/wav")
+
+
+async def _upload(path: str, blob_name: str) -> None:
+    try:
+        await lanes.uploads.run(_upload_blob, path, blob_name)
+        os.remove(path)
+        logger.info("Call recording uploaded", blob=blob_name)
+    except Exception as e:
+        logger.error(
+            "Failed to upload call recording", path=path, error=str(e)
+        )
+
+
+async def wait_for_uploads(timeout: float = 30.0) -> None:
+    """Let in-flight uploads finish on shutdown."""
+    if _uploads:
+        await asyncio.wait(set(_uploads), timeout=timeout)
+
+
+def start_recorder(call_sid: str) -> Optional[CallRecorder]:
+    """A recorder for pipeline mode, or None to use Twilio's recording."""
+    if CALL_RECORDING != "pipeline":
+        return None
+    try:
+        return CallRecorder(call_sid)
+    except OSError as e:
+        logger.warning(
+            "Cannot record in process, falling back to Twilio",
+            call_sid=call_sid,
+            error=str(e),
+        )
+        return None
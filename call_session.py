@@ -0,0 +1,161 @@
+"""
+Per-call lifecycle: everything one media stream holds, released once.
+
+websocket_endpoint opens a CallSession when it takes a call slot and closes
+it in its finally block, whatever way the call ended. run_bot attaches the
+pipeline task and transport it builds. close() then, in order:
+
+- stops the pipeline task if it is still running (the handler was cancelled)
+- finishes the recording and closes the websocket if the peer has not
+- gives the call slot back
+- deletes the call's Redis claim (call_prompt:<key>)
+- writes the final transcript
+- drops every reference it holds
+
+Live sessions and the objects they own are tracked in weak sets. A session
+or pipeline that is still alive long after its close() was called has leaked.
+session_counts() reports those counts on /call-sessions and logs them on every
+close, so growth over days of traffic shows up. Pipecat processors hold
+reference cycles, so a finished call's objects stay counted until the next
+garbage collection. Steady growth, not a non-zero count, is the leak;
+memory_accounting.py checks each call precisely when enabled.
+"""
+
+import time
+from typing import Dict, Optional
+import weakref
+
+from starlette.websockets import WebSocket, WebSocketState
+
+from capacity import capacity
+import lanes
+from utils.logging import logger
+from utils.redis_client import RedisClient
+
+_live: Dict[str, "weakref.WeakSet"] = {
+    "session": weakref.WeakSet(),
+    "websocket": weakref.WeakSet(),
+    "pipeline_task": weakref.WeakSet(),
+    "transport": weakref.WeakSet(),
+    "llm_context": weakref.WeakSet(),
+}
+_totals = {"opened": 0, "closed": 0}
+
+
+def _track(kind: str, obj: object) -> None:
+    try:
+        _live[kind].add(obj)
+    except TypeError:
+        pass  # not weak-referenceable; nothing to count
+
+
+class CallSession:
+    def __init__(self, websocket: WebSocket) -> None:
+        self.websocket = websocket
+        self.call_sid: Optional[str] = None
+        self.redis_key: Optional[str] = None
+        self.task = None
+        self.transport = None
+        self.recorder = None
+        self.transcript_log = None
+        self.memory = None  # memory_accounting probe, when enabled
+        self.closed = False
+        self.started_at = time.monotonic()
+        _totals["opened"] += 1
+        _track("session", self)
+        _track("websocket", websocket)
+
+    def claim(self, call_sid: str, redis_key: str) -> None:
+        """The call's Redis data, deleted when the session closes."""
+        self.call_sid = call_sid
+        self.redis_key = redis_key
+
+    def attach(
+        self,
+        task: object = None,
+        transport: object = None,
+        context: object = None,
+    ) -> None:
+        """Called by run_bot once the pipeline is built."""
+        if task is not None:
+            self.task = task
+        if transport is not None:
+            self.transport = transport
+        owned = (
+            ("pipeline_task", task),
+            ("transport", transport),
+            ("llm_context", context),
+        )
+        for kind, obj in owned:
+            if obj is None:
+                continue
+            _track(kind, obj)
+            if self.memory is not None:
+                self.memory.watch(kind, obj)
+
+    async def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        _totals["closed"] += 1
+        try:
+            if self.task is not None and not self.task.has_finished():
+                await self.task.cancel()
+        except Exception as e:
+            logger.warning(
+                "Failed to cancel pipeline",
+                call_sid=self.call_sid,
+                error=str(e),
+            )
+        if self.recorder is not None:
+            self.recorder.finish()
+        await self._close_websocket()
+        capacity.release()
+        if self.redis_key:
+            try:
+                await lanes.background.run(
+                    RedisClient.delete_call_prompt, self.redis_key
+                )
+            except Exception as e:
+                logger.warning(
+                    "Failed to delete call data",
+                    key=self.redis_key,
+                    error=str(e),
+                )
+        # Final analysis pass and transcript write; the call slot is free.
+        if self.transcript_log is not None:
+            await self.transcript_log.close()
+        self.websocket = self.task = self.transport = None
+        self.recorder = self.transcript_log = None
+        if self.memory is not None:
+            await self.memory.finish()
+            self.memory = None
+        logger.info(
+            "Call session closed",
+            call_sid=self.call_sid,
+            seconds=round(time.monotonic() - self.started_at, 1),
+            **session_counts(),
+        )
+
+    async def _close_websocket(self) -> None:
+        websocket = self.websocket
+        if (
+            websocket is None
+            or websocket.client_state != WebSocketState.CONNECTED
+        ):
+            return
+        try:
+            await websocket.close()
+        except Exception:
+            pass  # already gone
+
+
+def session_counts() -> dict:
+    """Open sessions, totals, and per-call objects not yet collected."""
+    sessions = list(_live["session"])
+    return {
+        "open_sessions": sum(not s.closed for s in sessions),
+        "opened_total": _totals["opened"],
+        "closed_total": _totals["closed"],
+        "live_objects": {kind: len(objs) for kind, objs in _live.items()},
+    }
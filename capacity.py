@@ -0,0 +1,96 @@
+"""
+Per-worker call capacity and fleet load publishing.
+
+Each gunicorn worker runs its own event loop and handles a bounded number of
+concurrent calls. The worker's live call count is published to Redis on a
+heartbeat so the load of the whole fleet can be read from any worker.
+"""
+
+import asyncio
+import os
+import socket
+from typing import Optional
+
+import lanes
+from utils.redis_client import RedisClient
+
+MAX_CALLS_PER_WORKER = int(os.getenv("MAX_CALLS_PER_WORKER", "12"))
+LOAD_HEARTBEAT_SECONDS = float(os.getenv("LOAD_HEARTBEAT_SECONDS", "5"))
+# How many times /agent redirects a call back through the load balancer
+# before giving up when the worker it lands on is full.
+SHED_REDIRECT_ATTEMPTS = int(os.getenv("SHED_REDIRECT_ATTEMPTS", "2"))
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class CallCapacity:
+    """Counts live calls on this worker against a fixed cap."""
+
+    def __init__(self, limit: int = MAX_CALLS_PER_WORKER) -> None:
+        self.limit = limit
+        self.active = 0
+        self.shed = 0
+        # Set on SIGTERM (see drain.py): finish live calls, take no new ones.
+        self.draining = False
+
+    def has_capacity(self) -> bool:
+        return not self.draining and self.active < self.limit
+
+    def try_acquire(self) -> bool:
+        if not self.has_capacity():
+            self.shed += 1
+            return False
+        self.active += 1
+        return True
+
+    def release(self) -> None:
+        self.active = max(0, self.active - 1)
+
+    def snapshot(self) -> dict:
+        return {
+            "worker_id": worker_id(),
+            "active_calls": self.active,
+            "max_calls": self.limit,
+            "shed_calls": self.shed,
+            "draining": self.draining,
+        }
+
+
+capacity = CallCapacity()
+
+
+def fleet_has_capacity() -> Optional[bool]:
+    """
+    Whether any other worker in the fleet reported free capacity.
+    Returns None when fleet load is unknown (Redis unavailable).
+    """
+    workers = RedisClient.get_worker_loads()
+    if workers is None:
+        return None
+    me = worker_id()
+    return any(
+        w.get("active_calls", 0) < w.get("max_calls", 0)
+        for w in workers
+        if w.get("worker_id") != me and not w.get("draining")
+    )
+
+
+async def publish_load_forever(
+    interval: float = LOAD_HEARTBEAT_SECONDS,
+) -> None:
+    """Heartbeat this worker's call count to Redis until cancelled."""
+    ttl = max(int(interval * 3), 1)
+    try:
+        while True:
+            await lanes.background.run(
+                RedisClient.set_worker_load,
+                worker_id(),
+                capacity.snapshot(),
+                ttl,
+            )
+            await asyncio.sleep(interval)
+    except asyncio.CancelledError:
+        await lanes.background.run(RedisClient.delete_worker_load, worker_id())
+        raise
@@ -0,0 +1,170 @@
+"""
+Circuit breaker with adaptive timeouts for the voice-crm backend.
+
+One breaker per worker wraps every backend request. It times requests out
+at a multiple of the recent p95 latency (bounded by BACKEND_TIMEOUT_MIN and
+BACKEND_TIMEOUT_MAX) instead of a fixed 10 s, and opens when most recent
+requests fail. While open, requests are refused immediately, so callers can
+divert work to a local queue (see activity_queue.py). After
+BACKEND_BREAKER_COOLDOWN seconds one probe request is let through
+(half-open) with the full BACKEND_TIMEOUT_MAX, so a backend that got
+slower than the learned timeout can still close it. If it succeeds the
+breaker closes; if it fails the breaker opens again. Requests that time out
+add their elapsed time to the latency window, so the timeout also adapts
+upward.
+"""
+
+from collections import deque
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from utils.logging import logger
+
+BACKEND_TIMEOUT_MIN = float(os.getenv("BACKEND_TIMEOUT_MIN", "1.0"))
+BACKEND_TIMEOUT_MAX = float(os.getenv("BACKEND_TIMEOUT_MAX", "10.0"))
+BACKEND_TIMEOUT_P95_MULTIPLIER = float(
+    os.getenv("BACKEND_TIMEOUT_P95_MULTIPLIER", "3.0")
+)
+BACKEND_BREAKER_FAILURE_RATIO = float(
+    os.getenv("BACKEND_BREAKER_FAILURE_RATIO", "0.5")
+)
+BACKEND_BREAKER_MIN_REQUESTS = int(
+    os.getenv("BACKEND_BREAKER_MIN_REQUESTS", "5")
+)
+BACKEND_BREAKER_COOLDOWN = float(os.getenv("BACKEND_BREAKER_COOLDOWN", "15"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        timeout_min: float = BACKEND_TIMEOUT_MIN,
+        timeout_max: float = BACKEND_TIMEOUT_MAX,
+        p95_multiplier: float = BACKEND_TIMEOUT_P95_MULTIPLIER,
+        failure_ratio: float = BACKEND_BREAKER_FAILURE_RATIO,
+        min_requests: int = BACKEND_BREAKER_MIN_REQUESTS,
+        cooldown: float = BACKEND_BREAKER_COOLDOWN,
+        window: int = 20,
+    ) -> None:
+        self.name = name
+        self.timeout_min = timeout_min
+        self.timeout_max = timeout_max
+        self.p95_multiplier = p95_multiplier
+        self.failure_ratio = failure_ratio
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._outcomes: deque = deque(maxlen=window)
+        self._latencies: deque = deque(maxlen=200)
+        self._p95: Optional[float] = None
+        self._samples = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+        self.transitions: Dict[str, int] = {}
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        edge = f"{self.state}->{state}"
+        self.transitions[edge] = self.transitions.get(edge, 0) + 1
+        logger.warning(
+            "Circuit breaker state changed", breaker=self.name, transition=edge
+        )
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state == CLOSED:
+            self._outcomes.clear()
+        self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a probe through (0 if not open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; counts refusals."""
+        with self._lock:
+            if self.state == OPEN and self.retry_after() == 0.0:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            if self.state == CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def timeout(self) -> float:
+        """
+        Request timeout from recent latency; the maximum until there is data
+        and for the half-open probe.
+        """
+        p95 = self._p95
+        if p95 is None or self.state == HALF_OPEN:
+            return self.timeout_max
+        return min(
+            self.timeout_max, max(self.timeout_min, p95 * self.p95_multiplier)
+        )
+
+    def _record_latency(self, latency: float, rank: bool = False) -> None:
+        self._latencies.append(latency)
+        self._samples += 1
+        # Re-rank every 10 samples; the window is small but this runs per request.
+        if rank or self._samples % 10 == 1:
+            ordered = sorted(self._latencies)
+            self._p95 = ordered[
+                min(len(ordered) - 1, int(len(ordered) * 0.95))
+            ]
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self._record_latency(latency)
+            self._outcomes.append(True)
+            if self.state == HALF_OPEN:
+                self._transition(CLOSED)
+
+    def record_failure(self, timed_out_after: Optional[float] = None) -> None:
+        """A failed request; pass the elapsed time when it timed out."""
+        with self._lock:
+            if timed_out_after is not None:
+                # At least this slow: lets the timeout grow past a stale p95.
+                self._record_latency(timed_out_after, rank=True)
+            self._outcomes.append(False)
+            if self.state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            failures = self._outcomes.count(False)
+            if (
+                self.state == CLOSED
+                and len(self._outcomes) >= self.min_requests
+                and failures / len(self._outcomes) >= self.failure_ratio
+            ):
+                self._transition(OPEN)
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "timeout_seconds": round(self.timeout(), 3),
+            "p95_seconds": (
+                round(self._p95, 3) if self._p95 is not None else None
+            ),
+            "recent_failures": self._outcomes.count(False),
+            "recent_requests": len(self._outcomes),
+            "rejected": self.rejected,
+            "retry_after_seconds": round(self.retry_after(), 3),
+            "transitions": dict(self.transitions),
+        }
+
+
+backend_breaker = CircuitBreaker("voice-crm-backend")
@@ -0,0 +1,115 @@
+"""
+Graceful drain of in-flight calls on SIGTERM.
+
+While uvicorn serves, SIGTERM goes to its handle_exit, which stops the
+server at once and closes every live media stream websocket mid-call.
+Drainer takes SIGTERM over from the lifespan startup and, on the first
+signal:
+
+1. marks the worker as draining: /agent sheds new calls to other workers,
+   /ws refuses new streams, /ready answers 503 and the published load tells
+   the fleet to skip this worker
+2. waits for live calls to end, up to DRAIN_GRACE_SECONDS
+3. gives pending CRM activities one more delivery attempt, for at most
+   DRAIN_FLUSH_SECONDS (the SQLite queue is on local disk and goes away
+   with the instance)
+4. logs the drain time, the calls still live (dropped) and the activities
+   left undelivered, then hands the signal to uvicorn, which shuts down as
+   before; shutdown_handler in app.py flushes tracing and logs last
+
+A second SIGTERM skips the rest of the drain. Cloud Run kills the container
+10 seconds after SIGTERM and gunicorn kills workers after graceful_timeout
+(30 s), so grace and flush together should stay under both.
+"""
+
+import asyncio
+import os
+import signal
+import threading
+import time
+from types import FrameType
+from typing import Callable, Optional
+
+from activity_queue import activity_queue, ActivityQueue
+from capacity import CallCapacity, capacity
+from utils.logging import logger
+
+DRAIN_GRACE_SECONDS = float(os.getenv("DRAIN_GRACE_SECONDS", "7"))
+DRAIN_FLUSH_SECONDS = float(os.getenv("DRAIN_FLUSH_SECONDS", "2"))
+
+_POLL_SECONDS = 0.2
+
+
+class Drainer:
+    def __init__(
+        self,
+        capacity: CallCapacity = capacity,
+        queue: ActivityQueue = activity_queue,
+        grace: float = DRAIN_GRACE_SECONDS,
+        flush_timeout: float = DRAIN_FLUSH_SECONDS,
+    ) -> None:
+        self.capacity = capacity
+        self.queue = queue
+        self.grace = grace
+        self.flush_timeout = flush_timeout
+        self.report: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server_handler: Optional[Callable] = None
+
+    def install(self) -> bool:
+        """
+        Take SIGTERM over from the server. Call from the lifespan startup, on
+        the running loop; uvicorn restores its own handlers on exit.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return False
+        self._loop = asyncio.get_running_loop()
+        self._server_handler = signal.signal(signal.SIGTERM, self._on_sigterm)
+        return True
+
+    def _on_sigterm(self, signum: int, frame: Optional[FrameType]) -> None:
+        if self._task is not None:
+            logger.warning("Second SIGTERM, stopping without drain")
+            self._hand_over(signum, frame)
+            return
+        self._loop.call_soon_threadsafe(self._start, signum, frame)
+
+    def _start(self, signum: int, frame: Optional[FrameType]) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.ensure_future(self.drain())
+        self._task.add_done_callback(lambda _: self._hand_over(signum, frame))
+
+    def _hand_over(self, signum: int, frame: Optional[FrameType]) -> None:
+        handler = self._server_handler
+        if callable(handler):
+            handler(signum, frame)
+        elif handler != signal.SIG_IGN:
+            signal.signal(signum, signal.SIG_DFL)
+            signal.raise_signal(signum)
+
+    async def drain(self) -> dict:
+        started = time.monotonic()
+        self.capacity.draining = True
+        logger.warning(
+            "Draining worker",
+            active_calls=self.capacity.active,
+            grace_seconds=self.grace,
+        )
+        deadline = started + self.grace
+        while self.capacity.active and time.monotonic() < deadline:
+            await asyncio.sleep(_POLL_SECONDS)
+        dropped = self.capacity.active
+        pending = await self.queue.flush(timeout=self.flush_timeout)
+        self.report = {
+            "drain_seconds": round(time.monotonic() - started, 2),
+            "dropped_calls": dropped,
+            "pending_activities": pending,
+        }
+        log = logger.warning if dropped or pending else logger.info
+        log("Drain finished", **self.report)
+        return self.report
+
+
+drainer = Drainer()
@@ -0,0 +1,210 @@
+"""
+Read-through cache of DynamicVariable rows by id.
+
+helper.dynamic_variable_update fills a prompt's {{placeholders}} from a
+DynamicVariable row. It used to query the database on every render, on the
+event loop, and failed on a missing row. DynamicVariableCache sits in front
+of that query:
+
+- get() answers from a fresh entry, or makes one query on the live lane.
+  Concurrent misses for the same id share that query.
+- A missing row is cached as None, so a bad id costs one query per TTL.
+- Entries expire after DYNAMIC_VARS_TTL_SECONDS. invalidate(id) drops one at
+  once (invalidate() drops all); other workers see the change within the TTL.
+- prefetch() warms the cache for a campaign batch: every id not cached yet,
+  with one IN query per DYNAMIC_VARS_PREFETCH_CHUNK ids, on the background
+  lane.
+
+stats() reports hits, misses, rows not found, and get() latency for cache
+hits and misses alongside the prefetch query times.
+
+The database layer (db, sqlmodel) is imported on first query only.
+"""
+
+import asyncio
+from collections import deque, OrderedDict
+import os
+import time
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import lanes
+from utils.logging import logger
+
+DYNAMIC_VARS_TTL_SECONDS = float(os.getenv("DYNAMIC_VARS_TTL_SECONDS", "300"))
+DYNAMIC_VARS_CACHE_SIZE = int(os.getenv("DYNAMIC_VARS_CACHE_SIZE", "50000"))
+DYNAMIC_VARS_PREFETCH_CHUNK = int(
+    os.getenv("DYNAMIC_VARS_PREFETCH_CHUNK", "5000")
+)
+
+# (session, ids) -> {id: vars} for the rows that exist.
+Loader = Callable[[object, List[str]], Dict[str, dict]]
+
+_MISSING = object()
+_LATENCY_SAMPLES = 500
+
+
+def _load_rows(session: object, ids: List[str]) -> Dict[str, dict]:
+    from sqlmodel import select
+
+    from db import DynamicVariable
+
+    rows = session.exec(
+        select(DynamicVariable).where(DynamicVariable.id.in_(ids))
+    )
+    return {str(row.id): row.vars or {} for row in rows}
+
+
+def _latency_ms(samples: Deque[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95": round(ordered[int(len(ordered) * 0.95)] * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+class DynamicVariableCache:
+    def __init__(
+        self,
+        load: Loader = _load_rows,
+        ttl: float = DYNAMIC_VARS_TTL_SECONDS,
+        max_size: int = DYNAMIC_VARS_CACHE_SIZE,
+        chunk: int = DYNAMIC_VARS_PREFETCH_CHUNK,
+    ) -> None:
+        self._load = load
+        self.ttl = ttl
+        self.max_size = max_size
+        self.chunk = chunk
+        self._entries: "OrderedDict[str, Tuple[float, Optional[dict]]]" = (
+            OrderedDict()
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.not_found = 0
+        self.prefetched = 0
+        self.queries = 0
+        # Bumped by invalidate(); a query started before it is not cached.
+        self._generation = 0
+        self._latency: Dict[str, Deque[float]] = {
+            kind: deque(maxlen=_LATENCY_SAMPLES)
+            for kind in ("hit", "miss", "prefetch")
+        }
+
+    def _fresh(self, key: str) -> object:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: str, value: Optional[dict]) -> None:
+        if value is None:
+            self.not_found += 1
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _query(
+        self, lane: "lanes.Lane", session: object, keys: List[str]
+    ) -> Dict[str, dict]:
+        """Load keys, cache every one of them, and settle their waiters."""
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in keys}
+        self._inflight.update(futures)
+        self.queries += 1
+        generation = self._generation
+        try:
+            rows = await lane.run(self._load, session, keys)
+        except BaseException as e:
+            for future in futures.values():
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    future.exception()  # waiters re-raise it; none is fine too
+            raise
+        finally:
+            for key in keys:
+                self._inflight.pop(key, None)
+        for key, future in futures.items():
+            if generation == self._generation:
+                self._put(key, rows.get(key))
+            future.set_result(rows.get(key))
+        return rows
+
+    async def get(
+        self, dynamic_vars_id: object, session: object
+    ) -> Optional[dict]:
+        """The row's vars, or None when there is no such row."""
+        started = time.perf_counter()
+        key = str(dynamic_vars_id)
+        value = self._fresh(key)
+        if value is not _MISSING:
+            self.hits += 1
+            self._latency["hit"].append(time.perf_counter() - started)
+            return value
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future)
+        self.misses += 1
+        rows = await self._query(lanes.live, session, [key])
+        self._latency["miss"].append(time.perf_counter() - started)
+        return rows.get(key)
+
+    async def prefetch(self, ids: Iterable, session: object) -> int:
+        """Cache every id not cached yet; returns how many were queried."""
+        wanted = [
+            key
+            for key in dict.fromkeys(str(i) for i in ids)
+            if key not in self._inflight and self._fresh(key) is _MISSING
+        ]
+        for start in range(0, len(wanted), self.chunk):
+            chunk = wanted[start : start + self.chunk]
+            started = time.perf_counter()
+            await self._query(lanes.background, session, chunk)
+            self._latency["prefetch"].append(time.perf_counter() - started)
+        self.prefetched += len(wanted)
+        if wanted:
+            logger.info(
+                "Prefetched dynamic variables",
+                ids=len(wanted),
+                queries=-(-len(wanted) // self.chunk),
+            )
+        return len(wanted)
+
+    def invalidate(self, dynamic_vars_id: object = None) -> int:
+        """Drop one id (or everything); returns how many entries went."""
+        self._generation += 1
+        if dynamic_vars_id is None:
+            dropped = len(self._entries)
+            self._entries.clear()
+            return dropped
+        return int(self._entries.pop(str(dynamic_vars_id), None) is not None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_misses": self.shared,
+            "not_found": self.not_found,
+            "prefetched": self.prefetched,
+            "queries": self.queries,
+            "latency_ms": {
+                kind: _latency_ms(s) for kind, s in self._latency.items()
+            },
+        }
+
+
+dynamic_vars = DynamicVariableCache()
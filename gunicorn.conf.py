@@ -0,0 +1,26 @@
+# Gunicorn settings for the multi-worker serving mode.
+#
+# Each worker is a separate process with its own event loop, so VAD,
+# audio serialization and pipelines for concurrent calls are spread across
+# cores. Size with WEB_CONCURRENCY (defaults to the usable CPU count) and
+# cap concurrent calls per worker with MAX_CALLS_PER_WORKER (see capacity.py).
+# Those are the only concurrency settings: UvicornWorker ignores gunicorn's
+# `threads`, and blocking work runs on the worker's lanes (lanes.py).
+
+import os
+
+
+def _usable_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f":{os.getenv('PORT', '8080')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", _usable_cpus()))
+# Calls are long-lived websockets; never kill a worker for a slow request.
+timeout = 0
+# Time allowed for in-flight calls to finish after SIGTERM.
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
@@ -2,54 +2,68 @@ import os
 import re
 from openai import AsyncOpenAI
 import json
-from sqlmodel import select, Session
-from db import get_session, DynamicVariable, Agent, PhoneNumber
-from google.cloud import storage
+from sqlmodel import Session
+from db import get_session, Agent, PhoneNumber
 from typing import Annotated
 from fastapi import (
     Depends,
 )
+import lanes
+import rate_limits
+from dynamic_vars import dynamic_vars
+from transcript_log import load_transcript
+from transcript_text import normalize_transcript, strip_html_tags  # noqa: F401
+from utils.logging import logger
 
 SessionDep = Annotated[Session, Depends(get_session)]
 
 async def dynamic_variable_update(dynamicVarsId: str, session: Session, prompt: str) -> str:
     try:
-        dynamicVar = session.exec(
-            select(DynamicVariable).where(DynamicVariable.id == dynamicVarsId)
-        ).first()
-        print("dynamicVar.vars............................", dynamicVar)
-        dynamicVarObj = dynamicVar.vars
-        if dynamicVarObj:
-            for dynamicKey, value in dynamicVarObj.items():
-                placeholder = f"{{{{{dynamicKey}}}}}"
-                prompt = prompt.replace(placeholder, str(value))
-        print("Updated prompt with dynamic variables:-------------------------------------", prompt)
+        dynamicVarObj = await dynamic_vars.get(dynamicVarsId, session)
+        if dynamicVarObj is None:
+            logger.warning("Dynamic variables not found", dynamic_vars_id=dynamicVarsId)
+            return prompt
+        logger.debug("Loaded dynamic variables", dynamic_vars_id=dynamicVarsId)
+        for dynamicKey, value in dynamicVarObj.items():
+            placeholder = f"{{{{{dynamicKey}}}}}"
+            prompt = prompt.replace(placeholder, str(value))
+        logger.debug(
+            "Updated prompt with dynamic variables",
+            dynamic_vars_id=dynamicVarsId,
+            prompt_chars=len(prompt),
+        )
         return prompt
     except Exception as e:
-        print(f"Failed to replace dynamic variables: {e}")
+        logger.error("Failed to replace dynamic variables", error=str(e))
+        return prompt
 
 async def get_transcription(call_sid: str) -> dict:
 
     try:
-        """Retrieve transcription JSON from GCP bucket"""
-        client = storage.Client()
-        bucket = client.bucket(os.getenv("GCP_STORAGE_BUCKET_NAME"))
-        blob = bucket.blob(f"transcriptions/{call_sid}.json")
-        print("blob.................................", call_sid, blob)
-        # if not blob.exists():
-        #     print("Transcription not found in GCP............................")
-        #     raise HTTPException(status_code=404, detail="Transcription not found")
-        text = json.loads(blob.download_as_text())
+        """Retrieve the call's transcript; the turns so far while it is live"""
+        text = await lanes.analysis.run(load_transcript, call_sid)
         if text:
-            print("Transcription fetched successfully from GCP bucket")
-        # print("text.............................", text)
+            logger.info(
+                "Transcription fetched",
+                call_sid=call_sid,
+                complete=text.get("complete", True),
+            )
         return text
     except Exception as e:
-        print(f"Unable top fetch blob from bucket: {e}")
+        logger.error("Unable to fetch blob from bucket", call_sid=call_sid, error=str(e))
         return {"error": 'failed to get transcripiton'}
 
 async def analyze_transcription(transcript: dict, questions: list) -> dict:
     """Process transcript through OpenAI API with dynamic questions based on their types."""
+    # Answered during the call (see call_analysis.py): nothing left to do.
+    precomputed = transcript.get("analysis") if isinstance(transcript, dict) else None
+    if (
+        precomputed
+        and precomputed.get("complete")
+        and {q["name"] for q in questions} <= set(precomputed.get("answers", {}))
+    ):
+        return precomputed
+
     client = AsyncOpenAI(api_key=os.getenv("ANALYSIS_OPENAI_API_KEY"))
 
     system_prompt = """You are an expert call transcript analyzer. Your task is to analyze call transcripts and answer specific questions based on the conversation content.
@@ -140,25 +154,38 @@ async def analyze_transcription(transcript: dict, questions: list) -> dict:
         elif question_type == "number":
             processed_questions[question_key] = {"type": "numerical"}
 
+    # One pass over the turns gives the prompt text and the search text.
+    text = normalize_transcript(transcript)
+
     user_prompt = f"""
     Analyze the following call transcription:
 
-    {json.dumps(transcript, indent=2)}
+    {text.prompt_text}
 
     Please answer these questions according to the given data types:
 
     {json.dumps(processed_questions, indent=2)}
     """
 
+    # Batch work: waits behind live calls, raises RateLimited when the quota
+    # stays exhausted rather than returning an empty analysis.
+    await rate_limits.acquire(
+        "openai",
+        rate_limits.BATCH,
+        requests=1,
+        tokens=(len(system_prompt) + len(user_prompt)) // 4,
+    )
+
     try:
-        response = await client.chat.completions.create(
-            model=os.getenv("ANALYSIS_OPENAI_MODEL") if os.getenv("ANALYSIS_OPENAI_MODEL") else "gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.7
-        )
+        async with lanes.analysis.slot():
+            response = await client.chat.completions.create(
+                model=os.getenv("ANALYSIS_OPENAI_MODEL") if os.getenv("ANALYSIS_OPENAI_MODEL") else "gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.7
+            )
 
         raw_response = response.choices[0].message.content.strip()
         raw_response = re.sub(r'```json|```', '', raw_response).strip()
@@ -184,11 +211,8 @@ async def analyze_transcription(transcript: dict, questions: list) -> dict:
                     # Extract keywords from the question (words longer than 3 chars)
                     keywords = [w.lower() for w in question.split() if len(w) > 3 and w.lower() not in ['does', 'did', 'have', 'has', 'what', 'when', 'where', 'which', 'would', 'will', 'from', 'that', 'this', 'there', 'their']]
                     
-                    # Convert transcript to lowercase string for searching
-                    transcript_text = json.dumps(transcript).lower()
-                    
                     # Check if any relevant keywords are present in the transcript
-                    topic_present = any(kw in transcript_text for kw in keywords)
+                    topic_present = any(text.mentions(kw) for kw in keywords)
                     
                     if not topic_present:
                         # If topic is not discussed, set to unknown
@@ -211,7 +235,7 @@ async def analyze_transcription(transcript: dict, questions: list) -> dict:
         return analysis
 
     except Exception as e:
-        print(f"OpenAI API error: {e}")
+        logger.error("OpenAI API error", error=str(e))
         return {
             "summary": "",
             "key_points": [],
@@ -238,7 +262,3 @@ AI_MODELS = {
     "OPENAI_GPT4_1_Mini": "gpt-4.1-mini-2025-04-14",
     "OPENAI_GPT4_1_Nano": "gpt-4.1-nano-2025-04-14",
 }
-
-def strip_html_tags(text):
-    clean = re.compile('<.*?>')
-    return re.sub(clean, '', text)
\ No newline at end of file
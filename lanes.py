@@ -0,0 +1,247 @@
+"""
+Execution lanes: bounded pools that keep background work off live calls.
+
+Live call pipelines run on the event loop, and every blocking call they make
+(Redis lookups, agent config, Twilio) needs a thread promptly. Before lanes,
+that work shared the default thread pool (and starlette's) with webhook
+forwarding, CRM delivery, uploads and analysis, so a burst of background work
+could queue a call's setup behind it. Each kind of work now has its own lane
+with its own concurrency limit:
+
+    live        blocking calls on the call path; the loop's default executor,
+                so asyncio.to_thread lands here
+    background  housekeeping: load heartbeat, config invalidations, call
+                cleanup, the activity queue's storage
+    webhooks    outbound HTTP to the backend: status webhook forwarding and
+                CRM activity delivery
+    analysis    incremental and post-call transcript analysis
+    uploads     recordings and transcripts to storage
+
+    result = await lanes.uploads.run(upload_blob, path, name)
+    async with lanes.analysis.slot():
+        await llm_request()
+
+run() runs a blocking function on the lane's threads; slot() bounds async
+work (an LLM request) by the same limit. A lane that is full queues work, it
+never borrows another lane's threads. Log rendering already has its own
+writer thread (utils/logging.py); its counters are reported with the lanes.
+
+snapshot() serves per-lane utilization over the last LANE_WINDOW_SECONDS,
+work running and queued now, and queue waits on /lanes. All lanes share the
+interpreter, so CPU-heavy background work still competes for the GIL; the
+lanes bound how much of it runs at once.
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import contextvars
+import functools
+import os
+import threading
+import time
+from typing import (
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from utils import logging as log_pipeline
+
+T = TypeVar("T")
+
+LANE_WINDOW_SECONDS = float(os.getenv("LANE_WINDOW_SECONDS", "60"))
+
+# Workers per lane.
+LANE_WORKERS: Dict[str, int] = {
+    "live": int(
+        os.getenv("LANE_LIVE_WORKERS", str(min(32, (os.cpu_count() or 1) + 4)))
+    ),
+    "background": int(os.getenv("LANE_BACKGROUND_WORKERS", "4")),
+    "webhooks": int(os.getenv("LANE_WEBHOOK_WORKERS", "4")),
+    "analysis": int(os.getenv("LANE_ANALYSIS_WORKERS", "2")),
+    "uploads": int(os.getenv("LANE_UPLOAD_WORKERS", "2")),
+}
+
+# Jobs kept for the utilization window, per lane.
+_WINDOW_JOBS = 4096
+
+
+class Lane:
+    def __init__(
+        self, name: str, workers: int, window: float = LANE_WINDOW_SECONDS
+    ) -> None:
+        self.name = name
+        self.workers = workers
+        self.window = window
+        self._executor: Optional["_LaneExecutor"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._running: Dict[int, float] = {}
+        self._finished: Deque[Tuple[float, float]] = deque(maxlen=_WINDOW_JOBS)
+        self._next_job = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_wait = 0.0
+        self._wait_total = 0.0
+        self.started_at = time.monotonic()
+
+    @property
+    def executor(self) -> "_LaneExecutor":
+        # A loop shuts its default executor down when it closes.
+        if self._executor is None or self._executor._shutdown:
+            self._executor = _LaneExecutor(self)
+        return self._executor
+
+    # -- accounting (from the loop and from the lane's threads) ------------
+
+    def _queue(self) -> float:
+        with self._lock:
+            self.queued += 1
+        return time.monotonic()
+
+    def _begin(self, queued_at: float) -> int:
+        now = time.monotonic()
+        with self._lock:
+            self.queued -= 1
+            job = self._next_job = self._next_job + 1
+            self._running[job] = now
+            wait = now - queued_at
+            self._wait_total += wait
+            self.max_wait = max(self.max_wait, wait)
+        return job
+
+    def _end(self, job: int, ok: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            started = self._running.pop(job)
+            self._finished.append((started, now))
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def _call(self, queued_at: float, fn: Callable[..., T]) -> T:
+        job = self._begin(queued_at)
+        ok = False
+        try:
+            result = fn()
+            ok = True
+            return result
+        finally:
+            self._end(job, ok)
+
+    # -- running work ------------------------------------------------------
+
+    def submit(
+        self, fn: Callable[..., T], *args: object, **kwargs: object
+    ) -> "Future[T]":
+        """Schedule a blocking call on the lane; a concurrent Future."""
+        return self.executor.submit(
+            contextvars.copy_context().run, fn, *args, **kwargs
+        )
+
+    async def run(
+        self, fn: Callable[..., T], *args: object, **kwargs: object
+    ) -> T:
+        """Run a blocking call on the lane's threads (like asyncio.to_thread)."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the lane's slots for async work."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        queued_at = self._queue()
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            with self._lock:
+                self.queued -= 1
+            raise
+        job = self._begin(queued_at)
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self._end(job, ok)
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        window_start = max(now - self.window, self.started_at)
+        with self._lock:
+            jobs = list(self._finished) + [
+                (s, now) for s in self._running.values()
+            ]
+            active = len(self._running)
+            started = self._next_job
+            stats = {
+                "workers": self.workers,
+                "active": active,
+                "queued": self.queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "mean_wait_ms": (
+                    round(self._wait_total / started * 1000, 1)
+                    if started
+                    else 0.0
+                ),
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+            }
+        busy = sum(
+            max(0.0, end - max(start, window_start)) for start, end in jobs
+        )
+        span_seconds = max(now - window_start, 1e-3)
+        stats["utilization"] = round(
+            min(busy / (self.workers * span_seconds), 1.0), 3
+        )
+        return stats
+
+
+lanes: Dict[str, Lane] = {
+    name: Lane(name, workers) for name, workers in LANE_WORKERS.items()
+}
+live = lanes["live"]
+background = lanes["background"]
+webhooks = lanes["webhooks"]
+analysis = lanes["analysis"]
+uploads = lanes["uploads"]
+
+
+class _LaneExecutor(ThreadPoolExecutor):
+    """A lane's threads; counts everything submitted, however it arrives."""
+
+    def __init__(self, lane: Lane) -> None:
+        super().__init__(
+            max_workers=lane.workers, thread_name_prefix=f"lane-{lane.name}"
+        )
+        self.lane = lane
+
+    def submit(
+        self, fn: Callable[..., T], /, *args: object, **kwargs: object
+    ) -> "Future[T]":
+        bound = functools.partial(fn, *args, **kwargs)
+        return super().submit(self.lane._call, self.lane._queue(), bound)
+
+
+def install(loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+    """Make the live lane the loop's default executor, so asyncio.to_thread
+    work is counted as live; call at startup."""
+    loop = loop or asyncio.get_running_loop()
+    loop.set_default_executor(live.executor)
+
+
+def snapshot() -> dict:
+    return {
+        "window_seconds": LANE_WINDOW_SECONDS,
+        "lanes": {name: lane.stats() for name, lane in lanes.items()},
+        "logging": log_pipeline.stats(),
+    }
@@ -0,0 +1,289 @@
+"""
+Opt-in per-call memory accounting and leak detection.
+
+With MEMORY_ACCOUNTING=true the worker runs tracemalloc (keeping
+MEMORY_TRACE_FRAMES frames per allocation), and every call gets a
+CallMemoryProbe around run_bot. The probe takes a measurement when run_bot
+starts and another once the call session has closed. Each measurement is
+taken after a full garbage collection and records:
+
+- traced memory by call component: VAD, serializer, LLM context, service
+  clients, transport, call artifacts and other. Each allocation goes to the
+  first frame of its traceback that belongs to a component (see
+  _COMPONENTS).
+- live objects by type
+
+The difference is what the call left behind. Weak references to the call's
+pipeline task, transport and LLM context show whether any of them outlived
+the call. The call is flagged when one did, or when it ran alone and more
+than MEMORY_LEAK_THRESHOLD_KB stayed allocated. When calls overlap, the byte
+counts include the other calls' memory and are only reported. Each report
+is logged as "Call memory". summary() serves the totals on /memory, and
+summary(collect=True) serves the worker's traced memory by component, which
+soak tests compare over time.
+
+Tracing slows every allocation. A measurement takes from tens of
+milliseconds to seconds, so measurements run one at a time on the background
+lane (lanes.py), and all probes waiting share the next one. This mode is for
+soak tests (benchmarks/soak.py) and for investigating a worker, not for
+normal traffic.
+"""
+
+import asyncio
+from collections import Counter, deque
+import gc
+import os
+import time
+import tracemalloc
+from typing import Deque, Dict, List, Optional, Tuple
+import weakref
+
+import lanes
+from utils.logging import logger
+
+MEMORY_ACCOUNTING = os.getenv("MEMORY_ACCOUNTING", "false").lower() == "true"
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "10"))
+MEMORY_LEAK_THRESHOLD_KB = int(os.getenv("MEMORY_LEAK_THRESHOLD_KB", "256"))
+
+# First match wins, checked from the innermost frame outwards.
+_COMPONENTS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("vad", ("batched_vad.py", "/audio/vad/", "silero", "onnxruntime")),
+    ("serializer", ("audio_codec.py", "/serializers/")),
+    (
+        "context",
+        (
+            "openai_llm_context",
+            "/aggregators/",
+            "prompt_cache.py",
+            "agent_config.py",
+        ),
+    ),
+    (
+        "service_clients",
+        (
+            "/services/",
+            "/openai/",
+            "/httpx/",
+            "/httpcore/",
+            "/elevenlabs",
+            "/cartesia",
+            "/websockets/",
+        ),
+    ),
+    ("transport", ("/transports/", "/starlette/", "/uvicorn/")),
+    (
+        "call_artifacts",
+        (
+            "call_recording.py",
+            "transcript_log.py",
+            "call_analysis.py",
+            "beep_detection.py",
+            "voicemail_detection.py",
+        ),
+    ),
+)
+# Allocations made by the accounting itself are left out.
+_OWN_FILES = (__file__, tracemalloc.__file__)
+_TOP_TYPES = 10
+_COMPONENT_CACHE_SIZE = 200_000
+
+_component_of: Dict[tracemalloc.Traceback, Optional[str]] = {}
+_active_probes = 0
+_probes_started = 0
+_totals = {"calls": 0, "flagged": 0}
+_flagged: Deque[dict] = deque(maxlen=20)
+
+Measurement = Tuple[Counter, Counter]
+
+
+def enable() -> bool:
+    """Start tracing if accounting is on; call once at worker startup."""
+    if MEMORY_ACCOUNTING and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACE_FRAMES)
+        logger.info("Memory accounting enabled", frames=MEMORY_TRACE_FRAMES)
+    return tracemalloc.is_tracing()
+
+
+def _component(traceback: tracemalloc.Traceback) -> Optional[str]:
+    if traceback in _component_of:
+        return _component_of[traceback]
+    component = "other"
+    for frame in reversed(traceback):
+        if frame.filename in _OWN_FILES:
+            component = None
+            break
+        filename = frame.filename.replace(os.sep, "/")
+        match = next(
+            (
+                n
+                for n, parts in _COMPONENTS
+                if any(p in filename for p in parts)
+            ),
+            None,
+        )
+        if match:
+            component = match
+            break
+    if len(_component_of) >= _COMPONENT_CACHE_SIZE:
+        _component_of.clear()
+    _component_of[traceback] = component
+    return component
+
+
+def _measure() -> Measurement:
+    """Collect, then traced bytes by component and live objects by type."""
+    gc.collect()
+    sizes: Counter = Counter()
+    for stat in tracemalloc.take_snapshot().statistics("traceback"):
+        component = _component(stat.traceback)
+        if component:
+            sizes[component] += stat.size
+    types = Counter(
+        t for t in map(type, gc.get_objects()) if t.__module__ != "tracemalloc"
+    )
+    return sizes, types
+
+
+class _Measurer:
+    """One measurement at a time; requests made meanwhile share the next."""
+
+    def __init__(self) -> None:
+        self._next: Optional[asyncio.Future] = None
+        self._running = False
+
+    async def measure(self) -> Measurement:
+        if self._next is None:
+            self._next = asyncio.get_running_loop().create_future()
+            if not self._running:
+                asyncio.create_task(self._run())
+        return await asyncio.shield(self._next)
+
+    async def _run(self) -> None:
+        self._running = True
+        try:
+            while self._next is not None:
+                future, self._next = self._next, None
+                try:
+                    future.set_result(await lanes.background.run(_measure))
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            self._running = False
+
+
+_measurer = _Measurer()
+
+
+class CallMemoryProbe:
+    def __init__(self, call_sid: str) -> None:
+        global _active_probes, _probes_started
+        self.call_sid = call_sid
+        self._watched: List[Tuple[str, weakref.ref]] = []
+        self._overlapped = _active_probes > 0
+        _active_probes += 1
+        _probes_started += 1
+        self._started_seq = _probes_started
+        self._baseline: Measurement = (Counter(), Counter())
+
+    async def start(self) -> "CallMemoryProbe":
+        self._baseline = await _measurer.measure()
+        return self
+
+    def watch(self, kind: str, obj: object) -> None:
+        """Expect obj to be garbage once the call has closed."""
+        try:
+            self._watched.append((kind, weakref.ref(obj)))
+        except TypeError:
+            pass
+
+    async def finish(self) -> dict:
+        global _active_probes
+        _active_probes -= 1
+        started = time.monotonic()
+        components, types = await _measurer.measure()
+        overlapped = (
+            self._overlapped
+            or _active_probes > 0
+            or _probes_started != self._started_seq
+        )
+        leaked = [kind for kind, ref in self._watched if ref() is not None]
+        base_components, base_types = self._baseline
+        retained = {
+            name: components[name] - base_components[name]
+            for name in set(components) | set(base_components)
+        }
+        retained_kb = round(sum(retained.values()) / 1024, 1)
+        flagged = bool(leaked) or (
+            not overlapped and retained_kb > MEMORY_LEAK_THRESHOLD_KB
+        )
+
+        report = {
+            "call_sid": self.call_sid,
+            "retained_kb": retained_kb,
+            "retained_kb_by_component": {
+                name: round(size / 1024, 1)
+                for name, size in sorted(retained.items())
+                if size
+            },
+            "grown_types": {
+                t.__name__: n
+                for t, n in (types - base_types).most_common(_TOP_TYPES)
+            },
+            "leaked_objects": leaked,
+            "overlapped": overlapped,
+            "flagged": flagged,
+            "rss_mb": round(_rss_bytes() / 2**20, 1),
+            "probe_ms": round((time.monotonic() - started) * 1000),
+        }
+        _totals["calls"] += 1
+        if flagged:
+            _totals["flagged"] += 1
+            _flagged.append(report)
+            logger.warning("Call left memory behind", **report)
+        else:
+            logger.info("Call memory", **report)
+        self._watched.clear()
+        self._baseline = (Counter(), Counter())
+        return report
+
+
+async def start_probe(call_sid: str) -> Optional[CallMemoryProbe]:
+    """A started probe for this call, or None when accounting is off."""
+    if not tracemalloc.is_tracing():
+        return None
+    return await CallMemoryProbe(call_sid).start()
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def summary(collect: bool = False) -> dict:
+    """Totals; with collect, a fresh measurement of the whole worker."""
+    enabled = tracemalloc.is_tracing()
+    traced, peak = tracemalloc.get_traced_memory()
+    result = {
+        "enabled": enabled,
+        "rss_mb": round(_rss_bytes() / 2**20, 1),
+        "traced_mb": round(traced / 2**20, 1),
+        "traced_peak_mb": round(peak / 2**20, 1),
+        "calls": _totals["calls"],
+        "flagged_calls": _totals["flagged"],
+        "recent_flagged": list(_flagged),
+    }
+    if collect and enabled:
+        components, types = await _measurer.measure()
+        result["traced_kb_by_component"] = {
+            name: round(size / 1024, 1)
+            for name, size in sorted(components.items())
+        }
+        result["top_types"] = {
+            t.__name__: n for t, n in types.most_common(_TOP_TYPES)
+        }
+    return result
@@ -0,0 +1,160 @@
+"""
+Prompt layout helpers for provider-side prompt caching.
+
+OpenAI caches the longest previously-seen prefix of a request (tool schemas,
+then messages in order). To get cache hits every request for a given agent
+must start with the same bytes, so the static parts of the request are laid
+out first and never mutated:
+
+    tools (CRM_TOOLS) -> static tool instructions -> agent prompt -> turns
+
+Everything volatile (kick-off instruction, conversation turns, tool results)
+is appended after that prefix.
+"""
+
+import hashlib
+import json
+from typing import AsyncIterator, Iterable, List, Optional
+
+from pipecat.services.openai.llm import OpenAILLMService
+
+import rate_limits
+from tools import CRM_TOOLS, TOOL_INSTRUCTIONS
+from utils.logging import logger
+from utils.tracing import span
+
+KICKOFF_MESSAGE = {
+    "role": "system",
+    "content": "Please introduce yourself to the user.",
+}
+
+
+def build_llm_messages(prompt: str) -> List[dict]:
+    """Build the static message prefix for an agent conversation."""
+    return [
+        {"role": "system", "content": TOOL_INSTRUCTIONS},
+        {"role": "system", "content": prompt},
+    ]
+
+
+def prefix_fingerprint(
+    messages: Iterable[dict],
+    tools: Optional[list] = None,
+    prefix_len: int = 2,
+) -> str:
+    """
+    Hash the cacheable prefix of a request: the tool schemas and the first
+    `prefix_len` messages, serialized the same way on every call.
+    """
+    prefix = {
+        "tools": CRM_TOOLS if tools is None else tools,
+        "messages": list(messages)[:prefix_len],
+    }
+    encoded = json.dumps(prefix, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+class PromptCacheStats:
+    """Per-call accumulator for prompt and cached token counts."""
+
+    def __init__(self, call_sid: Optional[str] = None) -> None:
+        self.call_sid = call_sid
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.prefix_changes = 0
+        self._fingerprint: Optional[str] = None
+
+    def record_prefix(self, fingerprint: str) -> None:
+        if self._fingerprint is not None and fingerprint != self._fingerprint:
+            self.prefix_changes += 1
+            logger.warning(
+                "prompt prefix changed mid-call",
+                call_sid=self.call_sid,
+                previous=self._fingerprint,
+                current=fingerprint,
+            )
+        self._fingerprint = fingerprint
+
+    def record_usage(self, prompt_tokens: int, cached_tokens: int) -> None:
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens or 0
+        self.cached_tokens += cached_tokens or 0
+
+    @property
+    def cached_ratio(self) -> float:
+        if not self.prompt_tokens:
+            return 0.0
+        return self.cached_tokens / self.prompt_tokens
+
+    def as_dict(self) -> dict:
+        return {
+            "call_sid": self.call_sid,
+            "prefix_fingerprint": self._fingerprint,
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cached_ratio": round(self.cached_ratio, 4),
+            "prefix_changes": self.prefix_changes,
+        }
+
+
+class CachingOpenAILLMService(OpenAILLMService):
+    """
+    OpenAILLMService that routes requests for the same agent to the same
+    cache shard and records cached-token usage for the call.
+    """
+
+    def __init__(
+        self,
+        *,
+        cache_key: Optional[str] = None,
+        stats: Optional[PromptCacheStats] = None,
+        **kwargs: object,
+    ) -> None:
+        if cache_key:
+            params = (
+                kwargs.pop("params", None) or OpenAILLMService.InputParams()
+            )
+            extra = dict(params.extra or {})
+            extra_body = dict(extra.get("extra_body") or {})
+            extra_body["prompt_cache_key"] = cache_key
+            extra["extra_body"] = extra_body
+            params.extra = extra
+            kwargs["params"] = params
+        super().__init__(**kwargs)
+        self.cache_stats = stats or PromptCacheStats()
+
+    async def get_chat_completions(
+        self, params_from_context: dict
+    ) -> AsyncIterator:
+        tools = params_from_context.get("tools")
+        messages = params_from_context.get("messages") or []
+        self.cache_stats.record_prefix(
+            prefix_fingerprint(
+                messages, tools=tools if isinstance(tools, list) else []
+            )
+        )
+        await rate_limits.acquire(
+            "openai",
+            rate_limits.LIVE,
+            requests=1,
+            tokens=rate_limits.estimate_tokens(messages),
+        )
+        with span("llm.request", model=self.model_name):
+            stream = await self._create_completions(params_from_context)
+        return self._track_usage(stream)
+
+    async def _create_completions(
+        self, params_from_context: dict
+    ) -> AsyncIterator:
+        return await super().get_chat_completions(params_from_context)
+
+    async def _track_usage(self, stream: AsyncIterator) -> AsyncIterator:
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None)
+            if usage:
+                details = getattr(usage, "prompt_tokens_details", None)
+                cached = getattr(details, "cached_tokens", 0) if details else 0
+                self.cache_stats.record_usage(usage.prompt_tokens, cached)
+            yield chunk
@@ -0,0 +1,282 @@
+"""
+Provider rate limits shared by live calls and batch work.
+
+OpenAI, ElevenLabs and Cartesia each give the account per-minute quotas.
+Live calls (LLM turns, and the STT and TTS streams each call opens) and batch
+work (incremental and post-call analysis) draw on the same quotas, and a 429
+in the middle of a call is a dead turn. Each provider gets one token bucket
+per configured limit: requests per minute, and for OpenAI also estimated
+prompt tokens per minute. A bucket refills continuously at limit / 60 per
+second and holds at most RATE_LIMIT_BURST_SECONDS of quota.
+
+- Live requests go first. A batch request never takes quota while a live one
+  is waiting. A live request waits at most RATE_LIMIT_LIVE_MAX_WAIT and then
+  goes ahead anyway (counted as an overdraft; the bucket goes into debt),
+  since a late turn is better than a failed one.
+- Batch requests leave RATE_LIMIT_BATCH_RESERVE of each bucket to live calls,
+  so under pressure batch work backs off first. One that gets no quota within
+  RATE_LIMIT_BATCH_MAX_WAIT raises RateLimited.
+
+With RATE_LIMIT_FLEET=true the configured limits are for the whole fleet and
+each worker refills at an equal share: the limit divided by the number of
+workers publishing load to Redis (capacity.publish_load_forever), refreshed
+on the same heartbeat. When Redis is unavailable the last share is kept.
+
+A limit of 0 (the default) leaves that limit off. snapshot() serves the
+remaining quota, waits, overdrafts and throttled batch requests on
+/rate-limits.
+
+    await rate_limits.acquire("openai", LIVE, requests=1, tokens=estimate)
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+from capacity import LOAD_HEARTBEAT_SECONDS
+import lanes
+from utils.logging import logger
+from utils.redis_client import RedisClient
+
+LIVE = "live"
+BATCH = "batch"
+
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "10"))
+RATE_LIMIT_BATCH_RESERVE = float(os.getenv("RATE_LIMIT_BATCH_RESERVE", "0.2"))
+RATE_LIMIT_LIVE_MAX_WAIT = float(os.getenv("RATE_LIMIT_LIVE_MAX_WAIT", "1.0"))
+RATE_LIMIT_BATCH_MAX_WAIT = float(os.getenv("RATE_LIMIT_BATCH_MAX_WAIT", "30"))
+RATE_LIMIT_FLEET = os.getenv("RATE_LIMIT_FLEET", "false").lower() == "true"
+
+# Per provider and limit, per minute; 0 is no limit.
+PROVIDER_LIMITS: Dict[str, Dict[str, float]] = {
+    "openai": {
+        "requests": float(os.getenv("RATE_LIMIT_OPENAI_RPM", "0")),
+        "tokens": float(os.getenv("RATE_LIMIT_OPENAI_TPM", "0")),
+    },
+    "elevenlabs": {
+        "requests": float(os.getenv("RATE_LIMIT_ELEVENLABS_RPM", "0"))
+    },
+    "cartesia": {"requests": float(os.getenv("RATE_LIMIT_CARTESIA_RPM", "0"))},
+}
+
+# How often a waiting batch request looks again while live ones are queued.
+_YIELD_SECONDS = 0.05
+
+
+class RateLimited(Exception):
+    """A batch request got no quota within its wait."""
+
+    def __init__(self, provider: str, waited: float) -> None:
+        super().__init__(f"{provider} quota exhausted after {waited:.1f}s")
+        self.provider = provider
+        self.waited = waited
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        limit_per_minute: float,
+        burst_seconds: float = RATE_LIMIT_BURST_SECONDS,
+    ) -> None:
+        self.limit = limit_per_minute
+        self.burst_seconds = burst_seconds
+        self.share = 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        """Tokens per second for this worker."""
+        return self.limit * self.share / 60
+
+    @property
+    def capacity(self) -> float:
+        return max(self.rate * self.burst_seconds, 1.0)
+
+    def available(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        return self._tokens
+
+    def wait_for(self, cost: float, reserve: float = 0.0) -> float:
+        """Seconds until cost can be taken leaving reserve of capacity; 0 if now."""
+        # A request bigger than the whole bucket would never fit.
+        cost = min(cost, self.capacity)
+        short = cost + reserve * self.capacity - self.available()
+        return max(short, 0.0) / self.rate
+
+    def take(self, cost: float) -> None:
+        # Debt is bounded so one burst of overdrafts cannot stall a minute.
+        self._tokens = max(
+            self._tokens - min(cost, self.capacity), -self.capacity
+        )
+
+
+class ProviderLimiter:
+    def __init__(self, name: str, limits: Dict[str, float]) -> None:
+        self.name = name
+        self.buckets: Dict[str, TokenBucket] = {
+            kind: TokenBucket(limit)
+            for kind, limit in limits.items()
+            if limit > 0
+        }
+        self._live_waiting = 0
+        self.stats = {
+            LIVE: {
+                "requests": 0,
+                "waited": 0,
+                "wait_seconds": 0.0,
+                "overdrafts": 0,
+            },
+            BATCH: {
+                "requests": 0,
+                "waited": 0,
+                "wait_seconds": 0.0,
+                "throttled": 0,
+            },
+        }
+
+    def set_share(self, share: float) -> None:
+        for bucket in self.buckets.values():
+            bucket.share = share
+
+    def _wait_for(self, costs: Dict[str, float], reserve: float) -> float:
+        return max(
+            (
+                self.buckets[kind].wait_for(cost, reserve)
+                for kind, cost in costs.items()
+            ),
+            default=0.0,
+        )
+
+    def _take(self, costs: Dict[str, float]) -> None:
+        for kind, cost in costs.items():
+            self.buckets[kind].take(cost)
+
+    async def acquire(self, priority: str = LIVE, **costs: float) -> float:
+        """Wait for quota for these costs (requests=1 if none); seconds waited."""
+        costs = {
+            k: v
+            for k, v in (costs or {"requests": 1}).items()
+            if k in self.buckets
+        }
+        stats = self.stats[priority]
+        stats["requests"] += 1
+        if not costs:
+            return 0.0
+        live = priority == LIVE
+        started = time.monotonic()
+        deadline = started + (
+            RATE_LIMIT_LIVE_MAX_WAIT if live else RATE_LIMIT_BATCH_MAX_WAIT
+        )
+        if live:
+            self._live_waiting += 1
+        try:
+            while True:
+                if live:
+                    wait = self._wait_for(costs, 0.0)
+                elif self._live_waiting:
+                    wait = _YIELD_SECONDS
+                else:
+                    wait = self._wait_for(costs, RATE_LIMIT_BATCH_RESERVE)
+                if not wait:
+                    break
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    if not live:
+                        stats["throttled"] += 1
+                        raise RateLimited(
+                            self.name, time.monotonic() - started
+                        )
+                    stats["overdrafts"] += 1
+                    logger.warning(
+                        "Rate limit overdraft", provider=self.name, costs=costs
+                    )
+                    break
+                await asyncio.sleep(min(wait, left))
+        finally:
+            if live:
+                self._live_waiting -= 1
+        self._take(costs)
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            stats["waited"] += 1
+            stats["wait_seconds"] += waited
+        return waited
+
+    def snapshot(self) -> dict:
+        return {
+            "buckets": {
+                kind: {
+                    "limit_per_minute": bucket.limit,
+                    "share": round(bucket.share, 4),
+                    "capacity": round(bucket.capacity, 1),
+                    "remaining": round(bucket.available(), 1),
+                }
+                for kind, bucket in self.buckets.items()
+            },
+            **{
+                priority: {k: round(v, 3) for k, v in stats.items()}
+                for priority, stats in self.stats.items()
+            },
+        }
+
+
+limiters: Dict[str, ProviderLimiter] = {
+    name: ProviderLimiter(name, limits)
+    for name, limits in PROVIDER_LIMITS.items()
+}
+
+
+async def acquire(
+    provider: str, priority: str = LIVE, **costs: float
+) -> float:
+    return await limiters[provider].acquire(priority, **costs)
+
+
+def estimate_tokens(messages: Optional[Iterable]) -> int:
+    """Rough prompt size: about four characters per token."""
+    chars = 0
+    for message in messages or ():
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(
+                len(part.get("text") or "")
+                for part in content
+                if isinstance(part, dict)
+            )
+    return chars // 4 + 1
+
+
+def set_fleet_share(workers: int) -> None:
+    share = 1.0 / max(workers, 1)
+    for limiter in limiters.values():
+        limiter.set_share(share)
+
+
+async def refresh_fleet_share_forever(
+    interval: float = LOAD_HEARTBEAT_SECONDS,
+) -> None:
+    """With RATE_LIMIT_FLEET, keep this worker's share of the limits current."""
+    if not RATE_LIMIT_FLEET:
+        return
+    while True:
+        workers = await lanes.background.run(RedisClient.get_worker_loads)
+        if workers is not None:
+            set_fleet_share(len(workers))
+        await asyncio.sleep(interval)
+
+
+def snapshot() -> dict:
+    return {
+        "fleet": RATE_LIMIT_FLEET,
+        "providers": {
+            name: limiter.snapshot() for name, limiter in limiters.items()
+        },
+    }
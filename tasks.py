@@ -201,3 +201,66 @@ def system_test(c):  # noqa: ANN001, ANN201
     """Run system tests"""
     with c.prefix(venv):
         c.run("pytest test/test_system.py")
+
+
+@task(pre=[require_venv])
+def bench_vad(c, calls=50, seconds=5):  # noqa: ANN001, ANN201
+    """Benchmark VAD calls per core, inline vs batched"""
+    with c.prefix(venv):
+        c.run(f"python -m benchmarks.bench_vad --calls {calls} --seconds {seconds}")
+
+
+@task(pre=[require_venv])
+def bench_audio(c, frames=20000):  # noqa: ANN001, ANN201
+    """Benchmark Twilio audio frames/sec per core, stock vs fast serializer"""
+    with c.prefix(venv):
+        c.run(f"python -m benchmarks.bench_audio_codec --frames {frames}")
+
+
+@task(pre=[require_venv])
+def bench_tools(c, iterations=100000):  # noqa: ANN001, ANN201
+    """Benchmark CRM tool argument validation and dispatch overhead"""
+    with c.prefix(venv):
+        c.run(f"python -m benchmarks.bench_tool_validation --iterations {iterations}")
+
+
+@task(pre=[require_venv])
+def bench_beep(c, frames=50000):  # noqa: ANN001, ANN201
+    """Benchmark answering-machine beep detection cost per call"""
+    with c.prefix(venv):
+        c.run(f"python -m benchmarks.bench_beep --frames {frames}")
+
+
+@task(pre=[require_venv])
+def bench_agent(c, requests=20000):  # noqa: ANN001, ANN201
+    """Benchmark /agent TwiML requests per second"""
+    with c.prefix(venv):
+        c.run(f"python -m benchmarks.bench_agent --requests {requests}")
+
+
+@task(pre=[require_venv])
+def bench_transcript(c, turns=2000, questions=10):  # noqa: ANN001, ANN201
+    """Benchmark transcript text preparation for post-call analysis"""
+    with c.prefix(venv):
+        c.run(f"python -m benchmarks.bench_transcript --turns {turns} --questions {questions}")
+
+
+@task(pre=[require_venv])
+def soak(c, calls=300, concurrency=20):  # noqa: ANN001, ANN201
+    """Run hundreds of simulated calls and check worker memory for leaks"""
+    with c.prefix(venv):
+        c.run(f"python -m benchmarks.soak --calls {calls} --concurrency {concurrency}")
+
+
+@task(pre=[require_venv])
+def loadtest(
+    c, calls=10, turns=3, llm_latency=0.4, tts_latency=0.15, stt_latency=0.2, audio=None
+):  # noqa: ANN001, ANN201
+    """Simulate concurrent Twilio media streams against /ws with local fakes"""
+    audio_param = f" --audio {audio}" if audio else ""
+    with c.prefix(venv):
+        c.run(
+            f"python -m benchmarks.loadtest --calls {calls} --turns {turns} "
+            f"--llm-latency {llm_latency} --tts-latency {tts_latency} "
+            f"--stt-latency {stt_latency}{audio_param}"
+        )
@@ -0,0 +1,291 @@
+import asyncio
+import os
+import threading
+import time
+
+import activity_queue
+from circuit_breaker import CircuitBreaker
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, text='{"ok": true}'):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = text
+
+
+def _submit(queue, key, kind="disposition", payload=None, wait=1.0):
+    return asyncio.run(
+        queue.submit(
+            key,
+            kind,
+            "workspace-1:lead-1",
+            "http://backend.test/api/v1/activities/",
+            {"workspace-id": "workspace-1"},
+            payload or {"lead_id": "lead-1", "notes": kind},
+            wait=wait,
+        )
+    )
+
+
+def test_failed_post_is_queued_and_repeated_key_posts_once(
+    monkeypatch, tmp_path
+) -> None:
+    queue = activity_queue.ActivityQueue(
+        path=str(tmp_path / "q.sqlite3"), breaker=CircuitBreaker("test")
+    )
+    responses = [FakeResponse(503), FakeResponse(200)]
+    posts = []
+    threads = []
+
+    def fake_post(url, headers, json, timeout):
+        posts.append(headers["Idempotency-Key"])
+        threads.append(threading.current_thread().name)
+        return responses.pop(0)
+
+    monkeypatch.setattr(activity_queue.requests, "post", fake_post)
+
+    assert _submit(queue, "CA1:call_1").status == activity_queue.QUEUED
+    assert queue.status("CA1:call_1")["status"] == activity_queue.PENDING
+
+    # Retry as the background loop would once the backoff has passed.
+    queue._db().execute("UPDATE activities SET next_attempt_at = 0")
+    [due] = queue.claim()
+    assert (
+        asyncio.run(queue._deliver([due])).status == activity_queue.DELIVERED
+    )
+
+    assert _submit(queue, "CA1:call_1").status == activity_queue.DELIVERED
+    assert posts == ["CA1:call_1", "CA1:call_1"]
+    # The inline attempt belongs to the call; the retry to the webhooks lane.
+    assert threads[0].startswith("lane-live") and threads[1].startswith(
+        "lane-webhooks"
+    )
+    assert queue.stats()[activity_queue.DELIVERED] == 1
+
+
+def test_coalesces_summary_and_disposition_for_a_lead(
+    monkeypatch, tmp_path
+) -> None:
+    queue = activity_queue.ActivityQueue(
+        path=str(tmp_path / "q.sqlite3"),
+        coalesce=True,
+        breaker=CircuitBreaker("test"),
+    )
+    queue.enqueue(
+        "CA1:call_1",
+        "summary",
+        "workspace-1:lead-1",
+        "http://backend.test/",
+        {},
+        {"lead_id": "lead-1", "notes": "Asked about pricing."},
+    )
+    queue.enqueue(
+        "CA1:call_2",
+        "disposition",
+        "workspace-1:lead-1",
+        "http://backend.test/",
+        {},
+        {
+            "lead_id": "lead-1",
+            "disposition": "connected_call_back",
+            "notes": "Call Friday.",
+        },
+    )
+    posts = []
+
+    def fake_post(url, headers, json, timeout):
+        posts.append((headers["Idempotency-Key"], json))
+        return FakeResponse(200)
+
+    monkeypatch.setattr(activity_queue.requests, "post", fake_post)
+
+    [batch] = queue._batches(queue.claim())
+    asyncio.run(queue._deliver(batch))
+
+    assert posts == [
+        (
+            "CA1:call_2",
+            {
+                "lead_id": "lead-1",
+                "disposition": "connected_call_back",
+                "notes": "Asked about pricing.\n\nCall Friday.",
+            },
+        )
+    ]
+    stats = queue.stats()
+    assert stats[activity_queue.DELIVERED] == 1
+    assert stats[activity_queue.COALESCED] == 1
+
+
+def test_activities_sent_before_are_not_coalesced(tmp_path) -> None:
+    queue = activity_queue.ActivityQueue(
+        path=str(tmp_path / "q.sqlite3"),
+        coalesce=True,
+        breaker=CircuitBreaker("test"),
+    )
+    for key, kind in (
+        ("CA1:call_1", "summary"),
+        ("CA1:call_2", "disposition"),
+    ):
+        queue.enqueue(
+            key,
+            kind,
+            "workspace-1:lead-1",
+            "http://backend.test/",
+            {},
+            {"notes": kind},
+        )
+    # The disposition went out alone once; the backend may have it.
+    queue._finish(["CA1:call_2"], activity_queue.PENDING, "timeout", 1)
+    queue._db().execute("UPDATE activities SET next_attempt_at = 0")
+
+    batches = queue._batches(queue.claim())
+
+    assert sorted(len(b) for b in batches) == [1, 1]
+
+
+def test_authorization_stays_off_disk_and_final_rows_are_pruned(
+    monkeypatch, tmp_path
+) -> None:
+    path = str(tmp_path / "q.sqlite3")
+    queue = activity_queue.ActivityQueue(
+        path=path, breaker=CircuitBreaker("test")
+    )
+    sent = []
+
+    def fake_post(url, headers, json, timeout):
+        sent.append(headers)
+        return FakeResponse(200)
+
+    monkeypatch.setattr(activity_queue.requests, "post", fake_post)
+
+    delivery = asyncio.run(
+        queue.submit(
+            "CA1:call_1",
+            "disposition",
+            "workspace-1:lead-1",
+            "http://backend.test/",
+            {"workspace-id": "workspace-1", "Authorization": "Bearer secret"},
+            {"lead_id": "lead-1"},
+        )
+    )
+
+    assert delivery.status == activity_queue.DELIVERED
+    assert sent[0]["Authorization"] == "Bearer secret"
+    with open(path, "rb") as f:
+        assert b"Bearer secret" not in f.read()
+    [stored] = queue._db().execute("SELECT headers FROM activities").fetchall()
+    assert "Authorization" not in stored[0]
+    assert queue._secrets == {}
+
+    queue.enqueue(
+        "CA1:call_2",
+        "summary",
+        "workspace-1:lead-1",
+        "http://backend.test/",
+        {},
+        {},
+    )
+    assert queue.prune(max_age=3600) == 0
+    assert queue.prune(max_age=-1) == 1  # the pending one stays
+    assert queue.status("CA1:call_2")["status"] == activity_queue.PENDING
+
+
+def test_workers_retry_only_their_own_activities(
+    monkeypatch, tmp_path
+) -> None:
+    queue = activity_queue.ActivityQueue(
+        path=str(tmp_path / "q.sqlite3"), breaker=CircuitBreaker("test")
+    )
+    for key in ("mine", "live-worker", "exited-worker"):
+        queue.enqueue(
+            key,
+            "summary",
+            "workspace-1:lead-1",
+            "http://backend.test/",
+            {},
+            {},
+        )
+    db = queue._db()
+    db.execute(
+        "UPDATE activities SET owner = ? WHERE key = ?",
+        (os.getppid(), "live-worker"),
+    )
+    db.execute(
+        "UPDATE activities SET owner = ? WHERE key = ?",
+        (2**22 + 1, "exited-worker"),
+    )
+
+    assert sorted(a.key for a in queue.claim()) == ["exited-worker", "mine"]
+
+    monkeypatch.setattr(
+        activity_queue.requests,
+        "post",
+        lambda *a, **kw: FakeResponse(401, "no token"),
+    )
+    [due] = queue.claim("live-worker")
+    outcome = asyncio.run(queue._deliver([due]))
+    # A missing or expired token is not a verdict on the activity.
+    assert outcome.status == activity_queue.QUEUED
+    assert queue.status("live-worker")["status"] == activity_queue.PENDING
+
+
+def test_open_breaker_defers_without_posting(monkeypatch, tmp_path) -> None:
+    breaker = CircuitBreaker("test", min_requests=2, cooldown=30)
+    queue = activity_queue.ActivityQueue(
+        path=str(tmp_path / "q.sqlite3"), breaker=breaker
+    )
+    posts = []
+
+    def fake_post(url, headers, json, timeout):
+        posts.append(timeout)
+        raise TimeoutError("backend timed out")
+
+    monkeypatch.setattr(activity_queue.requests, "post", fake_post)
+
+    _submit(queue, "CA1:call_1")
+    _submit(queue, "CA1:call_2")
+    delivery = _submit(queue, "CA1:call_3")
+
+    assert len(posts) == 2
+    assert breaker.state == "open"
+    assert delivery.deferred is True
+    assert queue.status("CA1:call_3")["attempts"] == 0
+    assert breaker.snapshot()["transitions"] == {"closed->open": 1}
+
+
+def test_breaker_timeout_follows_p95_and_probe_closes() -> None:
+    breaker = CircuitBreaker(
+        "test", timeout_min=0.5, timeout_max=10, p95_multiplier=2
+    )
+    for _ in range(21):
+        breaker.record_success(0.4)
+    assert breaker.timeout() == 0.8
+
+    breaker.state, breaker._opened_at = (
+        "open",
+        time.monotonic() - breaker.cooldown,
+    )
+    assert breaker.allow() is True  # cooldown over: one probe
+    assert breaker.allow() is False
+    breaker.record_success(0.4)
+    assert breaker.state == "closed"
+
+
+def test_breaker_probe_gets_full_timeout_and_timeouts_raise_p95() -> None:
+    breaker = CircuitBreaker(
+        "test", timeout_min=0.5, timeout_max=10, p95_multiplier=2
+    )
+    for _ in range(21):
+        breaker.record_success(0.4)
+
+    # The backend slowed down: requests time out at the learned 0.8 s.
+    for _ in range(20):
+        breaker.record_failure(timed_out_after=breaker.timeout())
+    assert breaker.state == "open"
+    assert breaker.timeout() > 0.8
+
+    breaker._opened_at = time.monotonic() - breaker.cooldown
+    assert breaker.allow() is True
+    assert breaker.timeout() == 10
@@ -0,0 +1,56 @@
+import agent_config
+from agent_config import AgentConfigCache, resolve_agent_config
+
+
+def test_versioned_template_compiles_once_and_invalidates(monkeypatch) -> None:
+    cache = AgentConfigCache()
+    monkeypatch.setattr(agent_config, "agent_configs", cache)
+    call_data = {
+        "agent_id": "agent-1",
+        "agent_version": 3,
+        "prompt_template": "You are calling {{lead_name}} about {{product}}.",
+        "voice_id": "voice-1",
+    }
+
+    first = resolve_agent_config(call_data)
+    second = resolve_agent_config({**call_data, "prompt_template": "ignored"})
+
+    assert second is first
+    assert first.placeholders == ("lead_name", "product")
+    assert first.tts_settings == {"voice_id": "voice-1"}
+    assert cache.stats()["hits"] == 1
+
+    agent_config._handle_invalidation('{"agent_id": "agent-1"}')
+    assert cache.get("agent-1", "3") is None
+
+
+def test_call_messages_append_lead_variables_after_static_prefix(
+    monkeypatch,
+) -> None:
+    monkeypatch.setattr(agent_config, "agent_configs", AgentConfigCache())
+    config = resolve_agent_config(
+        {
+            "agent_id": "agent-1",
+            "agent_version": "1",
+            "prompt_template": "Hi {{lead_name}}.",
+        }
+    )
+
+    messages = config.call_messages({"lead_name": "Asha", "unused": "x"})
+
+    assert messages[: len(config.messages)] == list(config.messages)
+    assert messages[-1]["content"].endswith("lead_name: Asha")
+    assert "unused" not in messages[-1]["content"]
+    assert len(config.call_messages()) == len(config.messages)
+
+
+def test_rendered_legacy_prompt_is_not_cached(monkeypatch) -> None:
+    cache = AgentConfigCache()
+    monkeypatch.setattr(agent_config, "agent_configs", cache)
+
+    config = resolve_agent_config(
+        {"agent_id": "agent-1", "prompt": "You are calling Asha."}
+    )
+
+    assert config.version.startswith("sha:")
+    assert cache.stats()["size"] == 0
@@ -33,6 +33,18 @@ def test_agent_twiml_omits_empty_call_id(client: TestClient) -> None:
     assert '<Parameter name="call_id"' not in res.text
 
 
+def test_agent_twiml_escapes_call_id_and_host(client: TestClient) -> None:
+    res = client.post(
+        "/agent",
+        params={"call_id": '"/><Hangup /><x a="'},
+        headers={"host": "voice.example.test&x"},
+    )
+
+    assert "<Hangup />" not in res.text
+    assert '<Stream url="wss://voice.example.test&amp;x/ws">' in res.text
+    assert 'value="&quot;/&gt;&lt;Hangup /&gt;&lt;x a=&quot;"' in res.text
+
+
 def test_proxy_call_status_webhook_forwards_body(
     monkeypatch, client: TestClient
 ) -> None:
@@ -73,3 +85,40 @@ def test_proxy_call_status_webhook_forwards_body(
         "content-type": "application/x-www-form-urlencoded"
     }
     assert captured["timeout"] == 10
+
+
+def test_agent_redirects_when_worker_full(monkeypatch, client: TestClient) -> None:
+    import app as app_module
+
+    monkeypatch.setattr(app_module.capacity, "active", app_module.capacity.limit)
+    monkeypatch.setattr(app_module, "fleet_has_capacity", lambda: True)
+
+    res = client.post(
+        "/agent?call_id=call-123", headers={"host": "voice.example.test"}
+    )
+
+    assert res.status_code == 200
+    assert "<Redirect" in res.text
+    assert "call_id=call-123&amp;attempt=1" in res.text
+
+
+def test_agent_hangs_up_when_fleet_full(monkeypatch, client: TestClient) -> None:
+    import app as app_module
+
+    monkeypatch.setattr(app_module.capacity, "active", app_module.capacity.limit)
+    monkeypatch.setattr(app_module, "fleet_has_capacity", lambda: False)
+
+    res = client.post("/agent", headers={"host": "voice.example.test"})
+
+    assert "<Hangup />" in res.text
+    assert "<Stream" not in res.text
+
+
+def test_ready_fails_while_draining(monkeypatch, client: TestClient) -> None:
+    import app as app_module
+
+    assert client.get("/ready").status_code == 200
+
+    monkeypatch.setattr(app_module.capacity, "draining", True)
+
+    assert client.get("/ready").status_code == 503
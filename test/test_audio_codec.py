@@ -0,0 +1,98 @@
+import asyncio
+import base64
+import json
+import warnings
+
+import numpy as np
+from pipecat.frames.frames import OutputAudioRawFrame, StartFrame
+from pipecat.serializers.twilio import TwilioFrameSerializer
+import pytest
+
+import audio_codec
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_ulaw_tables_match_g711_reference() -> None:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        audioop = pytest.importorskip("audioop")
+
+    codes = bytes(range(256))
+    pcm = np.arange(-32768, 32768, dtype=np.int16)
+
+    assert (
+        audioop.ulaw2lin(codes, 2) == audio_codec.ulaw_decode(codes).tobytes()
+    )
+    assert (
+        audioop.lin2ulaw(pcm.tobytes(), 2)
+        == audio_codec.ulaw_encode(pcm).tobytes()
+    )
+
+
+def test_fused_upsampler_interpolates_across_frames() -> None:
+    upsampler = audio_codec.Ulaw8kTo16kUpsampler()
+    codes = audio_codec.ulaw_encode(
+        np.array([0, 1000, 2000, 3000, 4000, 5000], dtype=np.int16)
+    ).tobytes()
+    decoded = audio_codec.ulaw_decode(codes).astype(np.int32)
+
+    first = upsampler.process(codes[:3]).copy()
+    second = upsampler.process(codes[3:]).copy()
+    out = np.concatenate((first, second))
+
+    assert out.size == 12
+    assert (out[1::2] == decoded).all()
+    assert out[6] == (decoded[2] + decoded[3]) >> 1
+
+
+def test_decimator_is_chunking_invariant() -> None:
+    t = np.arange(2400) / 24000
+    signal = (np.sin(2 * np.pi * 300 * t) * 8000).astype(np.float32)
+
+    whole = audio_codec.StreamDecimator(3).process(signal).copy()
+    chunked_decimator = audio_codec.StreamDecimator(3)
+    chunked = np.concatenate(
+        [
+            chunked_decimator.process(signal[i : i + 250]).copy()
+            for i in range(0, 2400, 250)
+        ]
+    )
+
+    assert whole.size == chunked.size == 800
+    np.testing.assert_allclose(whole, chunked, atol=0.05)
+
+
+def test_fast_serializer_round_trip_sizes() -> None:
+    params = TwilioFrameSerializer.InputParams(auto_hang_up=False)
+    serializer = audio_codec.FastTwilioFrameSerializer("MZ123", params=params)
+    run(
+        serializer.setup(
+            StartFrame(audio_in_sample_rate=16000, audio_out_sample_rate=24000)
+        )
+    )
+
+    media = json.dumps(
+        {
+            "event": "media",
+            "streamSid": "MZ123",
+            "media": {"payload": base64.b64encode(bytes(160)).decode()},
+        }
+    )
+    frame = run(serializer.deserialize(media))
+    assert frame.sample_rate == 16000
+    assert len(frame.audio) == 320 * 2
+
+    out = run(
+        serializer.serialize(
+            OutputAudioRawFrame(
+                audio=bytes(960 * 2), sample_rate=24000, num_channels=1
+            )
+        )
+    )
+    message = json.loads(out)
+    assert message["event"] == "media"
+    assert message["streamSid"] == "MZ123"
+    assert len(base64.b64decode(message["media"]["payload"])) == 320
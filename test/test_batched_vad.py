@@ -0,0 +1,37 @@
+import numpy as np
+from pipecat.audio.vad.silero import SileroOnnxModel
+
+import batched_vad
+
+
+def test_batched_inference_matches_per_call_model() -> None:
+    batcher = batched_vad.VADBatcher(max_batch=8, max_wait_ms=20)
+    rng = np.random.default_rng(1)
+    audio = rng.uniform(-0.5, 0.5, (3, 4, 512)).astype(np.float32)
+
+    streams = [batched_vad.VADStream(16000) for _ in range(4)]
+    models = [SileroOnnxModel(batched_vad._model_path()) for _ in range(4)]
+    for step in range(3):
+        futures = [
+            batcher.submit(stream, audio[step, i])
+            for i, stream in enumerate(streams)
+        ]
+        expected = [
+            float(model(audio[step, i], 16000)[0][0])
+            for i, model in enumerate(models)
+        ]
+        got = [future.result(timeout=5) for future in futures]
+        np.testing.assert_allclose(got, expected, rtol=1e-4, atol=1e-5)
+
+    assert batcher.mean_batch_size > 1
+
+
+def test_analyzer_returns_confidence_from_batcher() -> None:
+    analyzer = batched_vad.BatchedSileroVADAnalyzer(
+        batcher=batched_vad.VADBatcher()
+    )
+    analyzer.set_sample_rate(16000)
+
+    confidence = analyzer.voice_confidence(bytes(512 * 2))
+
+    assert 0.0 <= confidence <= 1.0
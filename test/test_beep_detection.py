@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from beep_detection import BeepDetector
+
+
+def _tone(
+    hz: float, seconds: float, rate: int, amplitude: float = 6000
+) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return (np.sin(2 * np.pi * hz * t) * amplitude).astype(np.int16)
+
+
+def _feed(detector, samples, frame: int):
+    beeps = []
+    for start in range(0, samples.size, frame):
+        beep = detector.feed(samples[start : start + frame])
+        if beep is not None:
+            beeps.append(beep)
+    return beeps
+
+
+@pytest.mark.parametrize(
+    "rate,hz", [(8000, 1000.0), (16000, 1012.5), (16000, 440.0)]
+)
+def test_beep_is_reported_when_the_tone_ends(rate, hz) -> None:
+    detector = BeepDetector(rate)
+    silence = np.zeros(rate // 2, dtype=np.int16)
+    audio = np.concatenate([silence, _tone(hz, 0.3, rate), silence])
+
+    # Frames that do not line up with the 20 ms analysis blocks.
+    [(frequency, seconds)] = _feed(detector, audio, frame=rate * 30 // 1000)
+
+    assert abs(frequency - hz) <= 25
+    assert 0.26 <= seconds <= 0.32
+
+
+def test_noise_and_short_tones_are_not_beeps() -> None:
+    rate = 16000
+    rng = np.random.default_rng(0)
+    noise = (rng.standard_normal(rate * 2) * 3000).astype(np.int16)
+    blip = np.concatenate(
+        [_tone(1000, 0.06, rate), np.zeros(rate // 4, dtype=np.int16)]
+    )
+
+    assert (
+        _feed(BeepDetector(rate), np.concatenate([noise, blip]), frame=320)
+        == []
+    )
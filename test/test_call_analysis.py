@@ -0,0 +1,150 @@
+import asyncio
+import json
+
+from call_analysis import IncrementalAnalyzer
+
+QUESTIONS = [
+    {
+        "id": 1,
+        "type": "Boolean",
+        "name": "Did the parent ask about availability at another centre?",
+        "options": [],
+    },
+    {
+        "id": 2,
+        "type": "Number",
+        "name": "What monthly budget was mentioned?",
+        "options": [],
+    },
+]
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def __call__(self, system_prompt: str, user_prompt: str) -> str:
+        prompt = json.loads(user_prompt)
+        self.prompts.append(prompt)
+        answers = {
+            name: {"value": "yes", "type": "boolean"}
+            for name in prompt["questions"]
+        }
+        return json.dumps(
+            {
+                "summary": f"{len(prompt['new_turns'])} new turns",
+                "answers": answers,
+            }
+        )
+
+
+def test_only_questions_mentioned_in_new_turns_are_reevaluated() -> None:
+    llm = FakeLLM()
+    analyzer = IncrementalAnalyzer(QUESTIONS, complete=llm)
+
+    async def run() -> dict:
+        analyzer.add_turn(
+            {
+                "role": "assistant",
+                "content": "Hi, this is Ava from Bright Kids.",
+            }
+        )
+        analyzer.add_turn(
+            {
+                "role": "user",
+                "content": "Is there availability at the Northside centre?",
+            }
+        )
+        await analyzer.evaluate()
+        for n in range(4):
+            analyzer.add_turn({"role": "user", "content": f"Small talk {n}."})
+        return await analyzer.finalize()
+
+    analysis = asyncio.run(run())
+
+    first, final = llm.prompts
+    assert list(first["questions"]) == [QUESTIONS[0]["name"]]
+    assert [t["content"] for t in first["new_turns"]][-1].startswith(
+        "Is there availability"
+    )
+    # The budget question never came up, so the last pass asks it over the
+    # whole call along with the one still being watched.
+    assert list(final["questions"]) == [q["name"] for q in QUESTIONS]
+    assert len(final["new_turns"]) == 6
+    assert analysis["answers"][QUESTIONS[0]["name"]]["value"] == "yes"
+    assert analysis["summary"] == "6 new turns"
+    assert analysis["complete"] is True
+
+
+def test_question_never_mentioned_is_asked_over_the_whole_call() -> None:
+    llm = FakeLLM()
+    analyzer = IncrementalAnalyzer(
+        [
+            {
+                "id": 3,
+                "type": "Text",
+                "name": "What is the budget?",
+                "options": [],
+            }
+        ],
+        complete=llm,
+    )
+
+    async def run() -> dict:
+        analyzer.add_turn(
+            {
+                "role": "assistant",
+                "content": "How much were you hoping to spend?",
+            }
+        )
+        analyzer.add_turn(
+            {"role": "user", "content": "Around five thousand dollars."}
+        )
+        await analyzer.evaluate()  # nothing mentioned "budget" yet
+        return await analyzer.finalize()
+
+    analysis = asyncio.run(run())
+
+    first, final = llm.prompts
+    assert first["questions"] == {}
+    assert list(final["questions"]) == ["What is the budget?"]
+    assert len(final["new_turns"]) == 2
+    assert analysis["complete"] is True
+
+
+def test_finalize_without_new_turns_makes_no_request() -> None:
+    llm = FakeLLM()
+    analyzer = IncrementalAnalyzer(QUESTIONS, complete=llm)
+
+    async def run() -> None:
+        analyzer.add_turn(
+            {
+                "role": "user",
+                "content": "Our budget is 500 a month, and the other centre is full.",
+            }
+        )
+        await analyzer.evaluate()
+        await analyzer.finalize()
+
+    asyncio.run(run())
+    assert len(llm.prompts) == 1
+
+
+def test_failed_final_pass_is_not_complete() -> None:
+    async def failing(system_prompt: str, user_prompt: str) -> str:
+        raise RuntimeError("rate limited")
+
+    analyzer = IncrementalAnalyzer(QUESTIONS, complete=failing)
+
+    async def run() -> dict:
+        analyzer.add_turn(
+            {"role": "user", "content": "Our budget is 500 a month."}
+        )
+        return await analyzer.finalize()
+
+    analysis = asyncio.run(run())
+
+    assert analyzer.passes == 0
+    assert analysis["complete"] is False
+    # Every name is still there, so helper has to go by the flag.
+    assert set(analysis["answers"]) == {q["name"] for q in QUESTIONS}
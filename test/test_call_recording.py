@@ -0,0 +1,40 @@
+import asyncio
+import wave
+
+import call_recording
+from call_recording import CallRecorder
+
+
+def test_chunks_are_appended_to_a_stereo_wav(tmp_path) -> None:
+    recorder = CallRecorder("CA1", directory=str(tmp_path), sample_rate=8000)
+    chunk = b"\x01\x00\x02\x00" * 8000  # one second of stereo frames
+    for _ in range(3):
+        asyncio.run(recorder._on_audio_data(None, chunk, 8000, 2))
+    assert recorder.finish() is None  # no bucket: kept locally
+
+    with wave.open(str(tmp_path / "CA1.wav")) as wav:
+        assert (wav.getnchannels(), wav.getframerate(), wav.getnframes()) == (
+            2,
+            8000,
+            24000,
+        )
+
+
+def test_finish_uploads_in_background_and_removes_file(
+    monkeypatch, tmp_path
+) -> None:
+    uploads = []
+    monkeypatch.setattr(call_recording, "RECORDING_BUCKET", "bucket")
+    monkeypatch.setattr(
+        call_recording, "_upload_blob", lambda path, blob: uploads.append(blob)
+    )
+
+    async def run() -> None:
+        recorder = CallRecorder("CA2", directory=str(tmp_path))
+        recorder.write(b"\x00" * 400)
+        recorder.finish()
+        await call_recording.wait_for_uploads(timeout=5)
+
+    asyncio.run(run())
+    assert uploads == ["recordings/CA2.wav"]
+    assert not (tmp_path / "CA2.wav").exists()
@@ -0,0 +1,72 @@
+import asyncio
+
+from starlette.websockets import WebSocketState
+
+import call_session
+from capacity import capacity
+
+
+class _WebSocket:
+    def __init__(self):
+        self.client_state = WebSocketState.CONNECTED
+        self.closes = 0
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        self.closes += 1
+        self.client_state = WebSocketState.DISCONNECTED
+
+
+class _Task:
+    def __init__(self):
+        self.cancelled = False
+
+    def has_finished(self) -> bool:
+        return self.cancelled
+
+    async def cancel(self) -> None:
+        self.cancelled = True
+
+
+def test_close_releases_everything_once(monkeypatch) -> None:
+    deleted = []
+    monkeypatch.setattr(
+        call_session.RedisClient,
+        "delete_call_prompt",
+        classmethod(lambda cls, key: deleted.append(key)),
+    )
+    monkeypatch.setattr(capacity, "active", 0)
+    capacity.try_acquire()
+    websocket, task = _WebSocket(), _Task()
+    session = call_session.CallSession(websocket)
+    session.claim("CA123", "call-1")
+    session.attach(task=task)
+
+    asyncio.run(session.close())
+    asyncio.run(session.close())
+
+    assert task.cancelled
+    assert websocket.closes == 1
+    assert capacity.active == 0
+    assert deleted == ["call-1"]
+    assert session.websocket is None and session.task is None
+
+
+def test_session_counts_track_open_sessions(monkeypatch) -> None:
+    monkeypatch.setattr(
+        call_session.RedisClient,
+        "delete_call_prompt",
+        classmethod(lambda cls, key: True),
+    )
+    before = call_session.session_counts()
+    session = call_session.CallSession(_WebSocket())
+
+    assert (
+        call_session.session_counts()["open_sessions"]
+        == before["open_sessions"] + 1
+    )
+
+    asyncio.run(session.close())
+    counts = call_session.session_counts()
+
+    assert counts["open_sessions"] == before["open_sessions"]
+    assert counts["closed_total"] == before["closed_total"] + 1
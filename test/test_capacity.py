@@ -0,0 +1,34 @@
+import capacity
+
+
+def test_call_capacity_caps_and_counts_shed_calls() -> None:
+    cap = capacity.CallCapacity(limit=2)
+
+    assert cap.try_acquire() is True
+    assert cap.try_acquire() is True
+    assert cap.try_acquire() is False
+
+    cap.release()
+    assert cap.has_capacity() is True
+    assert cap.snapshot()["active_calls"] == 1
+    assert cap.snapshot()["shed_calls"] == 1
+
+
+def test_fleet_capacity_ignores_this_worker(monkeypatch) -> None:
+    me = capacity.worker_id()
+    monkeypatch.setattr(
+        capacity.RedisClient,
+        "get_worker_loads",
+        classmethod(
+            lambda cls: [
+                {"worker_id": me, "active_calls": 0, "max_calls": 4},
+                {"worker_id": "other:1", "active_calls": 4, "max_calls": 4},
+            ]
+        ),
+    )
+    assert capacity.fleet_has_capacity() is False
+
+    monkeypatch.setattr(
+        capacity.RedisClient, "get_worker_loads", classmethod(lambda cls: None)
+    )
+    assert capacity.fleet_has_capacity() is None
@@ -0,0 +1,47 @@
+import asyncio
+
+from capacity import CallCapacity
+from drain import Drainer
+
+
+class _Queue:
+    def __init__(self, left: int = 0):
+        self.left = left
+        self.flushed = False
+
+    async def flush(self, timeout: float) -> int:
+        self.flushed = True
+        return self.left
+
+
+def test_drain_waits_for_live_calls_and_flushes() -> None:
+    cap = CallCapacity(limit=2)
+    cap.try_acquire()
+    queue = _Queue()
+    drainer = Drainer(cap, queue, grace=2.0)
+
+    async def run() -> dict:
+        async def hang_up() -> None:
+            await asyncio.sleep(0.1)
+            cap.release()
+
+        asyncio.create_task(hang_up())
+        return await drainer.drain()
+
+    report = asyncio.run(run())
+
+    assert report["dropped_calls"] == 0
+    assert report["drain_seconds"] < 1.0
+    assert queue.flushed
+    assert cap.try_acquire() is False
+
+
+def test_drain_counts_calls_left_at_deadline() -> None:
+    cap = CallCapacity(limit=2)
+    cap.try_acquire()
+    drainer = Drainer(cap, _Queue(left=3), grace=0.1)
+
+    report = asyncio.run(drainer.drain())
+
+    assert report["dropped_calls"] == 1
+    assert report["pending_activities"] == 3
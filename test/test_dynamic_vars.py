@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from dynamic_vars import DynamicVariableCache
+
+ROWS = {f"dv-{i}": {"first_name": f"Lead {i}"} for i in range(10)}
+
+
+class _Loader:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, session, ids):
+        self.calls.append(list(ids))
+        time.sleep(self.delay)
+        return {i: ROWS[i] for i in ids if i in ROWS}
+
+
+def test_concurrent_misses_share_one_query_and_missing_rows_are_cached() -> (
+    None
+):
+    load = _Loader(delay=0.05)
+    cache = DynamicVariableCache(load=load)
+
+    async def run():
+        first = await asyncio.gather(
+            *(cache.get("dv-1", None) for _ in range(5))
+        )
+        missing = [await cache.get("nope", None) for _ in range(3)]
+        return first, missing
+
+    first, missing = asyncio.run(run())
+
+    assert first == [ROWS["dv-1"]] * 5
+    assert missing == [None] * 3
+    assert load.calls == [["dv-1"], ["nope"]]
+    stats = cache.stats()
+    assert stats["misses"] == 2
+    assert stats["shared_misses"] == 4
+    assert stats["hits"] == 2
+    assert stats["not_found"] == 1
+    assert (
+        stats["latency_ms"]["miss"]["p50"] > stats["latency_ms"]["hit"]["p50"]
+    )
+
+
+def test_entries_expire_and_can_be_invalidated() -> None:
+    load = _Loader()
+    cache = DynamicVariableCache(load=load, ttl=0.05)
+
+    async def run():
+        await cache.get("dv-2", None)
+        await cache.get("dv-2", None)
+        await asyncio.sleep(0.06)
+        await cache.get("dv-2", None)
+        assert cache.invalidate("dv-2") == 1
+        await cache.get("dv-2", None)
+
+    asyncio.run(run())
+
+    assert load.calls == [["dv-2"]] * 3
+
+
+def test_prefetch_loads_uncached_ids_in_chunks() -> None:
+    load = _Loader()
+    cache = DynamicVariableCache(load=load, chunk=4)
+
+    async def run():
+        await cache.get("dv-0", None)
+        queried = await cache.prefetch(list(ROWS) + ["dv-3", "gone"], None)
+        values = [await cache.get(i, None) for i in ROWS]
+        return queried, values
+
+    queried, values = asyncio.run(run())
+
+    assert queried == 10  # dv-1..dv-9 and "gone"; dv-0 was cached
+    assert [len(c) for c in load.calls] == [1, 4, 4, 2]
+    assert values == list(ROWS.values())
+    assert cache.stats()["hits"] == 10
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+import time
+
+from lanes import Lane
+
+
+def test_lane_bounds_concurrency_and_reports_utilization() -> None:
+    lane = Lane("uploads", workers=2)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work() -> str:
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+        return threading.current_thread().name
+
+    async def run():
+        return await asyncio.gather(*(lane.run(work) for _ in range(6)))
+
+    names = asyncio.run(run())
+
+    assert max(peak) == 2
+    assert all(name.startswith("lane-uploads") for name in names)
+    stats = lane.stats()
+    assert stats["completed"] == 6
+    assert stats["active"] == stats["queued"] == 0
+    assert stats["max_wait_ms"] >= 40
+    assert 0 < stats["utilization"] <= 1.0
+
+
+def test_lane_slots_bound_async_work_and_count_failures() -> None:
+    lane = Lane("analysis", workers=1)
+    order = []
+
+    async def job(n: int, fail: bool = False) -> None:
+        async with lane.slot():
+            order.append(("start", n))
+            await asyncio.sleep(0.01)
+            order.append(("end", n))
+            if fail:
+                raise ValueError("bad pass")
+
+    async def run():
+        await asyncio.gather(job(1, fail=True), job(2), return_exceptions=True)
+
+    asyncio.run(run())
+
+    assert order == [("start", 1), ("end", 1), ("start", 2), ("end", 2)]
+    assert lane.stats()["completed"] == 1
+    assert lane.stats()["failed"] == 1
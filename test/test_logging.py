@@ -0,0 +1,63 @@
+import io
+import json
+
+import structlog
+
+from utils import logging as log_module
+from utils.call_context import CallContext, use_call_context
+
+
+def _logger(sink: log_module.LogSink):
+    return structlog.wrap_logger(
+        log_module.QueueLogger(sink),
+        processors=[
+            structlog.stdlib.add_log_level,
+            log_module.sampler,
+            log_module.field_name_modifier,
+        ],
+        wrapper_class=structlog.stdlib.BoundLogger,
+    )
+
+
+def test_sink_renders_queued_records_on_flush() -> None:
+    stream = io.StringIO()
+    sink = log_module.LogSink(stream=stream, max_field_chars=20)
+    logger = _logger(sink)
+
+    logger.info("Agent validated", agent_id="agent-1", prompt="x" * 50)
+    assert sink.flush(timeout=2) is True
+
+    record = json.loads(stream.getvalue().splitlines()[0])
+    assert record["severity"] == "info"
+    assert record["message"] == "Agent validated"
+    assert record["agent_id"] == "agent-1"
+    assert record["prompt"] == "x" * 20 + "... (50 chars)"
+
+
+def test_sink_counts_dropped_and_sampled_records() -> None:
+    stream = io.StringIO()
+    sink = log_module.LogSink(stream=stream, maxsize=1)
+    sink._thread = object()  # hold the writer so the queue fills up
+    logger = _logger(sink)
+
+    logger.info("first")
+    logger.info("second")
+    logger.debug("noisy", sample_rate=0.0)
+
+    assert sink.dropped == 1
+    assert sink.enqueued == 1
+    assert sink.sampled == 1
+
+
+def test_records_carry_the_current_call_ids() -> None:
+    call = CallContext(
+        call_sid="CA1", lead_id="lead-1", auth_header="Bearer secret"
+    )
+
+    with use_call_context(call):
+        event = log_module.call_context_modifier(
+            None, "info", {"call_sid": "CA2"}
+        )
+
+    assert event == {"call_sid": "CA2", "lead_id": "lead-1"}
+    assert log_module.call_context_modifier(None, "info", {}) == {}
@@ -0,0 +1,46 @@
+import asyncio
+import tracemalloc
+
+import memory_accounting
+
+
+class _Pipeline:
+    pass
+
+
+def test_probe_flags_objects_that_outlive_the_call() -> None:
+    kept = []
+
+    async def call(keep: bool) -> dict:
+        probe = await memory_accounting.start_probe("CA123")
+        pipeline = _Pipeline()
+        probe.watch("pipeline_task", pipeline)
+        if keep:
+            kept.append(pipeline)
+        del pipeline
+        return await probe.finish()
+
+    tracemalloc.start(5)
+    try:
+        clean = asyncio.run(call(keep=False))
+        leaky = asyncio.run(call(keep=True))
+    finally:
+        tracemalloc.stop()
+
+    assert clean["leaked_objects"] == [] and not clean["flagged"]
+    assert leaky["leaked_objects"] == ["pipeline_task"] and leaky["flagged"]
+
+
+def test_allocations_are_attributed_to_components() -> None:
+    traceback = tracemalloc.Traceback(
+        (
+            ("/srv/app/bot.py", 10),
+            ("/site-packages/pipecat/serializers/twilio.py", 20),
+            ("/usr/lib/python3.11/json/decoder.py", 30),
+        )
+    )
+    assert memory_accounting._component(traceback) == "serializer"
+
+
+def test_probe_is_off_without_tracing() -> None:
+    assert asyncio.run(memory_accounting.start_probe("CA123")) is None
@@ -0,0 +1,40 @@
+import prompt_cache
+from tools import CRM_TOOLS, TOOL_INSTRUCTIONS
+
+
+def test_static_prefix_is_identical_across_calls() -> None:
+    first = prompt_cache.build_llm_messages("You are Ava from Acme.")
+    second = prompt_cache.build_llm_messages("You are Ava from Acme.")
+
+    assert first[0] == {"role": "system", "content": TOOL_INSTRUCTIONS}
+    assert prompt_cache.prefix_fingerprint(
+        first
+    ) == prompt_cache.prefix_fingerprint(second)
+
+
+def test_turns_after_prefix_do_not_change_fingerprint() -> None:
+    messages = prompt_cache.build_llm_messages("You are Ava from Acme.")
+    before = prompt_cache.prefix_fingerprint(messages)
+
+    messages.append(dict(prompt_cache.KICKOFF_MESSAGE))
+    messages.append({"role": "user", "content": "Hello?"})
+
+    assert prompt_cache.prefix_fingerprint(messages) == before
+    assert (
+        prompt_cache.prefix_fingerprint(messages, tools=CRM_TOOLS[:1])
+        != before
+    )
+
+
+def test_cache_stats_reports_ratio_and_prefix_changes() -> None:
+    stats = prompt_cache.PromptCacheStats(call_sid="CA123")
+    stats.record_prefix("aaaa")
+    stats.record_usage(prompt_tokens=2000, cached_tokens=0)
+    stats.record_prefix("aaaa")
+    stats.record_usage(prompt_tokens=2100, cached_tokens=1920)
+    stats.record_prefix("bbbb")
+
+    report = stats.as_dict()
+    assert report["requests"] == 2
+    assert report["cached_ratio"] == round(1920 / 4100, 4)
+    assert report["prefix_changes"] == 1
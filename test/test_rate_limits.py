@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+import rate_limits
+from rate_limits import BATCH, LIVE, ProviderLimiter, RateLimited
+
+
+def test_live_requests_go_ahead_of_batch(monkeypatch) -> None:
+    monkeypatch.setattr(rate_limits, "RATE_LIMIT_BATCH_MAX_WAIT", 0.3)
+    # 10 requests per second, 100 in the bucket, all spent.
+    limiter = ProviderLimiter("openai", {"requests": 600})
+    limiter.buckets["requests"].take(100)
+
+    async def run():
+        batch = asyncio.create_task(limiter.acquire(BATCH))
+        live_waited = await limiter.acquire(LIVE)
+        with pytest.raises(RateLimited):
+            await batch
+        return live_waited
+
+    live_waited = asyncio.run(run())
+
+    assert live_waited < 0.3
+    stats = limiter.snapshot()
+    assert stats[LIVE]["overdrafts"] == 0
+    assert stats[BATCH]["throttled"] == 1
+
+
+def test_live_request_overdraws_after_max_wait(monkeypatch) -> None:
+    monkeypatch.setattr(rate_limits, "RATE_LIMIT_LIVE_MAX_WAIT", 0.05)
+    limiter = ProviderLimiter("cartesia", {"requests": 60})
+    bucket = limiter.buckets["requests"]
+    bucket.take(bucket.capacity)
+
+    waited = asyncio.run(limiter.acquire(LIVE))
+
+    assert 0.04 < waited < 0.5
+    assert limiter.stats[LIVE]["overdrafts"] == 1
+    assert limiter.snapshot()["buckets"]["requests"]["remaining"] < 0
+    # An unconfigured provider only counts requests.
+    assert (
+        asyncio.run(ProviderLimiter("x", {"requests": 0}).acquire(LIVE)) == 0.0
+    )
+
+
+def test_fleet_share_splits_the_limit() -> None:
+    limiter = ProviderLimiter("openai", {"requests": 600, "tokens": 60_000})
+
+    limiter.set_share(0.25)
+
+    assert limiter.buckets["requests"].rate == pytest.approx(2.5)
+    assert limiter.buckets["tokens"].rate == pytest.approx(250)
@@ -1,7 +1,21 @@
 import asyncio
 import json
 
+import pytest
+
+import activity_queue
 import tools
+from circuit_breaker import CircuitBreaker
+from utils.call_context import CallContext, use_call_context
+
+
+@pytest.fixture(autouse=True)
+def queue(monkeypatch, tmp_path):
+    queue = activity_queue.ActivityQueue(
+        path=str(tmp_path / "activities.sqlite3"), breaker=CircuitBreaker("test")
+    )
+    monkeypatch.setattr(tools, "activity_queue", queue)
+    return queue
 
 
 class FakeResponse:
@@ -39,7 +53,7 @@ def test_connected_qualified_requires_bant_fields(monkeypatch) -> None:
         called = True
         return FakeResponse()
 
-    monkeypatch.setattr(tools.requests, "post", fake_post)
+    monkeypatch.setattr(activity_queue.requests, "post", fake_post)
 
     result = json.loads(
         run(
@@ -52,7 +66,9 @@ def test_connected_qualified_requires_bant_fields(monkeypatch) -> None:
     )
 
     assert result["status"] == "error"
-    assert "Budget, Authority, Need, and Timing" in result["message"]
+    assert result["message"] == (
+        "Budget, Authority, Need, and Timing are required for connected_qualified"
+    )
     assert called is False
 
 
@@ -66,7 +82,7 @@ def test_connected_qualified_posts_activity_with_bant(monkeypatch) -> None:
         return FakeResponse()
 
     monkeypatch.setattr(tools, "BACKEND_URL", "http://backend.test")
-    monkeypatch.setattr(tools.requests, "post", fake_post)
+    monkeypatch.setattr(activity_queue.requests, "post", fake_post)
 
     result = json.loads(
         run(
@@ -85,7 +101,9 @@ def test_connected_qualified_posts_activity_with_bant(monkeypatch) -> None:
                     "workspace_id": "workspace-1",
                     "lead_id": "lead-1",
                     "auth_header": "Bearer token",
+                    "call_sid": "CA1",
                 },
+                tool_call_id="call_1",
             )
         )
     )
@@ -99,6 +117,7 @@ def test_connected_qualified_posts_activity_with_bant(monkeypatch) -> None:
         "Content-Type": "application/json",
         "workspace-id": "workspace-1",
         "Authorization": "Bearer token",
+        "Idempotency-Key": "CA1:call_1",
     }
     assert captured["json"] == {
         "lead_id": "lead-1",
@@ -124,7 +143,7 @@ def test_schedule_callback_sets_callback_disposition(monkeypatch) -> None:
         return FakeResponse()
 
     monkeypatch.setattr(tools, "BACKEND_URL", "http://backend.test")
-    monkeypatch.setattr(tools.requests, "post", fake_post)
+    monkeypatch.setattr(activity_queue.requests, "post", fake_post)
 
     result = json.loads(
         run(
@@ -164,7 +183,7 @@ def test_log_conversation_summary_posts_activity_note(monkeypatch) -> None:
         return FakeResponse()
 
     monkeypatch.setattr(tools, "BACKEND_URL", "http://backend.test")
-    monkeypatch.setattr(tools.requests, "post", fake_post)
+    monkeypatch.setattr(activity_queue.requests, "post", fake_post)
 
     result = json.loads(
         run(
@@ -184,3 +203,71 @@ def test_log_conversation_summary_posts_activity_note(monkeypatch) -> None:
         "type": "manual",
         "notes": "Lead asked for pricing and timeline.",
     }
+
+
+def test_invalid_arguments_return_structured_errors_without_posting(monkeypatch) -> None:
+    def fake_post(*args, **kwargs):
+        raise AssertionError("should not post")
+
+    monkeypatch.setattr(activity_queue.requests, "post", fake_post)
+    invalid_before = tools.registry.metrics()["schedule_callback"]["invalid"]
+
+    result = json.loads(
+        run(
+            tools.handle_tool_call(
+                "schedule_callback",
+                {"callback_date": "tomorrow", "callback_time": "25:00"},
+                {"workspace_id": "workspace-1", "lead_id": "lead-1"},
+            )
+        )
+    )
+
+    assert result["status"] == "error"
+    assert [e["field"] for e in result["errors"]] == ["callback_date", "callback_time"]
+    assert tools.registry.metrics()["schedule_callback"]["invalid"] == invalid_before + 1
+
+
+def test_callback_check_names_the_argument_that_failed() -> None:
+    check = tools._check_callback_datetime
+
+    assert check({"callback_date": "2026-02-30", "callback_time": "10:00"})["field"] == (
+        "callback_date"
+    )
+    assert check({"callback_date": "2026-03-02", "callback_time": "24:00"})["field"] == (
+        "callback_time"
+    )
+    assert check({"callback_date": "2026-03-02", "callback_time": "09:05"}) is None
+
+
+def test_unknown_disposition_is_rejected_by_schema() -> None:
+    errors = tools.registry.validate("set_call_disposition", {"disposition": "maybe"})
+
+    assert errors[0]["field"] == "disposition"
+    assert errors[0]["error"].startswith("must be one of:")
+
+
+def test_tool_calls_use_the_current_call_context(monkeypatch) -> None:
+    captured = []
+
+    def fake_post(url, headers, json, timeout):
+        captured.append(headers)
+        return FakeResponse()
+
+    monkeypatch.setattr(activity_queue.requests, "post", fake_post)
+    call = CallContext(
+        workspace_id="workspace-1", lead_id="lead-1", call_sid="CA1", auth_header="Bearer t"
+    )
+
+    async def two_calls() -> None:
+        with use_call_context(call):
+            for n in range(2):
+                await tools.handle_tool_call(
+                    "log_conversation_summary", {"summary": "Pricing."}, tool_call_id=f"c{n}"
+                )
+
+    run(two_calls())
+
+    assert [h["Idempotency-Key"] for h in captured] == ["CA1:c0", "CA1:c1"]
+    assert captured[0]["Authorization"] == "Bearer t"
+    # Built once per call; each delivery adds its key to a copy.
+    assert "Idempotency-Key" not in call.backend_headers
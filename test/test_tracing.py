@@ -0,0 +1,47 @@
+import json
+
+from utils import logging as log_module
+from utils import tracing
+
+
+def test_sampled_trace_exports_nested_spans(monkeypatch, tmp_path) -> None:
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(
+        tracing,
+        "_exporter",
+        tracing.SpanExporter(endpoint=None, path=str(path)),
+    )
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+
+    with tracing.start_trace("call", call_sid="CA1") as root:
+        with tracing.span("redis.get_call_prompt") as child:
+            assert tracing.current_span() is child
+        assert tracing.current_span() is root
+    assert tracing.current_span() is None
+    assert tracing.flush(timeout=2) is True
+
+    spans = {
+        s["name"]: s for s in map(json.loads, path.read_text().splitlines())
+    }
+    assert spans["redis.get_call_prompt"]["parent_id"] == root.span_id
+    assert spans["redis.get_call_prompt"]["trace_id"] == root.trace_id
+    assert spans["call"]["attributes"] == {"call_sid": "CA1"}
+
+
+def test_unsampled_trace_still_correlates_logs(monkeypatch) -> None:
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    monkeypatch.setenv("GOOGLE_CLOUD_PROJECT", "proj")
+    header = "105445aa7843bc8bf206b12000100000/1;o=0"
+
+    with tracing.start_trace(
+        "call", trace_header=header, call_sid="CA1"
+    ) as root:
+        fields = log_module.trace_modifier(None, "info", {})
+
+    assert root.sampled is False
+    assert root.attributes == {}
+    assert root.parent_id == f"{1:016x}"
+    assert fields["logging.googleapis.com/trace"] == (
+        "projects/proj/traces/105445aa7843bc8bf206b12000100000"
+    )
+    assert fields["logging.googleapis.com/trace_sampled"] is False
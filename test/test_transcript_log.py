@@ -0,0 +1,84 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from transcript_log import load_transcript, LocalTranscriptStore, TranscriptLog
+
+
+def _update(*messages):
+    return SimpleNamespace(
+        messages=[
+            SimpleNamespace(role=r, content=c, timestamp=None)
+            for r, c in messages
+        ]
+    )
+
+
+def test_turns_are_readable_during_the_call_and_final_at_hangup(
+    tmp_path,
+) -> None:
+    store = LocalTranscriptStore(str(tmp_path))
+
+    async def run() -> None:
+        log = TranscriptLog("CA1", store=store)
+        await log.on_transcript_update(None, _update(("user", "Hello?")))
+        await log.on_transcript_update(
+            None, _update(("assistant", "Hi, this is Ava."))
+        )
+
+        live = load_transcript("CA1", store=store)
+        assert live["complete"] is False
+        assert [m["content"] for m in live["messages"]] == [
+            "Hello?",
+            "Hi, this is Ava.",
+        ]
+
+        log.append("user", "Call me Friday.")
+        await log.close()
+
+    asyncio.run(run())
+    final = load_transcript("CA1", store=store)
+    assert final["complete"] is True
+    assert [m["seq"] for m in final["messages"]] == [0, 1, 2]
+    # The append-only log holds each turn once.
+    assert len(store.read_parts("CA1")) == 3
+
+
+def test_failed_flush_is_retried_with_the_next_turn(tmp_path) -> None:
+    store = LocalTranscriptStore(str(tmp_path))
+    writes = []
+
+    def flaky_append(call_sid, part, data):
+        writes.append(part)
+        if len(writes) == 1:
+            raise OSError("disk full")
+        LocalTranscriptStore.append(store, call_sid, part, data)
+
+    store.append = flaky_append
+
+    async def run() -> None:
+        log = TranscriptLog("CA2", store=store)
+        await log.on_transcript_update(None, _update(("user", "Hello?")))
+        await log.on_transcript_update(None, _update(("assistant", "Hi!")))
+
+    asyncio.run(run())
+    assert writes == [0, 0]
+    assert [m["content"] for m in store.read_parts("CA2")] == ["Hello?", "Hi!"]
+
+
+def test_legacy_transcript_is_read_and_never_overwritten(tmp_path) -> None:
+    store = LocalTranscriptStore(str(tmp_path))
+    legacy = {"transcript": [{"speaker": "agent", "text": "Hi"}]}
+    (tmp_path / "CA2.json").write_text(json.dumps(legacy))
+
+    assert load_transcript("CA2", store=store) == legacy
+
+    log = TranscriptLog("CA2", store=store)
+    log.append("user", "Hello?")
+    asyncio.run(log.close())
+
+    assert json.loads((tmp_path / "CA2.json").read_text()) == legacy
+    assert (
+        load_transcript("CA2", store=store)["messages"][0]["content"]
+        == "Hello?"
+    )
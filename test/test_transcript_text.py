@@ -0,0 +1,63 @@
+from transcript_text import clean_text, normalize_transcript, strip_html_tags
+
+
+def test_normalize_builds_prompt_search_text_and_index() -> None:
+    transcript = {
+        "call_sid": "CA1",
+        "complete": True,
+        "messages": [
+            {
+                "seq": 0,
+                "role": "assistant",
+                "content": "Hi <break time='1s'/> there,\n  is this Ana?",
+            },
+            {"seq": 1, "role": "user", "content": "Yes. Our BUDGET is tight."},
+            {"seq": 2, "role": "assistant", "content": "   "},
+            {
+                "seq": 3,
+                "role": "user",
+                "content": [{"type": "text", "text": "Budget approved"}],
+            },
+        ],
+    }
+
+    text = normalize_transcript(transcript)
+
+    assert text.prompt_text == (
+        "assistant: Hi there, is this Ana?\n"
+        "user: Yes. Our BUDGET is tight.\n"
+        "user: Budget approved"
+    )
+    assert text.search_text.splitlines()[1] == "yes. our budget is tight."
+    assert text.mentions("Budget") and not text.mentions("timeline")
+    assert text.turns_with("budget") == (1, 3)
+    assert "timestamp" not in text.search_text
+
+
+def test_strip_html_tags_and_empty_transcripts() -> None:
+    assert strip_html_tags("a <b>bold</b> move") == "a bold move"
+    assert strip_html_tags("no tags") == "no tags"
+    assert clean_text(" one\t<i>two</i>\n three ") == "one two three"
+    for empty in (None, {}, {"messages": None}, []):
+        text = normalize_transcript(empty)
+        assert text.prompt_text == text.search_text == ""
+        assert text.index == {}
+
+
+def test_unrecognized_shapes_fall_back_to_json() -> None:
+    external = {
+        "call_sid": "CA2",
+        "transcript": [{"speaker": "lead", "text": "Budget is fine"}],
+    }
+
+    text = normalize_transcript(external)
+
+    assert '"text": "Budget is fine"' in text.prompt_text
+    assert text.mentions("budget")
+    assert text.turns_with("fine") == (0,)
+    assert (
+        "speaker"
+        in normalize_transcript(
+            [{"speaker": "lead", "text": "hi"}]
+        ).prompt_text
+    )
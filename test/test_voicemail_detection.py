@@ -0,0 +1,50 @@
+from voicemail_detection import HUMAN, MACHINE, VoicemailClassifier
+
+FRAME_SECONDS = 0.02
+
+
+def _advance(classifier, seconds: float) -> None:
+    for _ in range(round(seconds / FRAME_SECONDS)):
+        classifier.add_audio(FRAME_SECONDS)
+
+
+def test_short_greeting_then_silence_is_a_person() -> None:
+    classifier = VoicemailClassifier()
+    classifier.speech_started()
+    _advance(classifier, 0.6)
+    classifier.speech_stopped()
+    classifier.add_transcript("Hello?")
+    _advance(classifier, 0.5)
+
+    assert (classifier.result, classifier.reason) == (HUMAN, "short_greeting")
+
+
+def test_machine_greeting_waits_for_the_beep() -> None:
+    classifier = VoicemailClassifier()
+    classifier.speech_started()
+    _advance(classifier, 1.0)
+    classifier.add_transcript(
+        "Hi, you've reached Sam, please leave a message."
+    )
+    assert (classifier.result, classifier.reason) == (MACHINE, "transcript")
+    assert not classifier.ready_for_message()
+
+    classifier.beep_detected()
+    assert classifier.ready_for_message()
+
+
+def test_long_greeting_alone_is_a_person_and_so_is_silence() -> None:
+    talker = VoicemailClassifier(decision_seconds=5.0)
+    talker.speech_started()
+    talker.add_transcript(
+        "Hi yes this is Sam speaking, you've reached me at a bad time"
+    )
+    _advance(talker, 6.0)
+    assert talker.result is None  # still talking: a voicemail phrase may come
+    talker.speech_stopped()
+    _advance(talker, 0.1)
+    assert (talker.result, talker.reason) == (HUMAN, "no_machine_cues")
+
+    silent = VoicemailClassifier(decision_seconds=5.0)
+    _advance(silent, 5.1)
+    assert (silent.result, silent.reason) == (HUMAN, "no_machine_cues")
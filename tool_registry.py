@@ -0,0 +1,195 @@
+"""
+Table-driven dispatch for CRM tool calls with precompiled validation.
+
+Each tool's JSON schema (the same one sent to the model in CRM_TOOLS) is
+compiled once into a list of per-field checks: type, enum and pattern tests
+closed over frozensets and compiled regexes. Extra rules that a schema can't
+express (e.g. BANT fields for connected_qualified) are registered as checks
+alongside it. Invalid arguments are answered with structured errors before
+the handler, and so before any network I/O, runs.
+"""
+
+from dataclasses import dataclass, field
+import json
+import re
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+FieldError = Dict[str, Optional[str]]
+Validator = Callable[[dict], List[FieldError]]
+Check = Callable[[dict], Optional[FieldError]]
+
+_TYPE_CHECKS = {
+    "string": lambda v: isinstance(v, str),
+    "boolean": lambda v: isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float))
+    and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+}
+
+
+def _compile_property(
+    name: str, spec: dict
+) -> Callable[[object], Optional[str]]:
+    type_name = spec.get("type")
+    type_ok = _TYPE_CHECKS.get(type_name)
+    enum = frozenset(spec["enum"]) if "enum" in spec else None
+    pattern = re.compile(spec["pattern"]) if "pattern" in spec else None
+
+    def check(value: object) -> Optional[str]:
+        if type_ok is not None and not type_ok(value):
+            return f"must be of type {type_name}"
+        if enum is not None and value not in enum:
+            return f"must be one of: {', '.join(sorted(enum))}"
+        if pattern is not None and not pattern.search(value):
+            return f"must match {pattern.pattern}"
+        return None
+
+    return check
+
+
+def compile_schema(schema: dict) -> Validator:
+    """Compile an object schema into a validator returning field errors."""
+    required = tuple(schema.get("required", ()))
+    properties = schema.get("properties", {})
+    checks = tuple(
+        (name, _compile_property(name, spec))
+        for name, spec in properties.items()
+    )
+    closed = schema.get("additionalProperties") is False
+    allowed = frozenset(properties)
+
+    def validate(args: dict) -> List[FieldError]:
+        if not isinstance(args, dict):
+            return [{"field": None, "error": "arguments must be an object"}]
+        errors = [
+            {"field": name, "error": "is required"}
+            for name in required
+            if args.get(name) is None
+        ]
+        for name, check in checks:
+            value = args.get(name)
+            if value is not None:
+                error = check(value)
+                if error:
+                    errors.append({"field": name, "error": error})
+        if closed:
+            errors.extend(
+                {"field": name, "error": "is not allowed"}
+                for name in args.keys() - allowed
+            )
+        return errors
+
+    return validate
+
+
+@dataclass
+class ToolMetrics:
+    calls: int = 0
+    invalid: int = 0
+    errors: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "invalid": self.invalid,
+            "errors": self.errors,
+            "mean_ms": (
+                round(self.total_ms / self.calls, 3) if self.calls else 0.0
+            ),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+@dataclass
+class Tool:
+    name: str
+    handler: Callable[..., Awaitable[str]]
+    validate: Validator
+    checks: tuple = ()
+    metrics: ToolMetrics = field(default_factory=ToolMetrics)
+
+    def check(self, args: dict) -> List[FieldError]:
+        """The extra checks' errors; run once the schema passes."""
+        return [
+            error for error in (check(args) for check in self.checks) if error
+        ]
+
+    def errors(self, args: dict) -> List[FieldError]:
+        return self.validate(args) or self.check(args)
+
+
+def _describe(errors: List[FieldError]) -> str:
+    return "; ".join(
+        e["error"] if e["field"] is None else f"{e['field']} {e['error']}"
+        for e in errors
+    )
+
+
+def _error(message: str, errors: Optional[List[FieldError]] = None) -> str:
+    result = {"status": "error", "message": message}
+    if errors:
+        result["errors"] = errors
+    return json.dumps(result)
+
+
+class ToolRegistry:
+    def __init__(self) -> None:
+        self._tools: Dict[str, Tool] = {}
+
+    def register(
+        self,
+        definition: dict,
+        handler: Callable[..., Awaitable[str]],
+        checks: Iterable[Check] = (),
+    ) -> None:
+        """Register a handler for an OpenAI tool definition (as in CRM_TOOLS)."""
+        function = definition["function"]
+        self._tools[function["name"]] = Tool(
+            name=function["name"],
+            handler=handler,
+            validate=compile_schema(function.get("parameters", {})),
+            checks=tuple(checks),
+        )
+
+    def validate(self, name: str, args: dict) -> List[FieldError]:
+        return self._tools[name].errors(args)
+
+    async def dispatch(self, name: str, args: dict, **context: object) -> str:
+        """Validate `args` and run the tool's handler with `args=args, **context`."""
+        tool = self._tools.get(name)
+        if tool is None:
+            return _error(f"Unknown function: {name}")
+
+        started = time.perf_counter()
+        tool.metrics.calls += 1
+        try:
+            errors = tool.validate(args)
+            if errors:
+                tool.metrics.invalid += 1
+                return _error(
+                    f"Invalid arguments for {name}: {_describe(errors)}",
+                    errors,
+                )
+            # Checks carry the handler's own wording (e.g. the BANT rule).
+            errors = tool.check(args)
+            if errors:
+                tool.metrics.invalid += 1
+                return _error(_describe(errors), errors)
+            return await tool.handler(args=args, **context)
+        except Exception:
+            tool.metrics.errors += 1
+            raise
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            tool.metrics.total_ms += elapsed
+            tool.metrics.max_ms = max(tool.metrics.max_ms, elapsed)
+
+    def metrics(self) -> Dict[str, dict]:
+        return {
+            name: tool.metrics.as_dict() for name, tool in self._tools.items()
+        }
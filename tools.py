@@ -9,24 +9,43 @@ lead information after the call.
 import os
 import json
 import logging
-from typing import Optional
+from datetime import datetime
+from typing import Optional, Union
 
-import requests
+from activity_queue import DELIVERED, REJECTED, activity_key, activity_queue
+from tool_registry import ToolRegistry
+from utils.call_context import CallContext, current_call
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
 BACKEND_URL = os.getenv("BACKEND_URL", "https://app.finhubb.io")
 
+# Static tool-calling instructions. Kept as a module constant so the system
+# prompt prefix is byte-identical on every request (see prompt_cache.py).
+TOOL_INSTRUCTIONS = (
+    "You have access to CRM tools. At the end of the conversation, "
+    "you MUST call log_conversation_summary to record what was discussed, and you MUST set one call outcome. "
+    "Use exactly one disposition path: "
+    "1) If lead asks for callback, call schedule_callback(callback_date, callback_time, notes) and do not call set_call_disposition after that. "
+    "2) If lead is not interested, call set_call_disposition with disposition='connected_not_interested'. "
+    "3) If lead is interested and clearly satisfies BANT (budget, authority, need, timing), call set_call_disposition with disposition='connected_qualified' and include has_budget=true, has_authority=true, has_need=true, and has_timing=true. "
+    "4) If lead is interested but does not satisfy BANT, call set_call_disposition with disposition='connected_disqualified'. "
+    "If the lead asks not to be called or texted, use disposition='do_not_call'. If the number is wrong, use disposition='bad_number'. "
+    "If outcome is still unclear, ask follow-up questions before ending the call."
+)
 
-def _backend_headers(workspace_id: str, auth_header: Optional[str] = None) -> dict:
-    """Headers for backend API calls from the agent."""
-    headers = {
-        "Content-Type": "application/json",
-        "workspace-id": workspace_id,
-    }
-    if auth_header:
-        headers["Authorization"] = auth_header
-    return headers
+
+async def _submit_activity(key: str, kind: str, call: CallContext, payload: dict):
+    """Record an activity in the write-behind queue and try to deliver it."""
+    return await activity_queue.submit(
+        key,
+        kind,
+        f"{call.workspace_id}:{call.lead_id}",
+        f"{BACKEND_URL}/api/v1/activities/",
+        call.backend_headers,
+        payload,
+    )
 
 
 CRM_TOOLS = [
@@ -102,10 +121,12 @@ CRM_TOOLS = [
                 "properties": {
                     "callback_date": {
                         "type": "string",
+                        "pattern": r"^\d{4}-\d{2}-\d{2}$",
                         "description": "The date for the callback in YYYY-MM-DD format.",
                     },
                     "callback_time": {
                         "type": "string",
+                        "pattern": r"^([01]\d|2[0-3]):[0-5]\d$",
                         "description": "The time for the callback in HH:MM format (24h).",
                     },
                     "notes": {
@@ -147,53 +168,40 @@ CRM_TOOLS = [
 async def handle_tool_call(
     function_name: str,
     arguments: dict,
-    call_metadata: dict,
+    call: Union[CallContext, dict, None] = None,
+    tool_call_id: Optional[str] = None,
 ) -> str:
     """
     Execute a CRM tool call and return the result as a string for the LLM.
 
-    call_metadata should contain: lead_id, workspace_id, agent_id, auth_header.
+    `call` is the call's CallContext (or a dict with the same fields), by
+    default the current one. Activities are keyed by call_sid and
+    tool_call_id, so a repeated tool call is not posted twice (see
+    activity_queue.py).
     """
-    lead_id = call_metadata.get("lead_id")
-    workspace_id = call_metadata.get("workspace_id")
-    auth_header = call_metadata.get("auth_header")
+    call = CallContext.of(call if call is not None else current_call())
+    key = activity_key(call.call_sid, tool_call_id)
 
-    if not workspace_id:
+    if not call.workspace_id:
         return json.dumps({"status": "error", "message": "No workspace context available"})
 
-    try:
-        if function_name == "set_call_disposition":
-            return await _set_disposition(workspace_id, lead_id, arguments, auth_header)
-        elif function_name == "schedule_callback":
-            return await _schedule_callback(workspace_id, lead_id, arguments, auth_header)
-        elif function_name == "log_conversation_summary":
-            return await _log_summary(workspace_id, lead_id, arguments, auth_header)
-        else:
-            return json.dumps({"status": "error", "message": f"Unknown function: {function_name}"})
-    except Exception as e:
-        logger.error(f"Tool call failed: {function_name}: {e}")
-        return json.dumps({"status": "error", "message": str(e)})
+    with span("tool_call", function_name=function_name, lead_id=call.lead_id) as active:
+        try:
+            result = await registry.dispatch(function_name, arguments, call=call, key=key)
+        except Exception as e:
+            logger.error(f"Tool call failed: {function_name}: {e}")
+            result = json.dumps({"status": "error", "message": str(e)})
+        if active is not None and active.sampled:
+            active.set(status=json.loads(result).get("status"))
+        return result
 
 
-async def _set_disposition(
-    workspace_id: str,
-    lead_id: Optional[str],
-    args: dict,
-    auth_header: Optional[str],
-) -> str:
-    if not lead_id:
+async def _set_disposition(call: CallContext, args: dict, key: str) -> str:
+    if not call.lead_id:
         return json.dumps({"status": "skipped", "message": "No lead_id associated with this call"})
 
-    if args["disposition"] == "connected_qualified":
-        required_bant = ("has_budget", "has_authority", "has_need", "has_timing")
-        if any(key not in args for key in required_bant):
-            return json.dumps({
-                "status": "error",
-                "message": "Budget, Authority, Need, and Timing are required for connected_qualified",
-            })
-
     payload = {
-        "lead_id": lead_id,
+        "lead_id": call.lead_id,
         "channel": "call",
         "type": "manual",
         "disposition": args["disposition"],
@@ -214,27 +222,19 @@ async def _set_disposition(
     if args["disposition"] == "connected_qualified":
         payload["currency"] = args.get("currency", "USD")
 
-    try:
-        resp = requests.post(
-            f"{BACKEND_URL}/api/v1/activities/",
-            headers=_backend_headers(workspace_id, auth_header),
-            json=payload,
-            timeout=10,
-        )
-        if resp.ok:
-            return json.dumps({"status": "success", "disposition": args["disposition"]})
-        return json.dumps({"status": "error", "message": resp.text[:200]})
-    except Exception as e:
-        return json.dumps({"status": "error", "message": str(e)})
+    delivery = await _submit_activity(key, "disposition", call, payload)
+    if delivery.status == REJECTED:
+        return json.dumps({"status": "error", "message": delivery.error})
+    result = {"status": "success", "disposition": args["disposition"]}
+    if delivery.status != DELIVERED:
+        result["delivery"] = delivery.status
+        if delivery.error:
+            result["delivery_error"] = delivery.error
+    return json.dumps(result)
 
 
-async def _schedule_callback(
-    workspace_id: str,
-    lead_id: Optional[str],
-    args: dict,
-    auth_header: Optional[str],
-) -> str:
-    if not lead_id:
+async def _schedule_callback(call: CallContext, args: dict, key: str) -> str:
+    if not call.lead_id:
         return json.dumps({"status": "skipped", "message": "No lead_id associated with this call"})
 
     callback_datetime = f"{args['callback_date']}T{args['callback_time']}:00"
@@ -243,7 +243,7 @@ async def _schedule_callback(
         "notes": args.get("notes", "Callback requested during AI conversation"),
         "callback_datetime": callback_datetime,
     }
-    result_json = await _set_disposition(workspace_id, lead_id, disposition_args, auth_header)
+    result_json = await _set_disposition(call, disposition_args, key)
     try:
         result = json.loads(result_json)
     except Exception:
@@ -253,30 +253,52 @@ async def _schedule_callback(
     return json.dumps(result)
 
 
-async def _log_summary(
-    workspace_id: str,
-    lead_id: Optional[str],
-    args: dict,
-    auth_header: Optional[str],
-) -> str:
-    if not lead_id:
+async def _log_summary(call: CallContext, args: dict, key: str) -> str:
+    if not call.lead_id:
         return json.dumps({"status": "skipped", "message": "No lead_id - summary logged locally only"})
 
     payload = {
-        "lead_id": lead_id,
+        "lead_id": call.lead_id,
         "channel": "call",
         "type": "manual",
         "notes": args["summary"],
     }
-    try:
-        resp = requests.post(
-            f"{BACKEND_URL}/api/v1/activities/",
-            headers=_backend_headers(workspace_id, auth_header),
-            json=payload,
-            timeout=10,
-        )
-        if resp.ok:
-            return json.dumps({"status": "success", "message": "Summary logged"})
-        return json.dumps({"status": "error", "message": resp.text[:200]})
-    except Exception as e:
-        return json.dumps({"status": "error", "message": str(e)})
+    delivery = await _submit_activity(key, "summary", call, payload)
+    if delivery.status == REJECTED:
+        return json.dumps({"status": "error", "message": delivery.error})
+    result = {"status": "success", "message": "Summary logged"}
+    if delivery.status != DELIVERED:
+        result["delivery"] = delivery.status
+        if delivery.error:
+            result["delivery_error"] = delivery.error
+    return json.dumps(result)
+
+
+def _check_bant(args: dict) -> Optional[dict]:
+    if args.get("disposition") == "connected_qualified":
+        required_bant = ("has_budget", "has_authority", "has_need", "has_timing")
+        if any(key not in args for key in required_bant):
+            return {
+                "field": None,
+                "error": "Budget, Authority, Need, and Timing are required for connected_qualified",
+            }
+    return None
+
+
+def _check_callback_datetime(args: dict) -> Optional[dict]:
+    # Report the argument that is wrong, so the model corrects that one.
+    for field, fmt, error in (
+        ("callback_date", "%Y-%m-%d", "is not a valid calendar date"),
+        ("callback_time", "%H:%M", "is not a valid time of day"),
+    ):
+        try:
+            datetime.strptime(args[field], fmt)
+        except ValueError:
+            return {"field": field, "error": error}
+    return None
+
+
+registry = ToolRegistry()
+registry.register(CRM_TOOLS[0], _set_disposition, checks=[_check_bant])
+registry.register(CRM_TOOLS[1], _schedule_callback, checks=[_check_callback_datetime])
+registry.register(CRM_TOOLS[2], _log_summary)
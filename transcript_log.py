@@ -0,0 +1,269 @@
+"""
+Append-only transcript log written while the call is in progress.
+
+A pipecat TranscriptProcessor in the pipeline reports each finished caller
+utterance (from STT) and each bot reply (from the text sent to TTS).
+TranscriptLog appends every turn to the call's log and flushes the new turns
+to the store straight away, so the stored transcript is never more than one
+turn behind the call. At hangup, close() writes the finished transcript
+next to the parts, as transcriptions/{call_sid}/final.json, which
+helper.get_transcription reads (load_transcript). The externally produced
+transcriptions/{call_sid}.json is left alone and is still read when a call
+has no final.json. Post-call analysis can start immediately, or read the
+partial log during the call.
+
+Stores:
+
+- LocalTranscriptStore: JSON lines under TRANSCRIPT_DIR (tests, local dev)
+- GCSTranscriptStore: one object per flush under transcriptions/{call_sid}/
+  in GCP_STORAGE_BUCKET_NAME (GCS objects cannot be appended to)
+
+TRANSCRIPT_BACKEND picks one ("gcs" by default when a bucket is set,
+otherwise "local"); TRANSCRIPT_CAPTURE=false turns capture off.
+
+When the call data carries analysis questions, each turn also feeds an
+IncrementalAnalyzer (call_analysis.py) and the finished transcript includes
+its "analysis".
+"""
+
+import asyncio
+from datetime import datetime, timezone
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional, Union
+
+from call_analysis import IncrementalAnalyzer
+import lanes
+from utils.logging import logger
+
+TRANSCRIPT_CAPTURE = os.getenv("TRANSCRIPT_CAPTURE", "true").lower() == "true"
+TRANSCRIPT_BUCKET = os.getenv("GCP_STORAGE_BUCKET_NAME")
+TRANSCRIPT_BACKEND = os.getenv(
+    "TRANSCRIPT_BACKEND", "gcs" if TRANSCRIPT_BUCKET else "local"
+)
+TRANSCRIPT_DIR = os.getenv(
+    "TRANSCRIPT_DIR", os.path.join(tempfile.gettempdir(), "transcriptions")
+)
+
+
+class LocalTranscriptStore:
+    def __init__(self, directory: str = TRANSCRIPT_DIR) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, call_sid: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{call_sid}{suffix}")
+
+    def append(self, call_sid: str, part: int, data: str) -> None:
+        with open(self._path(call_sid, ".jsonl"), "a", encoding="utf-8") as f:
+            f.write(data)
+
+    def read_parts(self, call_sid: str) -> List[dict]:
+        try:
+            with open(self._path(call_sid, ".jsonl"), encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def read_final(self, call_sid: str) -> Optional[dict]:
+        # Ours, then the legacy {call_sid}.json.
+        for suffix in (".final.json", ".json"):
+            try:
+                with open(self._path(call_sid, suffix), encoding="utf-8") as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                continue
+        return None
+
+    def finalize(self, call_sid: str, transcript: dict) -> None:
+        path = self._path(call_sid, ".final.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(transcript, f)
+        os.replace(path + ".tmp", path)
+
+
+class GCSTranscriptStore:
+    def __init__(self, bucket_name: Optional[str] = TRANSCRIPT_BUCKET) -> None:
+        from google.cloud import storage
+
+        self._bucket = storage.Client().bucket(bucket_name)
+
+    def append(self, call_sid: str, part: int, data: str) -> None:
+        blob = self._bucket.blob(
+            f"transcriptions/{call_sid}/part-{part:05d}.jsonl"
+        )
+        blob.upload_from_string(data, content_type="application/x-ndjson")
+
+    def read_parts(self, call_sid: str) -> List[dict]:
+        entries = []
+        blobs = self._bucket.list_blobs(
+            prefix=f"transcriptions/{call_sid}/part-"
+        )
+        for blob in sorted(blobs, key=lambda b: b.name):
+            entries.extend(
+                json.loads(line)
+                for line in blob.download_as_text().splitlines()
+                if line
+            )
+        return entries
+
+    def read_final(self, call_sid: str) -> Optional[dict]:
+        # Ours, then the externally produced transcript the worker used to read.
+        for name in (
+            f"transcriptions/{call_sid}/final.json",
+            f"transcriptions/{call_sid}.json",
+        ):
+            blob = self._bucket.blob(name)
+            if blob.exists():
+                return json.loads(blob.download_as_text())
+        return None
+
+    def finalize(self, call_sid: str, transcript: dict) -> None:
+        blob = self._bucket.blob(f"transcriptions/{call_sid}/final.json")
+        blob.upload_from_string(
+            json.dumps(transcript), content_type="application/json"
+        )
+
+
+TranscriptStore = Union[LocalTranscriptStore, GCSTranscriptStore]
+
+_store: Optional[TranscriptStore] = None
+
+
+def transcript_store() -> TranscriptStore:
+    """The configured store, created on first use."""
+    global _store
+    if _store is None:
+        _store = (
+            GCSTranscriptStore()
+            if TRANSCRIPT_BACKEND == "gcs"
+            else LocalTranscriptStore()
+        )
+    return _store
+
+
+def load_transcript(
+    call_sid: str, store: Optional[TranscriptStore] = None
+) -> dict:
+    """The finished transcript, or the turns logged so far. Blocking."""
+    store = store or transcript_store()
+    final = store.read_final(call_sid)
+    if final is not None:
+        return final
+    return {
+        "call_sid": call_sid,
+        "complete": False,
+        "messages": store.read_parts(call_sid),
+    }
+
+
+class TranscriptLog:
+    def __init__(
+        self,
+        call_sid: str,
+        store: Optional[TranscriptStore] = None,
+        analyzer: Optional[IncrementalAnalyzer] = None,
+    ) -> None:
+        self.call_sid = call_sid
+        self.store = store or transcript_store()
+        self.analyzer = analyzer
+        self.analysis: Optional[dict] = None
+        self.messages: List[Dict] = []
+        self._flushed = 0
+        self._part = 0
+        self._lock = asyncio.Lock()
+
+    def append(
+        self, role: str, content: str, timestamp: Optional[str] = None
+    ) -> Dict:
+        message = {
+            "seq": len(self.messages),
+            "role": role,
+            "content": content,
+            "timestamp": timestamp or datetime.now(timezone.utc).isoformat(),
+        }
+        self.messages.append(message)
+        if self.analyzer is not None:
+            self.analyzer.add_turn(message)
+        return message
+
+    async def on_transcript_update(
+        self, processor: object, frame: object
+    ) -> None:
+        """TranscriptProcessor event handler: log the new turns and flush them."""
+        for message in frame.messages:
+            self.append(message.role, message.content, message.timestamp)
+        await self.flush()
+        if self.analyzer is not None:
+            self.analyzer.schedule()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            pending = self.messages[self._flushed :]
+            if not pending:
+                return
+            data = "".join(json.dumps(m) + "\n" for m in pending)
+            try:
+                await lanes.uploads.run(
+                    self.store.append, self.call_sid, self._part, data
+                )
+            except Exception as e:
+                # Kept in memory; the next flush or close() retries.
+                logger.warning(
+                    "Failed to flush transcript",
+                    call_sid=self.call_sid,
+                    error=str(e),
+                )
+                return
+            self._flushed += len(pending)
+            self._part += 1
+
+    def as_dict(self) -> dict:
+        transcript = {
+            "call_sid": self.call_sid,
+            "complete": True,
+            "messages": self.messages,
+        }
+        if self.analysis is not None:
+            transcript["analysis"] = self.analysis
+        return transcript
+
+    async def close(self) -> None:
+        await self.flush()
+        if self.analyzer is not None:
+            self.analysis = await self.analyzer.finalize()
+        try:
+            await lanes.uploads.run(
+                self.store.finalize, self.call_sid, self.as_dict()
+            )
+            logger.info(
+                "Transcript finalized",
+                call_sid=self.call_sid,
+                messages=len(self.messages),
+            )
+        except Exception as e:
+            logger.error(
+                "Failed to finalize transcript",
+                call_sid=self.call_sid,
+                error=str(e),
+            )
+
+
+def start_transcript_log(
+    call_sid: str, questions: Optional[List[dict]] = None
+) -> Optional[TranscriptLog]:
+    if not TRANSCRIPT_CAPTURE:
+        return None
+    try:
+        analyzer = (
+            IncrementalAnalyzer(questions, call_sid=call_sid)
+            if questions
+            else None
+        )
+        return TranscriptLog(call_sid, analyzer=analyzer)
+    except Exception as e:
+        logger.warning(
+            "Transcript capture unavailable", call_sid=call_sid, error=str(e)
+        )
+        return None
@@ -0,0 +1,129 @@
+"""
+Transcript text for analysis: one pass over the turns, three views.
+
+helper.analyze_transcription used to put json.dumps(transcript, indent=2)
+into the prompt, with seq numbers, timestamps and JSON escaping. For every
+boolean answer it then serialized the whole transcript again to search it
+for the question's keywords. normalize_transcript() walks the turns once
+and builds:
+
+- prompt_text: one "role: content" line per turn, with HTML tags stripped
+  and whitespace collapsed
+- search_text: the same contents lowercased, for keyword checks
+  (mentions())
+- index: token -> positions of the turns that contain it
+
+A transcript with no turns in a shape it knows (an externally written one,
+say) falls back to its JSON dump for both texts, as the prompt used to be,
+so the analysis still sees it.
+
+The patterns are compiled once, at import.
+benchmarks/bench_transcript.py measures throughput on large transcripts.
+
+    text = normalize_transcript(load_transcript(call_sid))
+    prompt = f"Analyze the following call transcription:\\n\\n{text.prompt_text}"
+    if text.mentions("budget"): ...
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+import json
+import re
+from typing import DefaultDict, Dict, Iterable, List, Tuple
+
+_TAG = re.compile(r"<[^>]*>")
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def strip_html_tags(text: str) -> str:
+    if "<" not in text:
+        return text
+    return _TAG.sub("", text)
+
+
+def clean_text(text: str) -> str:
+    """Tags stripped, runs of whitespace collapsed to one space."""
+    return " ".join(strip_html_tags(text).split())
+
+
+def _content_text(content: object) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        # Multi-part message content: keep the text parts.
+        return " ".join(
+            part.get("text") or ""
+            for part in content
+            if isinstance(part, dict)
+        )
+    return "" if content is None else str(content)
+
+
+@dataclass(frozen=True)
+class NormalizedTranscript:
+    prompt_text: str
+    search_text: str
+    index: Dict[str, Tuple[int, ...]] = field(default_factory=dict)
+
+    def mentions(self, keyword: str) -> bool:
+        """Whether any turn contains keyword (substring, case-insensitive)."""
+        return keyword.lower() in self.search_text
+
+    def turns_with(self, token: str) -> Tuple[int, ...]:
+        """Positions of the turns containing this exact token."""
+        return self.index.get(token.lower(), ())
+
+
+def _has_content(transcript: object) -> bool:
+    if isinstance(transcript, dict):
+        return any(transcript.values())
+    return bool(transcript)
+
+
+def _messages(transcript: object) -> Iterable:
+    if isinstance(transcript, dict):
+        return transcript.get("messages") or ()
+    if isinstance(transcript, list):
+        return transcript
+    return ()
+
+
+def _dumped(transcript: object) -> NormalizedTranscript:
+    text = json.dumps(transcript, default=str)
+    lowered = text.lower()
+    return NormalizedTranscript(
+        prompt_text=text,
+        search_text=lowered,
+        index={token: (0,) for token in set(_WORD.findall(lowered))},
+    )
+
+
+def normalize_transcript(transcript: object) -> NormalizedTranscript:
+    """
+    The three views of a transcript dict ({"messages": [...]}, as written by
+    transcript_log) or of a bare list of messages. Empty turns are skipped;
+    anything else with content is used as its JSON dump.
+    """
+    lines: List[str] = []
+    searchable: List[str] = []
+    index: DefaultDict[str, List[int]] = defaultdict(list)
+    for position, message in enumerate(_messages(transcript)):
+        if isinstance(message, dict):
+            role = message.get("role") or "unknown"
+            content = clean_text(_content_text(message.get("content")))
+        else:
+            role, content = "unknown", clean_text(str(message))
+        if not content:
+            continue
+        lines.append(f"{role}: {content}")
+        lowered = content.lower()
+        searchable.append(lowered)
+        for token in set(_WORD.findall(lowered)):
+            index[token].append(position)
+    if not lines and _has_content(transcript):
+        return _dumped(transcript)
+    return NormalizedTranscript(
+        prompt_text="\n".join(lines),
+        search_text="\n".join(searchable),
+        index={token: tuple(turns) for token, turns in index.items()},
+    )
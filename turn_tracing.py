@@ -0,0 +1,75 @@
+"""
+Pipeline processor that records one span per conversational turn.
+
+A turn starts when the caller stops speaking and ends when the bot finishes
+its reply (or is interrupted). Placed right after STT, it sees the caller's
+speaking frames downstream and the bot speaking frames that the output
+transport pushes upstream. response_ms is the time to the bot's first audio.
+"""
+
+import time
+from typing import Optional
+
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    EndFrame,
+    Frame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from utils.tracing import current_span, Span, start_span
+
+
+class TurnTracer(FrameProcessor):
+    def __init__(
+        self, parent: Optional[Span] = None, **kwargs: object
+    ) -> None:
+        super().__init__(**kwargs)
+        self._parent = parent or current_span()
+        self._turn: Optional[Span] = None
+        self._turn_started = 0.0
+        self._turns = 0
+        self._bot_speaking = False
+
+    def _start_turn(self) -> None:
+        self._end_turn()
+        self._turns += 1
+        self._turn = start_span("turn", parent=self._parent, turn=self._turns)
+        self._turn_started = time.monotonic()
+
+    def _end_turn(self, **attributes: object) -> None:
+        if self._turn is not None:
+            self._turn.set(**attributes)
+            self._turn.end()
+            self._turn = None
+
+    def _elapsed_ms(self) -> float:
+        return round((time.monotonic() - self._turn_started) * 1000, 1)
+
+    async def process_frame(
+        self, frame: Frame, direction: FrameDirection
+    ) -> None:
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, UserStoppedSpeakingFrame):
+            self._start_turn()
+        elif isinstance(frame, UserStartedSpeakingFrame):
+            if self._bot_speaking:
+                self._end_turn(interrupted=True)
+        elif isinstance(frame, BotStartedSpeakingFrame):
+            # Pushed both ways by the output transport; count it once.
+            if direction == FrameDirection.UPSTREAM:
+                self._bot_speaking = True
+                if self._turn is not None:
+                    self._turn.set(response_ms=self._elapsed_ms())
+        elif isinstance(frame, BotStoppedSpeakingFrame):
+            if direction == FrameDirection.UPSTREAM:
+                self._bot_speaking = False
+                self._end_turn(reply_ms=self._elapsed_ms())
+        elif isinstance(frame, EndFrame):
+            self._end_turn()
+
+        await self.push_frame(frame, direction)
@@ -0,0 +1,77 @@
+"""
+TwiML responses for /agent, rendered from fixed templates.
+
+Every value that reaches the XML (the Host header, call_id, the redirect
+query) is escaped for the attribute or text node it lands in. Rendered
+responses are cached as encoded bytes, keyed by host and parameters, so
+the Twilio retries and shed redirects of a dial burst skip rendering and
+encoding.
+"""
+
+from functools import lru_cache
+import os
+from urllib.parse import urlencode
+from xml.sax.saxutils import escape
+
+TWIML_CACHE_SIZE = int(os.getenv("TWIML_CACHE_SIZE", "1024"))
+
+_HEADER = '<?xml version="1.0" encoding="UTF-8"?>'
+
+_STREAM = (
+    _HEADER
+    + "<Response>"
+    + "<Connect>"
+    + "<Stream url={url}>{parameters}</Stream>"
+    + "</Connect>"
+    + "<Say>The bot connection has been terminated.</Say>"
+    + "</Response>"
+)
+_PARAMETER = "<Parameter name={name} value={value} />"
+_ATTR_ENTITIES = {'"': "&quot;"}
+
+_REDIRECT = (
+    _HEADER
+    + "<Response>"
+    + '<Pause length="1" />'
+    + '<Redirect method="POST">{url}</Redirect>'
+    + "</Response>"
+)
+
+BUSY = (
+    _HEADER
+    + "<Response>"
+    + "<Say>All of our agents are busy. Please try again later.</Say>"
+    + "<Hangup />"
+    + "</Response>"
+).encode()
+
+
+def _attr(value: str) -> str:
+    return '"' + escape(value, _ATTR_ENTITIES) + '"'
+
+
+@lru_cache(maxsize=TWIML_CACHE_SIZE)
+def stream_twiml(host: str, call_id: str = "") -> bytes:
+    """Connect the call to this host's media stream websocket."""
+    parameters = ""
+    if call_id:
+        parameters = _PARAMETER.format(
+            name=_attr("call_id"), value=_attr(call_id)
+        )
+    return _STREAM.format(
+        url=_attr(f"wss://{host}/ws"), parameters=parameters
+    ).encode()
+
+
+@lru_cache(maxsize=TWIML_CACHE_SIZE)
+def redirect_twiml(host: str, params: tuple) -> bytes:
+    """Send the call back through the load balancer to /agent."""
+    url = f"https://{host}/agent?{urlencode(params)}"
+    return _REDIRECT.format(url=escape(url)).encode()
+
+
+def cache_info() -> dict:
+    return {
+        "stream": stream_twiml.cache_info()._asdict(),
+        "redirect": redirect_twiml.cache_info()._asdict(),
+    }
@@ -0,0 +1,121 @@
+"""
+Per-call identity: who the call is for and how to reach the backend for it.
+
+websocket_endpoint builds one CallContext from the call's Redis data and
+makes it current (use_call_context) for the rest of the call. Pipeline tasks
+created under it inherit it, so tool calls, log records and traces can read
+it through current_call() without a metadata dict being passed along:
+utils/logging adds the call's ids to every record, and the ids go on the
+call's root span.
+
+The backend request headers (workspace-id, Authorization) are built once
+here rather than on every tool call.
+
+    with use_call_context(CallContext(workspace_id="ws-1", call_sid=sid)):
+        ...
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Mapping, Optional, Union
+
+from utils.tracing import current_span
+
+_current: ContextVar[Optional["CallContext"]] = ContextVar(
+    "call_context", default=None
+)
+
+
+def backend_headers(
+    workspace_id: str, auth_header: Optional[str] = None
+) -> dict:
+    """Headers for backend API calls from the agent."""
+    headers = {
+        "Content-Type": "application/json",
+        "workspace-id": workspace_id,
+    }
+    if auth_header:
+        headers["Authorization"] = auth_header
+    return headers
+
+
+class CallContext:
+    __slots__ = (
+        "agent_id",
+        "workspace_id",
+        "lead_id",
+        "call_sid",
+        "call_id",
+        "auth_header",
+        "backend_headers",
+        "log_fields",
+    )
+
+    def __init__(
+        self,
+        agent_id: Optional[str] = None,
+        workspace_id: Optional[str] = None,
+        lead_id: Optional[str] = None,
+        call_sid: Optional[str] = None,
+        call_id: Optional[str] = None,
+        auth_header: Optional[str] = None,
+    ) -> None:
+        self.agent_id = agent_id
+        self.workspace_id = workspace_id
+        self.lead_id = lead_id
+        self.call_sid = call_sid
+        self.call_id = call_id
+        self.auth_header = auth_header
+        # Shared by every tool call and log record of the call; not mutated.
+        self.backend_headers: Dict[str, str] = (
+            backend_headers(workspace_id, auth_header) if workspace_id else {}
+        )
+        self.log_fields: Dict[str, str] = {
+            key: value
+            for key, value in (
+                ("call_sid", call_sid),
+                ("call_id", call_id),
+                ("agent_id", agent_id),
+                ("lead_id", lead_id),
+            )
+            if value
+        }
+
+    @classmethod
+    def of(cls, value: Union["CallContext", Mapping, None]) -> "CallContext":
+        """A CallContext as is, or one built from a call metadata dict."""
+        if isinstance(value, cls):
+            return value
+        value = value or {}
+        return cls(**{key: value.get(key) for key in _FIELDS})
+
+    def __repr__(self) -> str:
+        # Leaves the auth header out.
+        return f"CallContext({self.log_fields})"
+
+
+_FIELDS = (
+    "agent_id",
+    "workspace_id",
+    "lead_id",
+    "call_sid",
+    "call_id",
+    "auth_header",
+)
+
+
+def current_call() -> Optional[CallContext]:
+    return _current.get()
+
+
+@contextmanager
+def use_call_context(call: CallContext) -> Iterator[CallContext]:
+    """Make `call` current; its ids also go on the current (call) span."""
+    active = current_span()
+    if active is not None:
+        active.set(**call.log_fields)
+    token = _current.set(call)
+    try:
+        yield call
+    finally:
+        _current.reset(token)
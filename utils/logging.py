@@ -12,10 +12,166 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Dict
+import atexit
+import json
+import os
+import queue
+import random
+import sys
+import threading
+from typing import Dict, List, Optional, TextIO
 
 import structlog
 
+from utils.call_context import current_call
+from utils.tracing import current_span, trace_log_fields
+
+# Records waiting to be written; beyond this they are dropped and counted.
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Records rendered and written per batch.
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "256"))
+# Fraction of debug records kept; override per call with sample_rate=...
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+# Longer string fields are truncated when rendered.
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+
+
+class LogSink:
+    """Bounded queue of event dicts, rendered and written by a background thread.
+
+    Callers only enqueue; JSON rendering and the write to stdout happen in
+    batches on the writer thread. Values are rendered later, so pass
+    snapshots rather than objects that keep changing.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[TextIO] = None,
+        maxsize: int = LOG_QUEUE_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+        max_field_chars: int = LOG_MAX_FIELD_CHARS,
+    ):
+        self._stream = stream
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._batch_size = batch_size
+        self._max_field_chars = max_field_chars
+        self._renderer = structlog.processors.JSONRenderer()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._reported_drops = 0
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.sampled = 0
+
+    def put(self, event_dict: Dict) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(event_dict)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is written."""
+        if self._thread is None:
+            return True
+        marker = threading.Event()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+
+    def stats(self) -> Dict:
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled": self.sampled,
+            "queued": self._queue.qsize(),
+        }
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: List) -> None:
+        lines = []
+        markers = []
+        for item in batch:
+            if isinstance(item, threading.Event):
+                markers.append(item)
+                continue
+            try:
+                lines.append(self._render(item))
+            except Exception as e:
+                lines.append(
+                    json.dumps(
+                        {"severity": "error", "message": f"Failed to render log record: {e}"}
+                    )
+                )
+        dropped = self.dropped
+        if dropped > self._reported_drops:
+            lines.append(
+                json.dumps(
+                    {
+                        "severity": "warning",
+                        "message": "Log queue full, records dropped",
+                        "dropped": dropped - self._reported_drops,
+                        "dropped_total": dropped,
+                    }
+                )
+            )
+            self._reported_drops = dropped
+        if lines:
+            try:
+                stream = self._stream or sys.stdout
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+                self.written += len(lines)
+            except Exception:
+                pass
+        for marker in markers:
+            marker.set()
+
+    def _render(self, event_dict: Dict) -> str:
+        limit = self._max_field_chars
+        for key, value in event_dict.items():
+            if isinstance(value, str) and len(value) > limit:
+                event_dict[key] = f"{value[:limit]}... ({len(value)} chars)"
+        return self._renderer(None, None, event_dict)
+
+
+class QueueLogger:
+    """structlog logger that hands each processed event dict to a LogSink."""
+
+    def __init__(self, sink: LogSink):
+        self.sink = sink
+
+    def msg(self, **event_dict) -> None:
+        self.sink.put(event_dict)
+
+    debug = info = warning = warn = error = critical = exception = fatal = log = msg
+
+
+_sink = LogSink()
+
 
 def field_name_modifier(
     logger: structlog.PrintLogger, log_method: str, event_dict: Dict
@@ -42,22 +198,57 @@ def trace_modifier(
     """Adds Tracing correlation
     https://cloud.google.com/run/docs/logging#correlate-logs
     """
+    active = current_span()
+    if active is not None:
+        event_dict.update(trace_log_fields(active))
+    return event_dict
+
+
+def call_context_modifier(
+    logger: structlog.PrintLogger, log_method: str, event_dict: Dict
+) -> Dict:
+    """Adds the current call's ids (call_sid, call_id, agent_id, lead_id)"""
+    call = current_call()
+    if call is not None:
+        for key, value in call.log_fields.items():
+            event_dict.setdefault(key, value)
+    return event_dict
+
+
+def sampler(logger: QueueLogger, log_method: str, event_dict: Dict) -> Dict:
+    """Drops a share of high-volume events before they are queued.
+
+    Debug events are kept at LOG_DEBUG_SAMPLE_RATE; any event can pass its
+    own rate, e.g. logger.debug("vad chunk", sample_rate=0.01).
+    """
+    rate = event_dict.pop("sample_rate", None)
+    if rate is None and log_method == "debug":
+        rate = LOG_DEBUG_SAMPLE_RATE
+    if rate is not None and rate < 1.0 and random.random() >= rate:
+        logger.sink.sampled += 1
+        raise structlog.DropEvent
     return event_dict
 
 
 def getJSONLogger() -> structlog._config.BoundLoggerLazyProxy:
     """Create a JSON logger using the field name and trace modifiers created above"""
     # extend using https://www.structlog.org/en/stable/processors.html
+    # Rendering happens on the sink's writer thread, so the chain ends with
+    # the event dict instead of a JSONRenderer.
     structlog.configure(
         processors=[
             structlog.stdlib.add_log_level,
+            sampler,
             structlog.stdlib.PositionalArgumentsFormatter(),
             field_name_modifier,
             trace_modifier,
+            call_context_modifier,
             structlog.processors.TimeStamper("iso"),
-            structlog.processors.JSONRenderer(),
+            structlog.processors.format_exc_info,
         ],
         wrapper_class=structlog.stdlib.BoundLogger,
+        logger_factory=lambda *args: QueueLogger(_sink),
+        cache_logger_on_first_use=True,
     )
     return structlog.get_logger()
 
@@ -65,11 +256,14 @@ def getJSONLogger() -> structlog._config.BoundLoggerLazyProxy:
 logger = getJSONLogger()
 
 
-def flush() -> None:
-    # Setting PYTHONUNBUFFERED in Dockerfile/Buildpack ensured no buffering
+def flush(timeout: float = 5.0) -> bool:
+    """Write out every queued record; called on SIGTERM and at exit."""
+    return _sink.flush(timeout)
+
+
+def stats() -> Dict:
+    """Counters for the logging pipeline (queued, written, dropped, sampled)."""
+    return _sink.stats()
+
 
-    # https://docs.python.org/3/library/logging.html#logging.shutdown
-    # When the logging module is imported, it registers this
-    # function as an exit handler (see atexit), so normally
-    # there’s no need to do that manually.
-    pass
+atexit.register(flush)
@@ -3,6 +3,11 @@ import os
 from typing import Optional
 import redis
 
+from utils.logging import logger
+
+WORKER_LOAD_PREFIX = "agent_worker_load:"
+AGENT_CONFIG_PREFIX = "agent_config:"
+AGENT_CONFIG_CHANNEL = "agent_config_invalidate"
 
 class RedisClient:
     """Simple Redis client for fetching call prompts and metadata."""
@@ -37,18 +42,17 @@ class RedisClient:
         try:
             client = cls.get_client()
             data = client.get(redis_key)
-            print("got some call data from Redis------------------------------", data)
-            if data:
-                print(
-                    "JSON loaded some call data from Redis------------------------------",
-                    json.loads(data),
-                )
-            
+            logger.debug(
+                "Fetched call prompt from Redis",
+                call_sid=call_sid,
+                found=bool(data),
+                bytes=len(data) if data else 0,
+            )
             if data:
                 return json.loads(data)
             return None
         except Exception as e:
-            print(f"Failed to fetch from Redis: {e}")
+            logger.error("Failed to fetch from Redis", key=redis_key, error=str(e))
             return None
     
     @classmethod
@@ -67,6 +71,89 @@ class RedisClient:
             client = cls.get_client()
             return bool(client.delete(redis_key))
         except Exception as e:
-            print(f"Failed to delete from Redis: {e}")
+            logger.error("Failed to delete from Redis", key=redis_key, error=str(e))
             return False
 
+    @classmethod
+    def set_worker_load(cls, worker_id: str, load: dict, ttl: int) -> bool:
+        """
+        Publish a worker's live call count.
+
+        Args:
+            worker_id: Unique id of the worker process
+            load: Snapshot of the worker's capacity
+            ttl: Seconds before the entry expires if not refreshed
+
+        Returns:
+            True if the load was written
+        """
+        try:
+            client = cls.get_client()
+            return bool(
+                client.set(
+                    f"{WORKER_LOAD_PREFIX}{worker_id}", json.dumps(load), ex=ttl
+                )
+            )
+        except Exception as e:
+            logger.error("Failed to publish worker load to Redis", error=str(e))
+            return False
+
+    @classmethod
+    def delete_worker_load(cls, worker_id: str) -> bool:
+        """Remove a worker's load entry on shutdown."""
+        try:
+            client = cls.get_client()
+            return bool(client.delete(f"{WORKER_LOAD_PREFIX}{worker_id}"))
+        except Exception as e:
+            logger.error("Failed to delete worker load from Redis", error=str(e))
+            return False
+
+    @classmethod
+    def get_worker_loads(cls) -> Optional[list]:
+        """
+        Read the load of every live worker in the fleet.
+
+        Returns:
+            List of worker load dicts, or None if Redis is unavailable
+        """
+        try:
+            client = cls.get_client()
+            keys = list(client.scan_iter(match=f"{WORKER_LOAD_PREFIX}*"))
+            if not keys:
+                return []
+            return [json.loads(v) for v in client.mget(keys) if v]
+        except Exception as e:
+            logger.error("Failed to read worker loads from Redis", error=str(e))
+            return None
+
+    @classmethod
+    def get_agent_config(cls, agent_id: str, version: str) -> Optional[dict]:
+        """
+        Retrieve an agent's static configuration for one version.
+
+        Returns:
+            Dict with prompt_template and optional voice_id/llm_model, or None
+        """
+        try:
+            client = cls.get_client()
+            data = client.get(f"{AGENT_CONFIG_PREFIX}{agent_id}:{version}")
+            return json.loads(data) if data else None
+        except Exception as e:
+            logger.error("Failed to fetch agent config from Redis", agent_id=agent_id, error=str(e))
+            return None
+
+    @classmethod
+    def subscribe(cls, channel: str):
+        """
+        Subscribe to a pub/sub channel.
+
+        Returns:
+            A PubSub to poll with get_message(), or None if Redis is unavailable
+        """
+        try:
+            pubsub = cls.get_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(channel)
+            return pubsub
+        except Exception as e:
+            logger.error("Failed to subscribe to Redis channel", channel=channel, error=str(e))
+            return None
@@ -0,0 +1,363 @@
+"""
+Lightweight span tracing for calls.
+
+A trace is started once per call (start_trace) and carried in a contextvar,
+so spans opened below it -- Redis and Twilio bootstrap, LLM requests, tool
+calls -- attach to the call without threading it through every function.
+Pipeline tasks created while the trace is active inherit it.
+
+Traces are sampled when they start (TRACE_SAMPLE_RATE). Unsampled traces
+still carry ids for log correlation but record nothing. Finished spans of
+sampled traces are exported in batches by a background thread, as OTLP/JSON
+to TRACE_OTLP_ENDPOINT (any OTLP/HTTP collector) or as JSON lines to
+TRACE_FILE.
+
+    with start_trace("call", call_sid=call_sid):
+        with span("redis.get_call_prompt"):
+            ...
+"""
+
+import atexit
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import os
+import queue
+import random
+import secrets
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT")
+TRACE_FILE = os.getenv("TRACE_FILE")
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+SERVICE_NAME = os.getenv("K_SERVICE", "voice-crm-agent")
+
+_current: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+
+class Span:
+    """One timed operation; attributes are only kept for sampled traces."""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "sampled",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        sampled: bool,
+        attributes: Optional[Dict] = None,
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes) if sampled and attributes else {}
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: object) -> None:
+        if self.sampled:
+            self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        if self.sampled:
+            _exporter.export(self)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def as_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def _parse_trace_header(
+    header: Optional[str],
+) -> Optional[Tuple[str, Optional[str], bool]]:
+    """(trace_id, parent_span_id, sampled) from traceparent or X-Cloud-Trace-Context."""
+    if not header:
+        return None
+    try:
+        if header.count("-") == 3:
+            # W3C traceparent: version-traceid-spanid-flags
+            _, trace_id, span_id, flags = header.split("-")
+            return trace_id, span_id, bool(int(flags, 16) & 1)
+        # Cloud Run: TRACE_ID/SPAN_ID;o=1 (span id is decimal)
+        trace_id, _, rest = header.partition("/")
+        span_part, _, options = rest.partition(";")
+        span_id = f"{int(span_part):016x}" if span_part else None
+        return trace_id, span_id, options.strip() == "o=1"
+    except ValueError:
+        return None
+
+
+def start_span(
+    name: str, parent: Optional[Span] = None, **attributes: object
+) -> Optional[Span]:
+    """
+    Open a child of `parent` (default: the current span) without making it
+    current. The caller ends it with span.end(). None outside a trace.
+    """
+    parent = parent or _current.get()
+    if parent is None:
+        return None
+    return Span(
+        name, parent.trace_id, parent.span_id, parent.sampled, attributes
+    )
+
+
+@contextmanager
+def _activate(active: Span) -> Iterator[Span]:
+    token = _current.set(active)
+    try:
+        yield active
+    except Exception as e:
+        active.end(error=e)
+        raise
+    finally:
+        _current.reset(token)
+        active.end()
+
+
+@contextmanager
+def start_trace(
+    name: str, trace_header: Optional[str] = None, **attributes: object
+) -> Iterator[Span]:
+    """
+    Start the root span of a call. An incoming trace header continues the
+    caller's trace and sampling decision; otherwise a new trace is sampled
+    at TRACE_SAMPLE_RATE.
+    """
+    parsed = _parse_trace_header(trace_header)
+    if parsed:
+        trace_id, parent_id, sampled = parsed
+        sampled = sampled or random.random() < TRACE_SAMPLE_RATE
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+        sampled = random.random() < TRACE_SAMPLE_RATE
+    with _activate(
+        Span(name, trace_id, parent_id, sampled, attributes)
+    ) as root:
+        yield root
+
+
+@contextmanager
+def span(name: str, **attributes: object) -> Iterator[Optional[Span]]:
+    """Child span of the current one; a no-op outside a trace."""
+    child = start_span(name, **attributes)
+    if child is None:
+        yield None
+        return
+    with _activate(child) as active:
+        yield active
+
+
+def trace_log_fields(active: Span) -> Dict:
+    """Cloud Logging correlation fields for a span."""
+    project = os.getenv("GOOGLE_CLOUD_PROJECT")
+    trace = (
+        f"projects/{project}/traces/{active.trace_id}"
+        if project
+        else active.trace_id
+    )
+    return {
+        "logging.googleapis.com/trace": trace,
+        "logging.googleapis.com/spanId": active.span_id,
+        "logging.googleapis.com/trace_sampled": active.sampled,
+    }
+
+
+def _otlp_value(value: object) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(spans: List[Span]) -> Dict:
+    """OTLP/HTTP JSON body for a batch of finished spans."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {
+                            "key": "service.name",
+                            "value": _otlp_value(SERVICE_NAME),
+                        }
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "voice-crm-agent"},
+                        "spans": [
+                            {
+                                "traceId": s.trace_id,
+                                "spanId": s.span_id,
+                                "parentSpanId": s.parent_id or "",
+                                "name": s.name,
+                                "kind": 1,
+                                "startTimeUnixNano": str(s.start_ns),
+                                "endTimeUnixNano": str(s.end_ns),
+                                "attributes": [
+                                    {"key": k, "value": _otlp_value(v)}
+                                    for k, v in s.attributes.items()
+                                    if v is not None
+                                ],
+                                "status": (
+                                    {"code": 2, "message": s.error}
+                                    if s.error
+                                    else {"code": 1}
+                                ),
+                            }
+                            for s in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class SpanExporter:
+    """Bounded queue of finished spans, written out in batches by a thread."""
+
+    def __init__(
+        self,
+        endpoint: Optional[str] = TRACE_OTLP_ENDPOINT,
+        path: Optional[str] = TRACE_FILE,
+        maxsize: int = TRACE_QUEUE_SIZE,
+        batch_size: int = 512,
+    ) -> None:
+        self.endpoint = endpoint
+        self.path = path
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._batch_size = batch_size
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.endpoint or self.path)
+
+    def export(self, finished: Span) -> None:
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        if self._thread is None:
+            return True
+        marker = threading.Event()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="span-exporter", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # Spans of one turn finish close together; wait briefly for them.
+            deadline = time.monotonic() + 0.5
+            while len(batch) < self._batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                if isinstance(batch[-1], threading.Event):
+                    break
+            spans = [s for s in batch if isinstance(s, Span)]
+            if spans:
+                self._write(spans)
+            for marker in batch:
+                if isinstance(marker, threading.Event):
+                    marker.set()
+
+    def _write(self, spans: List[Span]) -> None:
+        try:
+            if self.endpoint:
+                requests.post(
+                    self.endpoint, json=otlp_payload(spans), timeout=5
+                )
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(
+                        "".join(json.dumps(s.as_dict()) + "\n" for s in spans)
+                    )
+            self.exported += len(spans)
+        except Exception as e:
+            self.failed += len(spans)
+            sys.stderr.write(f"Failed to export {len(spans)} spans: {e}\n")
+
+
+_exporter = SpanExporter()
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """Export every finished span; called on SIGTERM and at exit."""
+    return _exporter.flush(timeout)
+
+
+atexit.register(flush)
@@ -0,0 +1,260 @@
+"""
+Answering-machine detection for the first seconds of a call.
+
+VoicemailDetector sits right after STT, where it sees the caller's audio,
+the VAD speaking frames and the transcripts. Until it decides, it holds back
+the speaking and transcription frames so the LLM never answers a greeting
+recording. Only two cues make a call a machine:
+
+- a beep, reported by a BeepDetectorProcessor next to transport.input()
+  (see beep_detection.py)
+- a voicemail phrase in the transcript ("leave a message", "after the
+  tone", ...)
+
+A long or wordy greeting is not enough on its own: people answer that way
+too, and a false positive hangs up on a live lead. Cadence only speeds up
+the other answer: a short first utterance followed by silence is a person.
+No cue by VOICEMAIL_DECISION_SECONDS (once the callee pauses) counts as a
+person.
+
+Detection is opt-in (VOICEMAIL_DETECTION=true), since it holds the
+conversation back until it decides. For a machine the detector waits for
+the beep or the end of the greeting before firing on_voicemail_detected, so
+a message lands on the recording; for a person it fires on_human_detected
+and gets out of the way.
+"""
+
+import os
+import re
+from typing import Optional
+
+from pipecat.frames.frames import (
+    Frame,
+    InputAudioRawFrame,
+    InterimTranscriptionFrame,
+    TranscriptionFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from beep_detection import BeepDetectorProcessor
+from utils.logging import logger
+from utils.tracing import current_span, Span
+
+VOICEMAIL_DETECTION = (
+    os.getenv("VOICEMAIL_DETECTION", "false").lower() == "true"
+)
+VOICEMAIL_DECISION_SECONDS = float(
+    os.getenv("VOICEMAIL_DECISION_SECONDS", "5.0")
+)
+VOICEMAIL_GREETING_SECONDS = float(
+    os.getenv("VOICEMAIL_GREETING_SECONDS", "2.5")
+)
+VOICEMAIL_MAX_WAIT_SECONDS = float(
+    os.getenv("VOICEMAIL_MAX_WAIT_SECONDS", "30")
+)
+
+# Silence after the VAD's stop event (itself ~0.8 s after the last word).
+HUMAN_SILENCE_SECONDS = 0.4
+GREETING_END_SILENCE_SECONDS = 1.0
+
+HUMAN = "human"
+MACHINE = "machine"
+
+_MACHINE_PHRASES = re.compile(
+    r"\b("
+    r"leave (a|your) (brief |short )?message|"
+    r"after the (tone|beep)|"
+    r"at the (tone|beep)|"
+    r"record your message|"
+    r"(can't|cannot|can not) (come to|take|get to|answer) (the |your )?(phone|call)|"
+    r"voice ?mail|"
+    r"mailbox|"
+    r"please leave"
+    r")\b",
+    re.IGNORECASE,
+)
+
+
+class VoicemailClassifier:
+    """Human/machine decision from audio time, VAD events and transcripts."""
+
+    def __init__(
+        self,
+        decision_seconds: float = VOICEMAIL_DECISION_SECONDS,
+        greeting_seconds: float = VOICEMAIL_GREETING_SECONDS,
+        max_wait_seconds: float = VOICEMAIL_MAX_WAIT_SECONDS,
+    ) -> None:
+        self.decision_seconds = decision_seconds
+        self.greeting_seconds = greeting_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.elapsed = 0.0
+        self.result: Optional[str] = None
+        self.reason: Optional[str] = None
+        self.decided_at: Optional[float] = None
+        self.beep = False
+        self._speaking_since: Optional[float] = None
+        self._stopped_at: Optional[float] = None
+        self._first_utterance: Optional[float] = None
+
+    def add_audio(self, seconds: float) -> None:
+        self.elapsed += seconds
+        self._decide()
+
+    def beep_detected(self) -> None:
+        self.beep = True
+        self._decide()
+
+    def speech_started(self) -> None:
+        self._speaking_since = self.elapsed
+        self._stopped_at = None
+
+    def speech_stopped(self) -> None:
+        if self._speaking_since is not None and self._first_utterance is None:
+            self._first_utterance = self.elapsed - self._speaking_since
+        self._speaking_since = None
+        self._stopped_at = self.elapsed
+        self._decide()
+
+    def add_transcript(self, text: str) -> None:
+        if self.result is not None:
+            return
+        if _MACHINE_PHRASES.search(text):
+            self._set(MACHINE, "transcript")
+
+    def ready_for_message(self) -> bool:
+        """For a machine: the beep has ended or the greeting has."""
+        if self.result != MACHINE:
+            return False
+        return (
+            self.beep
+            or self._silence() >= GREETING_END_SILENCE_SECONDS
+            or self.elapsed >= self.max_wait_seconds
+        )
+
+    def _silence(self) -> float:
+        if self._speaking_since is not None or self._stopped_at is None:
+            return 0.0
+        return self.elapsed - self._stopped_at
+
+    def _set(self, result: str, reason: str) -> None:
+        self.result, self.reason, self.decided_at = (
+            result,
+            reason,
+            self.elapsed,
+        )
+
+    def _decide(self) -> None:
+        if self.result is not None:
+            return
+        if self.beep:
+            self._set(MACHINE, "beep")
+        elif (
+            self._first_utterance is not None
+            and self._first_utterance < self.greeting_seconds
+            and self._silence() >= HUMAN_SILENCE_SECONDS
+        ):
+            self._set(HUMAN, "short_greeting")
+        elif self.elapsed >= self.decision_seconds and (
+            # Mid-utterance a voicemail phrase may still come.
+            self._speaking_since is None
+            or self.elapsed >= self.max_wait_seconds
+        ):
+            self._set(HUMAN, "no_machine_cues")
+
+
+class VoicemailDetector(FrameProcessor):
+    def __init__(
+        self,
+        call_sid: Optional[str] = None,
+        classifier: Optional[VoicemailClassifier] = None,
+        beep_detector: Optional[BeepDetectorProcessor] = None,
+        parent: Optional[Span] = None,
+        **kwargs: object,
+    ) -> None:
+        super().__init__(**kwargs)
+        self._call_sid = call_sid
+        self._classifier = classifier or VoicemailClassifier()
+        self._span = parent or current_span()
+        self._beep_detector = beep_detector
+        self._decided = False
+        self._fired = False
+        self._register_event_handler("on_human_detected")
+        self._register_event_handler("on_voicemail_detected")
+        if beep_detector is not None:
+            beep_detector.add_event_handler("on_beep", self._on_beep)
+
+    async def _on_beep(
+        self, processor: object, frequency: float, seconds: float
+    ) -> None:
+        logger.debug(
+            "Beep detected",
+            call_sid=self._call_sid,
+            frequency=frequency,
+            seconds=seconds,
+        )
+        self._classifier.beep_detected()
+        await self._check()
+
+    async def process_frame(
+        self, frame: Frame, direction: FrameDirection
+    ) -> None:
+        await super().process_frame(frame, direction)
+
+        # Once a person is on the line, everything flows; on a machine the
+        # greeting's transcripts stay held back until the call ends.
+        if self._fired and self._classifier.result == HUMAN:
+            await self.push_frame(frame, direction)
+            return
+
+        classifier = self._classifier
+        if isinstance(frame, InputAudioRawFrame):
+            classifier.add_audio(
+                len(frame.audio) / (2 * frame.num_channels * frame.sample_rate)
+            )
+        elif isinstance(frame, UserStartedSpeakingFrame):
+            classifier.speech_started()
+            frame = None
+        elif isinstance(frame, UserStoppedSpeakingFrame):
+            classifier.speech_stopped()
+            frame = None
+        elif isinstance(frame, TranscriptionFrame):
+            classifier.add_transcript(frame.text)
+            frame = None
+        elif isinstance(frame, InterimTranscriptionFrame):
+            frame = None
+
+        if frame is not None:
+            await self.push_frame(frame, direction)
+        await self._check()
+
+    async def _check(self) -> None:
+        classifier = self._classifier
+        if classifier.result is None or self._fired:
+            return
+        if not self._decided:
+            self._decided = True
+            logger.info(
+                "Answering machine detection",
+                call_sid=self._call_sid,
+                answered_by=classifier.result,
+                reason=classifier.reason,
+                decision_ms=round(classifier.decided_at * 1000),
+            )
+            if self._span is not None:
+                self._span.set(
+                    answered_by=classifier.result, amd_reason=classifier.reason
+                )
+        if classifier.result == HUMAN:
+            self._fired = True
+            if self._beep_detector is not None:
+                self._beep_detector.enabled = False
+            await self._call_event_handler(
+                "on_human_detected", classifier.reason
+            )
+        elif classifier.ready_for_message():
+            self._fired = True
+            await self._call_event_handler(
+                "on_voicemail_detected", classifier.reason
+            )
@@ -1,30 +1,35 @@
-from pipecat.frames.frames import EndFrame, LLMMessagesFrame
+import os
 
-async def switch_to_voicemail_response(task):
-    print("[VOICEMAIL DETECTED] Switching to voicemail mode...")
+from pipecat.frames.frames import EndFrame, LLMRunFrame, TTSSpeakFrame
+
+from prompt_cache import KICKOFF_MESSAGE
+from utils.logging import logger
+
+# "message" leaves VOICEMAIL_MESSAGE after the beep; "hangup" ends the call.
+VOICEMAIL_ACTION = os.getenv("VOICEMAIL_ACTION", "message")
+VOICEMAIL_MESSAGE = os.getenv(
+    "VOICEMAIL_MESSAGE",
+    "Hi! Just leaving a quick message. Feel free to call back whenever convenient!",
+)
+
+
+async def switch_to_voicemail_response(task, message: str = VOICEMAIL_MESSAGE):
+    logger.info("Voicemail detected, leaving message")
     try:
-        await task.queue_frames([
-            LLMMessagesFrame([
-                {
-                    "role": "assistant",
-                    "content": "Hi! Just leaving a quick message. Feel free to call back whenever convenient!"
-                }
-            ]),
-            EndFrame()
-        ])
-        print("[VOICEMAIL MODE] Message sent and call ended.")
+        # Spoken as-is: no LLM request for a recording. The EndFrame follows
+        # the speech through the pipeline, so the message plays out first.
+        await task.queue_frames([TTSSpeakFrame(message), EndFrame()])
     except Exception as e:
-        print("[ERROR] Failed to handle voicemail response:", e)
+        logger.error("Failed to handle voicemail response", error=str(e))
+
+
+async def switch_to_human_conversation(task, context):
+    logger.info("Human detected, starting conversation")
+    # Run on the shared context so the tool schemas and cached prefix apply.
+    context.add_message(dict(KICKOFF_MESSAGE))
+    await task.queue_frames([LLMRunFrame()])
 
-async def switch_to_human_conversation(task):
-    print("[HUMAN DETECTED] Proceeding with normal interaction...")
-    # You can optionally queue a message to start the convo
-    await task.queue_frames([
-        LLMMessagesFrame([
-            {"role": "assistant", "content": "Please introduce yourself to the user."}
-        ])
-    ])
 
 async def terminate_call(task):
-    print("[CALL TERMINATION REQUESTED] Ending the call immediately.")
-    await task.queue_frames([EndFrame()])
\ No newline at end of file
+    logger.info("Call termination requested")
+    await task.queue_frames([EndFrame()])